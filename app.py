@@ -3,15 +3,25 @@ import os
 from flask import Blueprint, Flask, jsonify
 from flask_cors import CORS
 
+from app_dir.commands import register_commands
 from app_dir.constants.http_status import (
     HTTP_RESOURCE_NOT_FOUND,
     HTTP_SERVER_ERROR,
+    HTTP_SERVICE_UNAVAILABLE,
 )
 from app_dir.extensions import init_extensions
 from app_dir.routes.accounts import accounts_bp
 from app_dir.routes.auth import auth_bp
+from app_dir.routes.metrics import metrics_bp
+from app_dir.routes.scheduled_transfers import scheduled_transfers_bp
 from app_dir.routes.transactions import transactions_bp
 from app_dir.routes.user import user_bp
+from app_dir.services.outbox_service import OutboxService
+from app_dir.services.scheduled_transfer_service import ScheduledTransferService
+from app_dir.services.settlement_service import SettlementService
+from app_dir.utils.db_pool import engine_options
+from app_dir.utils.replica_routing import replica_bind_key, save_pin
+from app_dir.utils.shard_routing import ShardUnavailableError, shard_bind_key
 
 app = Flask(__name__)
 
@@ -32,10 +42,50 @@ db_uri = os.environ.get(
 )
 app.config["SQLALCHEMY_DATABASE_URI"] = db_uri
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# Connection pool settings of the environment (see db_pool)
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config, db_uri)
+# Read replicas, one bind each (see replica_routing)
+app.config["SQLALCHEMY_BINDS"] = {
+    replica_bind_key(index): {"url": uri, **engine_options(app.config, uri)}
+    for index, uri in enumerate(app.config["DATABASE_REPLICA_URIS"])
+}
+# Shards, one bind each; the default database is their directory (see
+# ShardService)
+app.config["SQLALCHEMY_BINDS"].update(
+    {
+        shard_bind_key(index): {"url": uri, **engine_options(app.config, uri)}
+        for index, uri in enumerate(app.config["DATABASE_SHARD_URIS"])
+    }
+)
 
 # Initialize extensions
 init_extensions(app)
 
+# Send read-your-writes pins to the clients (see replica_routing)
+app.after_request(save_pin)
+
+# Register CLI commands
+register_commands(app)
+
+# The background workers only poll the default database, which is the
+# shard directory when sharding is on, so they would find nothing to do
+if app.config["DATABASE_SHARD_URIS"]:
+    for setting in ("ASYNC_SETTLEMENT_ENABLED", "OUTBOX_ENABLED", "SCHEDULER_ENABLED"):
+        if app.config[setting]:
+            raise RuntimeError(f"{setting} is not supported with DATABASE_SHARD_URIS")
+
+# Start the settlement workers when transactions are settled asynchronously
+if app.config["ASYNC_SETTLEMENT_ENABLED"]:
+    SettlementService.start(app)
+
+# Start delivering outbox events to the notification service
+if app.config["OUTBOX_ENABLED"]:
+    OutboxService.start(app)
+
+# Start executing scheduled transfers
+if app.config["SCHEDULER_ENABLED"]:
+    ScheduledTransferService.start(app)
+
 api_bp = Blueprint("api", __name__, url_prefix="/api")
 version1_bp = Blueprint("v1", __name__, url_prefix="/v1")
 
@@ -50,6 +100,14 @@ version1_bp.register_blueprint(accounts_bp, url_prefix="/accounts")
 # Global transaction endpoints
 version1_bp.register_blueprint(transactions_bp, url_prefix="/transactions")
 
+# Scheduled and recurring transfers
+version1_bp.register_blueprint(
+    scheduled_transfers_bp, url_prefix="/scheduled-transfers"
+)
+
+# Performance metrics
+version1_bp.register_blueprint(metrics_bp, url_prefix="/metrics")
+
 # Register the versioned API under the main API blueprint
 api_bp.register_blueprint(version1_bp)
 app.register_blueprint(api_bp)
@@ -66,6 +124,11 @@ def server_error(error):
     return jsonify({"error": "Internal server error"}), HTTP_SERVER_ERROR
 
 
+@app.errorhandler(ShardUnavailableError)
+def shard_unavailable(error):
+    return jsonify({"error": str(error)}), HTTP_SERVICE_UNAVAILABLE
+
+
 # Create the application instance
 if __name__ == "__main__":
     app.run(host="127.0.0.1", port=5000)
@@ -0,0 +1,40 @@
+from flask import Flask
+
+
+def register_commands(app: Flask) -> None:
+    """Register all CLI commands with the app_dir"""
+    from app_dir.commands.archive import (
+        add_transaction_partitions_command,
+        archive_transactions_command,
+    )
+    from app_dir.commands.balance import snapshot_balances_command
+    from app_dir.commands.balance_buckets import (
+        fold_balance_buckets_command,
+        set_balance_buckets_command,
+    )
+    from app_dir.commands.import_ledger import import_ledger_command
+    from app_dir.commands.interest import accrue_interest_command
+    from app_dir.commands.reconciliation import reconcile_ledger_command
+    from app_dir.commands.rollup import backfill_rollups_command
+    from app_dir.commands.search import rebuild_transaction_search_command
+    from app_dir.commands.shards import (
+        rebalance_shards_command,
+        rebuild_shard_directory_command,
+        resume_transfer_sagas_command,
+    )
+    from app_dir.commands.transaction_counts import rebuild_transaction_counts_command
+
+    app.cli.add_command(accrue_interest_command)
+    app.cli.add_command(snapshot_balances_command)
+    app.cli.add_command(reconcile_ledger_command)
+    app.cli.add_command(backfill_rollups_command)
+    app.cli.add_command(set_balance_buckets_command)
+    app.cli.add_command(fold_balance_buckets_command)
+    app.cli.add_command(archive_transactions_command)
+    app.cli.add_command(add_transaction_partitions_command)
+    app.cli.add_command(import_ledger_command)
+    app.cli.add_command(rebuild_transaction_search_command)
+    app.cli.add_command(rebuild_transaction_counts_command)
+    app.cli.add_command(rebalance_shards_command)
+    app.cli.add_command(resume_transfer_sagas_command)
+    app.cli.add_command(rebuild_shard_directory_command)
@@ -0,0 +1,56 @@
+from datetime import date
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app_dir.services.archive_service import TransactionArchiveService, add_months
+
+
+@click.command("archive-transactions")
+@click.option(
+    "--older-than-months",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Archive the months before this many months ago "
+    "(default: TRANSACTION_ARCHIVE_AFTER_MONTHS).",
+)
+@click.option(
+    "--format",
+    "archive_format",
+    type=click.Choice(["columnar", "ndjson"], case_sensitive=False),
+    default=None,
+    help="Archive file format (default: TRANSACTION_ARCHIVE_FORMAT).",
+)
+@with_appcontext
+def archive_transactions_command(older_than_months, archive_format):
+    """Move old months of transactions to compressed archive files."""
+    months = older_than_months or current_app.config["TRANSACTION_ARCHIVE_AFTER_MONTHS"]
+    cutoff_month = add_months(date.today().replace(day=1), -months)
+    archived = TransactionArchiveService.archive_before(
+        cutoff_month,
+        current_app.config["TRANSACTION_ARCHIVE_DIR"],
+        archive_format or current_app.config["TRANSACTION_ARCHIVE_FORMAT"],
+    )
+    if archived:
+        click.echo(
+            f"Archived {len(archived)} months, {archived[0]:%Y-%m} to "
+            f"{archived[-1]:%Y-%m}"
+        )
+    else:
+        click.echo(f"Nothing to archive before {cutoff_month:%Y-%m}")
+
+
+@click.command("add-transaction-partitions")
+@click.option(
+    "--months-ahead",
+    type=click.IntRange(min=0),
+    default=3,
+    show_default=True,
+    help="Number of future months to create partitions for.",
+)
+@with_appcontext
+def add_transaction_partitions_command(months_ahead):
+    """Create the monthly partitions of the transaction table (MySQL)."""
+    added = TransactionArchiveService.add_partitions(months_ahead)
+    click.echo(f"Added partitions: {', '.join(added) or 'none'}")
@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+
+import click
+from flask.cli import with_appcontext
+
+from app_dir.services.balance_service import BalanceService
+
+
+@click.command("snapshot-balances")
+@click.option(
+    "--date",
+    "snapshot_date",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help="Day to snapshot the end-of-day balances for (default: yesterday).",
+)
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1),
+    default=5000,
+    show_default=True,
+    help="Number of accounts processed per DB transaction.",
+)
+@with_appcontext
+def snapshot_balances_command(snapshot_date, chunk_size):
+    """Record the end-of-day balance of every account."""
+    snapshot_date = (
+        snapshot_date.date() if snapshot_date else date.today() - timedelta(days=1)
+    )
+    written = BalanceService.create_snapshots(snapshot_date, chunk_size=chunk_size)
+    click.echo(f"Wrote {written} balance snapshots for {snapshot_date.isoformat()}")
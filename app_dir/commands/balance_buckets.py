@@ -0,0 +1,25 @@
+import click
+from flask.cli import with_appcontext
+
+from app_dir.services.balance_bucket_service import BalanceBucketService
+
+
+@click.command("set-balance-buckets")
+@click.argument("account_number", type=int)
+@click.argument("bucket_count", type=click.IntRange(min=0))
+@with_appcontext
+def set_balance_buckets_command(account_number, bucket_count):
+    """Spread a hot account's credits over BUCKET_COUNT buckets (0 disables)."""
+    try:
+        BalanceBucketService.set_bucket_count(account_number, bucket_count)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Account {account_number} now uses {bucket_count} balance buckets")
+
+
+@click.command("fold-balance-buckets")
+@with_appcontext
+def fold_balance_buckets_command():
+    """Fold the balance buckets of every bucketed account into its balance."""
+    folded = BalanceBucketService.fold_all()
+    click.echo(f"Folded the balance buckets of {folded} accounts")
@@ -0,0 +1,74 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app_dir.services.import_service import ImportService
+from app_dir.services.transaction_count_service import TransactionCountService
+
+
+@click.command("import-ledger")
+@click.option(
+    "--accounts",
+    "accounts_path",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="CSV or NDJSON file of accounts (optionally .gz).",
+)
+@click.option(
+    "--transactions",
+    "transactions_path",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="CSV or NDJSON file of transactions (optionally .gz).",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of validation worker processes (default: IMPORT_WORKERS).",
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of rows inserted per batch (default: IMPORT_BATCH_SIZE).",
+)
+@with_appcontext
+def import_ledger_command(accounts_path, transactions_path, workers, batch_size):
+    """Bulk import accounts and transactions, then rebuild the balances.
+
+    Interrupted imports resume where they stopped when run again with the
+    same files.
+    """
+    if not accounts_path and not transactions_path:
+        raise click.UsageError("Give --accounts and/or --transactions")
+    workers = workers or current_app.config["IMPORT_WORKERS"]
+    batch_size = batch_size or current_app.config["IMPORT_BATCH_SIZE"]
+
+    for kind, path in (
+        ("ACCOUNTS", accounts_path),
+        ("TRANSACTIONS", transactions_path),
+    ):
+        if not path:
+            continue
+        totals = ImportService.import_file(
+            path, kind, workers=workers, batch_size=batch_size
+        )
+        click.echo(
+            f"{path}: imported {totals['rows_imported']} rows, rejected "
+            f"{totals['rows_rejected']} ({totals['rows_per_second']} rows/s)"
+        )
+        if totals["rows_rejected"]:
+            click.echo(f"Rejected rows: {path}.rejected.ndjson")
+
+    references = ImportService.check_references()
+    if any(references.values()):
+        click.echo(
+            f"Warning: {references['accounts_without_user']} accounts without a "
+            f"user, {references['transactions_without_account']} transactions "
+            "without their accounts"
+        )
+    click.echo(f"Rebuilt the balances of {ImportService.rebuild_balances()} accounts")
+    if transactions_path:
+        TransactionCountService.rebuild()
+        click.echo("Run backfill-rollups to rebuild the daily rollups")
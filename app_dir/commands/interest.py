@@ -0,0 +1,32 @@
+from datetime import date
+
+import click
+from flask.cli import with_appcontext
+
+from app_dir.services.interest_service import InterestService
+
+
+@click.command("accrue-interest")
+@click.option(
+    "--date",
+    "accrual_date",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help="Day to accrue interest for (default: today).",
+)
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1),
+    default=5000,
+    show_default=True,
+    help="Number of accounts processed per DB transaction.",
+)
+@with_appcontext
+def accrue_interest_command(accrual_date, chunk_size):
+    """Accrue one day of interest on all accounts, resuming if interrupted."""
+    accrual_date = accrual_date.date() if accrual_date else date.today()
+    run = InterestService.accrue_interest(accrual_date, chunk_size=chunk_size)
+    click.echo(
+        f"Accrued {run.total_interest} of interest on "
+        f"{run.accounts_processed} accounts for {accrual_date.isoformat()}"
+    )
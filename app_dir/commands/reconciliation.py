@@ -0,0 +1,54 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app_dir.extensions import db
+from app_dir.services.reconciliation_service import ReconciliationService
+
+
+@click.command("reconcile-ledger")
+@click.option(
+    "--report",
+    "report_path",
+    type=click.Path(dir_okay=False, writable=True),
+    default="reconciliation_report.csv",
+    show_default=True,
+    help="CSV file the discrepancies are appended to.",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of worker processes (default: RECONCILIATION_WORKERS).",
+)
+@click.option(
+    "--range-size",
+    type=click.IntRange(min=1),
+    default=10000,
+    show_default=True,
+    help="Number of accounts handed to a worker at a time.",
+)
+@click.option(
+    "--max-rows-per-second",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Total DB read budget (default: RECONCILIATION_MAX_ROWS_PER_SECOND).",
+)
+@with_appcontext
+def reconcile_ledger_command(report_path, workers, range_size, max_rows_per_second):
+    """Check every account balance against its COMPLETED transactions."""
+    totals = ReconciliationService.reconcile(
+        db.session,
+        current_app.config["SQLALCHEMY_DATABASE_URI"],
+        report_path,
+        workers=workers or current_app.config["RECONCILIATION_WORKERS"],
+        range_size=range_size,
+        rows_per_second=(
+            max_rows_per_second
+            or current_app.config["RECONCILIATION_MAX_ROWS_PER_SECOND"]
+        ),
+    )
+    click.echo(
+        f"Checked {totals['accounts_checked']} accounts ({totals['rows_read']} rows), "
+        f"found {totals['discrepancies']} discrepancies, report: {report_path}"
+    )
@@ -0,0 +1,40 @@
+from datetime import date
+
+import click
+from flask.cli import with_appcontext
+
+from app_dir.services.rollup_service import RollupService
+
+
+@click.command("backfill-rollups")
+@click.option(
+    "--from",
+    "first_day",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    required=True,
+    help="First day to rebuild.",
+)
+@click.option(
+    "--to",
+    "last_day",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help="Last day to rebuild (default: today).",
+)
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1),
+    default=5000,
+    show_default=True,
+    help="Number of accounts processed per DB transaction.",
+)
+@with_appcontext
+def backfill_rollups_command(first_day, last_day, chunk_size):
+    """Rebuild the daily transaction rollups from the transaction table."""
+    first_day = first_day.date()
+    last_day = last_day.date() if last_day else date.today()
+    written = RollupService.backfill(first_day, last_day, chunk_size=chunk_size)
+    click.echo(
+        f"Wrote {written} rollup rows for {first_day.isoformat()} "
+        f"to {last_day.isoformat()}"
+    )
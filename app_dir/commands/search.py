@@ -0,0 +1,12 @@
+import click
+from flask.cli import with_appcontext
+
+from app_dir.services.transaction_search_service import TransactionSearchService
+
+
+@click.command("rebuild-transaction-search")
+@with_appcontext
+def rebuild_transaction_search_command():
+    """Rebuild the full-text index of the transaction descriptions."""
+    TransactionSearchService.rebuild()
+    click.echo("Rebuilt the transaction search index")
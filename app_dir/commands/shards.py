@@ -0,0 +1,93 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app_dir.services.shard_service import ShardService
+from app_dir.services.transfer_saga_service import TransferSagaService
+
+
+@click.command("rebalance-shards")
+@click.option(
+    "--user-id",
+    type=int,
+    default=None,
+    help="Move only this user (requires --to-shard).",
+)
+@click.option(
+    "--to-shard",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Shard to move --user-id to.",
+)
+@click.option(
+    "--max-moves",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Stop after moving this many users (default: until balanced).",
+)
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    help="Only print the planned moves.",
+)
+@with_appcontext
+def rebalance_shards_command(user_id, to_shard, max_moves, dry_run):
+    """Move users from the fullest shards to the emptiest ones."""
+    if not ShardService.is_enabled():
+        raise click.UsageError("DATABASE_SHARD_URIS is not set")
+    if (user_id is None) != (to_shard is None):
+        raise click.UsageError("--user-id and --to-shard go together")
+    if to_shard is not None and to_shard >= ShardService.get_shard_count():
+        raise click.UsageError(f"There is no shard {to_shard}")
+
+    if user_id is not None:
+        moves = [(user_id, None, to_shard)]
+    else:
+        moves = ShardService.plan_rebalance(max_moves)
+    for move_user_id, from_shard, move_to_shard in moves:
+        if dry_run:
+            click.echo(
+                f"Would move user {move_user_id} from shard {from_shard} "
+                f"to shard {move_to_shard}"
+            )
+            continue
+        result = ShardService.move_user(
+            move_user_id,
+            move_to_shard,
+            grace_seconds=current_app.config["SHARD_MOVE_GRACE_SECONDS"],
+        )
+        click.echo(
+            f"Moved user {move_user_id} to shard {move_to_shard}: "
+            f"{result['copied']} rows copied, {result['deleted']} deleted"
+        )
+    if not moves:
+        click.echo("Shards are balanced")
+
+
+@click.command("resume-transfer-sagas")
+@click.option(
+    "--min-age",
+    type=click.IntRange(min=0),
+    default=60,
+    show_default=True,
+    help="Only resume transfers that have not progressed for this many seconds.",
+)
+@with_appcontext
+def resume_transfer_sagas_command(min_age):
+    """Finish cross-shard transfers interrupted after the debit."""
+    results = TransferSagaService.resume(min_age)
+    if not results:
+        click.echo("No interrupted transfers")
+    for state, count in sorted(results.items()):
+        click.echo(f"{state}: {count}")
+
+
+@click.command("rebuild-shard-directory")
+@with_appcontext
+def rebuild_shard_directory_command():
+    """Record every user and account of the shards in the directory."""
+    totals = ShardService.rebuild_directory()
+    click.echo(
+        f"Added {totals['users']} users and {totals['accounts']} accounts "
+        "to the shard directory"
+    )
@@ -0,0 +1,12 @@
+import click
+from flask.cli import with_appcontext
+
+from app_dir.services.transaction_count_service import TransactionCountService
+
+
+@click.command("rebuild-transaction-counts")
+@with_appcontext
+def rebuild_transaction_counts_command():
+    """Recount every account's transactions, archived ones included."""
+    written = TransactionCountService.rebuild()
+    click.echo(f"Rebuilt {written} transaction count rows")
@@ -2,6 +2,9 @@ from flask_jwt_extended import JWTManager
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 
+from app_dir.utils.db_pool import instrument_pools
+from app_dir.utils.replica_routing import RoutingSession
+
 
 class Base(DeclarativeBase):
     """Base class for SQLAlchemy models."""
@@ -9,7 +12,7 @@ class Base(DeclarativeBase):
     pass
 
 
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={"class_": RoutingSession})
 jwt = JWTManager()
 
 
@@ -17,3 +20,5 @@ def init_extensions(app):
     """Initialize all Flask extensions"""
     db.init_app(app)
     jwt.init_app(app)
+    with app.app_context():
+        instrument_pools(db.engines)
@@ -0,0 +1,20 @@
+from datetime import date
+
+from app_dir.extensions import db
+
+
+class AccountDailyUsage(db.Model):
+    """Running totals of an account's debits for one day, used for limits."""
+
+    __tablename__ = "account_daily_usage"
+
+    account_number: db.Mapped[int] = db.mapped_column(
+        db.Integer, db.ForeignKey("account.account_number"), primary_key=True
+    )
+    day: db.Mapped[date] = db.mapped_column(db.Date, primary_key=True)
+    withdrawal_total: db.Mapped[float] = db.mapped_column(
+        db.DECIMAL(13, 2), nullable=False, default=0
+    )
+    transfer_total: db.Mapped[float] = db.mapped_column(
+        db.DECIMAL(13, 2), nullable=False, default=0
+    )
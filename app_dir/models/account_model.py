@@ -2,8 +2,12 @@ import hashlib
 import logging
 import os
 from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import func, select
 
 from app_dir.extensions import db
+from app_dir.models.balance_bucket_model import AccountBalanceBucket
 
 logger = logging.getLogger(
     "core"
@@ -13,16 +17,43 @@ logger = logging.getLogger(
 class Account(db.Model):
     __tablename__ = "account"
 
+    # Display name and daily debit limits of each account type.
+    # A limit of None means the account type has no limit.
     valid_account_types = {
-        "CHECKING": "Checking",
-        "SAVINGS": "Savings",
-        "CERTIFICATE OF DEPOSIT": "Certificate of Deposit",
+        "CHECKING": {
+            "name": "Checking",
+            "daily_withdrawal_limit": Decimal("5000.00"),
+            "daily_transfer_limit": Decimal("10000.00"),
+        },
+        "SAVINGS": {
+            "name": "Savings",
+            "daily_withdrawal_limit": Decimal("2500.00"),
+            "daily_transfer_limit": Decimal("10000.00"),
+        },
+        "CERTIFICATE OF DEPOSIT": {
+            "name": "Certificate of Deposit",
+            "daily_withdrawal_limit": Decimal("1000.00"),
+            "daily_transfer_limit": Decimal("1000.00"),
+        },
     }
 
+    # Fields that can be returned by get_account_details()
+    detail_fields = (
+        "account_number",
+        "account_holder",
+        "account_type",
+        "account_name",
+        "balance",
+        "interest_rate",
+        "latest_balance_change",
+        "last_transaction_date",
+        "is_locked",
+    )
+
     # Identity columns
     account_number: db.Mapped[int] = db.mapped_column(
         db.Integer, primary_key=True, autoincrement=True, unique=True
-    )  # TODO: make account number unique and not simply autoincrement.
+    )  # New accounts get their number from AccountNumberService
     user_id: db.Mapped[int] = db.mapped_column(
         db.Integer, db.ForeignKey("user.user_id"), nullable=False
     )
@@ -52,6 +83,10 @@ class Account(db.Model):
     last_transaction_date: db.Mapped[datetime] = db.mapped_column(
         db.DateTime, nullable=False, default=datetime.now(timezone.utc)
     )
+    # Number of sub-balance buckets credits are spread over (0: not bucketed)
+    bucket_count: db.Mapped[int] = db.mapped_column(
+        db.Integer, nullable=False, default=0
+    )
 
     # Security information
     pin_hash: db.Mapped[bytes] = db.mapped_column(db.LargeBinary, nullable=False)
@@ -61,18 +96,39 @@ class Account(db.Model):
     # Relationships
     user = db.relationship("User", back_populates="accounts")
 
-    def get_account_details(self):
-        return {
-            "account_number": self.account_number,
-            "account_holder": self.account_holder,
-            "account_type": self.valid_account_types[self.account_type],
-            "account_name": self.account_name,
-            "balance": self.balance,
-            "interest_rate": self.interest_rate,
-            "latest_balance_change": self.latest_balance_change,
-            "last_transaction_date": self.last_transaction_date,
-            "is_locked": self.is_locked,
-        }
+    def get_account_details(self, fields=None):
+        details = {}
+        for field in fields or self.detail_fields:
+            if field == "account_type":
+                details[field] = self.valid_account_types[self.account_type]["name"]
+            elif field == "balance":
+                details[field] = self.total_balance
+            else:
+                details[field] = getattr(self, field)
+        return details
+
+    @property
+    def total_balance(self):
+        """
+        Balance including the credits held in the sub-balance buckets. Lists
+        of accounts read the bucket sums up front with
+        ``BalanceBucketService.load_bucket_balances``.
+        """
+        if not self.bucket_count:
+            return self.balance
+        bucket_balance = self.__dict__.get("bucket_balance")
+        if bucket_balance is not None:
+            return self.balance + bucket_balance
+        return self.balance + db.session.scalar(
+            select(func.coalesce(func.sum(AccountBalanceBucket.balance), 0)).filter(
+                AccountBalanceBucket.account_number == self.account_number
+            )
+        )
+
+    @staticmethod
+    def hash_pin(pin: str, salt: bytes) -> bytes:
+        """Hash a PIN with the given salt (PBKDF2-SHA256)."""
+        return hashlib.pbkdf2_hmac("sha256", pin.encode("utf-8"), salt, 100000)
 
     def set_pin(self, pin: str) -> None:
         """Securely hash and store the PIN."""
@@ -81,15 +137,12 @@ class Account(db.Model):
             raise ValueError("PIN must be a string")
         salt = os.urandom(32)
         self.pin_salt = salt
-        self.pin_hash = hashlib.pbkdf2_hmac("sha256", pin.encode("utf-8"), salt, 100000)
-        db.session.commit()
+        self.pin_hash = Account.hash_pin(pin, salt)
 
     def verify_pin(self, pin: str) -> bool:
         """Verify if the provided PIN matches this account's PIN."""
         if not self.pin_salt or not self.pin_hash:
             return False
 
-        hash_to_check = hashlib.pbkdf2_hmac(
-            "sha256", pin.encode("utf-8"), self.pin_salt, 100000
-        )
+        hash_to_check = Account.hash_pin(pin, self.pin_salt)
         return hash_to_check == self.pin_hash
@@ -0,0 +1,15 @@
+from app_dir.extensions import db
+
+
+class AccountNumberSequence(db.Model):
+    """
+    Next unreserved value of a number sequence. Processes reserve whole
+    blocks of values at a time (see AccountNumberService).
+    """
+
+    __tablename__ = "account_number_sequence"
+
+    name: db.Mapped[str] = db.mapped_column(db.String(45), primary_key=True)
+    next_value: db.Mapped[int] = db.mapped_column(
+        db.BigInteger, nullable=False, default=0
+    )
@@ -0,0 +1,19 @@
+from decimal import Decimal
+
+from app_dir.extensions import db
+
+
+class ArchivedAccountBalance(db.Model):
+    """
+    Net balance change of an account's archived COMPLETED transactions, the
+    opening balance of the transactions still in the transaction table.
+    """
+
+    __tablename__ = "archived_account_balance"
+
+    account_number: db.Mapped[int] = db.mapped_column(
+        db.Integer, db.ForeignKey("account.account_number"), primary_key=True
+    )
+    net_change: db.Mapped[Decimal] = db.mapped_column(
+        db.DECIMAL(17, 2), nullable=False, default=0
+    )
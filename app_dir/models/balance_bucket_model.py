@@ -0,0 +1,19 @@
+from app_dir.extensions import db
+
+
+class AccountBalanceBucket(db.Model):
+    """
+    Sub-balance of a hot account. Credits to a bucketed account are spread
+    over its buckets instead of all updating the account row; the account's
+    balance is its own balance plus the sum of its buckets.
+    """
+
+    __tablename__ = "account_balance_bucket"
+
+    account_number: db.Mapped[int] = db.mapped_column(
+        db.Integer, db.ForeignKey("account.account_number"), primary_key=True
+    )
+    bucket: db.Mapped[int] = db.mapped_column(db.Integer, primary_key=True)
+    balance: db.Mapped[float] = db.mapped_column(
+        db.DECIMAL(13, 2), nullable=False, default=0
+    )
@@ -0,0 +1,22 @@
+from datetime import date
+
+from app_dir.extensions import db
+
+
+class BalanceSnapshot(db.Model):
+    """Balance of an account at the end of a day."""
+
+    __tablename__ = "balance_snapshot"
+
+    account_number: db.Mapped[int] = db.mapped_column(
+        db.Integer, db.ForeignKey("account.account_number"), primary_key=True
+    )
+    snapshot_date: db.Mapped[date] = db.mapped_column(db.Date, primary_key=True)
+    balance: db.Mapped[float] = db.mapped_column(db.DECIMAL(13, 2), nullable=False)
+
+    def get_snapshot_details(self) -> dict:
+        return {
+            "account_number": self.account_number,
+            "snapshot_date": self.snapshot_date.isoformat(),
+            "balance": self.balance,
+        }
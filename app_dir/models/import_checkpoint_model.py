@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Optional
+
+from app_dir.extensions import db
+
+
+class ImportCheckpoint(db.Model):
+    """
+    Progress of a bulk import of one input file, updated in the same DB
+    transaction as every batch of imported rows.
+    """
+
+    __tablename__ = "import_checkpoint"
+
+    source: db.Mapped[str] = db.mapped_column(db.String(255), primary_key=True)
+    kind: db.Mapped[str] = db.mapped_column(
+        db.Enum("ACCOUNTS", "TRANSACTIONS"), nullable=False
+    )
+    rows_processed: db.Mapped[int] = db.mapped_column(
+        db.Integer, nullable=False, default=0
+    )
+    rows_imported: db.Mapped[int] = db.mapped_column(
+        db.Integer, nullable=False, default=0
+    )
+    rows_rejected: db.Mapped[int] = db.mapped_column(
+        db.Integer, nullable=False, default=0
+    )
+    updated_at: db.Mapped[datetime] = db.mapped_column(db.DateTime, nullable=False)
+    completed_at: db.Mapped[Optional[datetime]] = db.mapped_column(
+        db.DateTime, nullable=True
+    )
@@ -0,0 +1,36 @@
+from datetime import date, datetime
+from typing import Optional
+
+from app_dir.extensions import db
+
+
+class InterestAccrualRun(db.Model):
+    """Progress of the interest accrual for one day, used as a checkpoint."""
+
+    __tablename__ = "interest_accrual_run"
+
+    accrual_date: db.Mapped[date] = db.mapped_column(db.Date, primary_key=True)
+    # Highest account number whose interest has been applied
+    last_account_number: db.Mapped[int] = db.mapped_column(
+        db.Integer, nullable=False, default=0
+    )
+    accounts_processed: db.Mapped[int] = db.mapped_column(
+        db.Integer, nullable=False, default=0
+    )
+    total_interest: db.Mapped[float] = db.mapped_column(
+        db.DECIMAL(17, 2), nullable=False, default=0
+    )
+    started_at: db.Mapped[datetime] = db.mapped_column(db.DateTime, nullable=False)
+    completed_at: db.Mapped[Optional[datetime]] = db.mapped_column(
+        db.DateTime, nullable=True
+    )
+
+    def get_run_details(self) -> dict:
+        return {
+            "accrual_date": self.accrual_date.isoformat(),
+            "last_account_number": self.last_account_number,
+            "accounts_processed": self.accounts_processed,
+            "total_interest": self.total_interest,
+            "started_at": self.started_at,
+            "completed_at": self.completed_at,
+        }
@@ -0,0 +1,40 @@
+import json
+from datetime import datetime
+from typing import Optional
+
+from app_dir.extensions import db
+
+
+class OutboxEvent(db.Model):
+    """
+    Event waiting to be delivered to the notification service. Written in
+    the same DB transaction as the change it describes.
+    """
+
+    __tablename__ = "outbox_event"
+    __table_args__ = (db.Index("idx_outbox_pending", "dispatched_at", "event_id"),)
+
+    event_id: db.Mapped[int] = db.mapped_column(
+        db.Integer, primary_key=True, autoincrement=True
+    )
+    event_type: db.Mapped[str] = db.mapped_column(db.String(50), nullable=False)
+    payload: db.Mapped[str] = db.mapped_column(db.Text, nullable=False)
+    created_at: db.Mapped[datetime] = db.mapped_column(db.DateTime, nullable=False)
+
+    # Delivery tracking
+    attempts: db.Mapped[int] = db.mapped_column(db.Integer, nullable=False, default=0)
+    next_attempt_at: db.Mapped[datetime] = db.mapped_column(db.DateTime, nullable=False)
+    dispatched_at: db.Mapped[Optional[datetime]] = db.mapped_column(
+        db.DateTime, nullable=True
+    )
+    last_error: db.Mapped[Optional[str]] = db.mapped_column(
+        db.String(255), nullable=True
+    )
+
+    def get_event_details(self) -> dict:
+        return {
+            "event_id": self.event_id,
+            "event_type": self.event_type,
+            "payload": json.loads(self.payload),
+            "created_at": self.created_at.isoformat(),
+        }
@@ -0,0 +1,66 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+from app_dir.extensions import db
+
+
+class ScheduledTransfer(db.Model):
+    """
+    Transfer executed once or repeatedly at a fixed frequency (standing
+    order). ``next_run_at`` is the UTC time of the next occurrence.
+    """
+
+    __tablename__ = "scheduled_transfer"
+    __table_args__ = (
+        db.Index("idx_scheduled_transfer_due", "is_active", "next_run_at"),
+        db.Index("idx_scheduled_transfer_user", "user_id"),
+    )
+
+    valid_frequencies = ("ONCE", "DAILY", "WEEKLY", "MONTHLY")
+
+    schedule_id: db.Mapped[int] = db.mapped_column(
+        db.Integer, primary_key=True, autoincrement=True
+    )
+    user_id: db.Mapped[int] = db.mapped_column(
+        db.Integer, db.ForeignKey("user.user_id"), nullable=False
+    )
+    account_from: db.Mapped[int] = db.mapped_column(
+        db.Integer, db.ForeignKey("account.account_number"), nullable=False
+    )
+    account_to: db.Mapped[int] = db.mapped_column(
+        db.Integer, db.ForeignKey("account.account_number"), nullable=False
+    )
+    amount: db.Mapped[Decimal] = db.mapped_column(db.DECIMAL(13, 2), nullable=False)
+    description: db.Mapped[Optional[str]] = db.mapped_column(
+        db.String(255), nullable=True
+    )
+
+    # Schedule: occurrence n runs at starts_at plus n times the frequency
+    frequency: db.Mapped[str] = db.mapped_column(
+        db.Enum(*valid_frequencies), nullable=False
+    )
+    starts_at: db.Mapped[datetime] = db.mapped_column(db.DateTime, nullable=False)
+    run_count: db.Mapped[int] = db.mapped_column(db.Integer, nullable=False, default=0)
+    next_run_at: db.Mapped[datetime] = db.mapped_column(db.DateTime, nullable=False)
+    last_run_at: db.Mapped[Optional[datetime]] = db.mapped_column(
+        db.DateTime, nullable=True
+    )
+    is_active: db.Mapped[bool] = db.mapped_column(
+        db.Boolean, nullable=False, default=True
+    )
+
+    def get_schedule_details(self) -> dict:
+        return {
+            "schedule_id": self.schedule_id,
+            "account_from": self.account_from,
+            "account_to": self.account_to,
+            "amount": self.amount,
+            "description": self.description,
+            "frequency": self.frequency,
+            "starts_at": self.starts_at.isoformat(),
+            "run_count": self.run_count,
+            "next_run_at": self.next_run_at.isoformat() if self.is_active else None,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "is_active": self.is_active,
+        }
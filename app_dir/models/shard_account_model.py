@@ -0,0 +1,13 @@
+from app_dir.extensions import db
+
+
+class ShardAccount(db.Model):
+    """
+    Owner of an account, in the directory (default) database, so the shard
+    of the other account of a transfer can be found.
+    """
+
+    __tablename__ = "shard_account"
+
+    account_number: db.Mapped[int] = db.mapped_column(db.Integer, primary_key=True)
+    user_id: db.Mapped[int] = db.mapped_column(db.Integer, nullable=False, index=True)
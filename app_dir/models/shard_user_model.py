@@ -0,0 +1,20 @@
+from typing import Optional
+
+from app_dir.extensions import db
+
+
+class ShardUser(db.Model):
+    """
+    Shard holding a user's data, in the directory (default) database. User
+    IDs are allocated here so they are unique across shards.
+    """
+
+    __tablename__ = "shard_user"
+
+    user_id: db.Mapped[int] = db.mapped_column(db.Integer, primary_key=True)
+    username: db.Mapped[str] = db.mapped_column(
+        db.String(45), unique=True, nullable=False
+    )
+    shard: db.Mapped[int] = db.mapped_column(db.Integer, nullable=False, index=True)
+    # Shard the user is being moved to; their requests are refused meanwhile
+    moving_to: db.Mapped[Optional[int]] = db.mapped_column(db.Integer, nullable=True)
@@ -0,0 +1,23 @@
+from datetime import date, datetime
+
+from app_dir.extensions import db
+
+
+class TransactionArchive(db.Model):
+    """
+    Month of transactions moved out of the transaction table into a
+    compressed archive file.
+    """
+
+    __tablename__ = "transaction_archive"
+
+    valid_formats = ("NDJSON", "COLUMNAR")
+
+    # First day of the archived month
+    month: db.Mapped[date] = db.mapped_column(db.Date, primary_key=True)
+    path: db.Mapped[str] = db.mapped_column(db.String(255), nullable=False)
+    archive_format: db.Mapped[str] = db.mapped_column(
+        db.Enum(*valid_formats), nullable=False
+    )
+    row_count: db.Mapped[int] = db.mapped_column(db.Integer, nullable=False)
+    archived_at: db.Mapped[datetime] = db.mapped_column(db.DateTime, nullable=False)
@@ -0,0 +1,27 @@
+from app_dir.extensions import db
+
+
+class AccountTransactionCount(db.Model):
+    """
+    Number of transactions of each type (any status) involving an account,
+    archived ones included, so list totals never need a COUNT(*).
+    """
+
+    __tablename__ = "account_transaction_count"
+
+    account_number: db.Mapped[int] = db.mapped_column(
+        db.Integer, db.ForeignKey("account.account_number"), primary_key=True
+    )
+    transaction_type: db.Mapped[str] = db.mapped_column(
+        db.Enum("DEPOSIT", "WITHDRAWAL", "TRANSFER"), primary_key=True
+    )
+    # Hot accounts spread their rows over several buckets; reads sum them
+    bucket: db.Mapped[int] = db.mapped_column(db.Integer, primary_key=True, default=0)
+    transaction_count: db.Mapped[int] = db.mapped_column(
+        db.Integer, nullable=False, default=0
+    )
+    # Transfers from this account to another account of the same owner. They
+    # are counted for both accounts but listed once for the owner.
+    shared_count: db.Mapped[int] = db.mapped_column(
+        db.Integer, nullable=False, default=0
+    )
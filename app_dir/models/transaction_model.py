@@ -1,11 +1,29 @@
+import uuid
 from datetime import datetime, timezone
 from typing import Optional
 
+from sqlalchemy import DDL, event
+
 from app_dir.extensions import db
 
 
 class Transaction(db.Model):
     __tablename__ = "transaction"
+
+    # Fields that can be returned by get_transaction_details()
+    detail_fields = (
+        "transaction_id",
+        "transaction_type",
+        "account_from",
+        "account_to",
+        "amount",
+        "description",
+        "reference_code",
+        "status",
+        "timestamp",
+        "balance_after",
+    )
+
     # Primary key
     transaction_id: db.Mapped[int] = db.mapped_column(
         db.Integer, primary_key=True, autoincrement=True
@@ -22,7 +40,10 @@ class Transaction(db.Model):
         db.String(255), nullable=True
     )
     reference_code: db.Mapped[str] = db.mapped_column(
-        db.String(50), unique=True, nullable=False
+        db.String(50),
+        unique=True,
+        nullable=False,
+        default=lambda: Transaction.generate_reference_code(),
     )
 
     # Account information
@@ -48,19 +69,13 @@ class Transaction(db.Model):
     account_from_relationship = db.relationship("Account", foreign_keys=[account_from])
     account_to_relationship = db.relationship("Account", foreign_keys=[account_to])
 
-    def get_transaction_details(self) -> dict:
-        return {
-            "transaction_id": self.transaction_id,
-            "transaction_type": self.transaction_type,
-            "account_from": self.account_from,
-            "account_to": self.account_to,
-            "amount": self.amount,
-            "description": self.description,
-            "reference_code": self.reference_code,
-            "status": self.status,
-            "timestamp": self.timestamp,
-            "balance_after": self.balance_after,
-        }
+    @staticmethod
+    def generate_reference_code() -> str:
+        """Generate a random, unique reference code for a transaction."""
+        return uuid.uuid4().hex[:20].upper()
+
+    def get_transaction_details(self, fields=None) -> dict:
+        return {field: getattr(self, field) for field in fields or self.detail_fields}
 
     def __repr__(self) -> str:
         return (
@@ -68,3 +83,61 @@ class Transaction(db.Model):
             f"Type: {self.transaction_type},"
             f"Amount: {self.amount}>"
         )
+
+
+# Full-text index of the descriptions, kept up to date by triggers so every
+# insert path is covered (see TransactionSearchService). The accounts of each
+# transaction are indexed as tokens too, so searches are limited to the
+# owner's accounts inside the index. On MySQL it is a table with a FULLTEXT
+# index created by database.sql, on SQLite a contentless FTS5 table.
+SQLITE_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE transaction_search USING fts5("
+    "description, accounts, content='')",
+    """
+    CREATE TRIGGER transaction_search_insert AFTER INSERT ON "transaction" BEGIN
+        INSERT INTO transaction_search (rowid, description, accounts)
+        VALUES (
+            new.transaction_id,
+            new.description,
+            'a' || new.account_from || ' a' || new.account_to
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER transaction_search_delete AFTER DELETE ON "transaction" BEGIN
+        INSERT INTO transaction_search
+            (transaction_search, rowid, description, accounts)
+        VALUES (
+            'delete',
+            old.transaction_id,
+            old.description,
+            'a' || old.account_from || ' a' || old.account_to
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER transaction_search_update AFTER UPDATE OF description
+    ON "transaction" BEGIN
+        INSERT INTO transaction_search
+            (transaction_search, rowid, description, accounts)
+        VALUES (
+            'delete',
+            old.transaction_id,
+            old.description,
+            'a' || old.account_from || ' a' || old.account_to
+        );
+        INSERT INTO transaction_search (rowid, description, accounts)
+        VALUES (
+            new.transaction_id,
+            new.description,
+            'a' || new.account_from || ' a' || new.account_to
+        );
+    END
+    """,
+)
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(
+        Transaction.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="sqlite"),
+    )
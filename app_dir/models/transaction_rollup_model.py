@@ -0,0 +1,31 @@
+from datetime import date
+
+from app_dir.extensions import db
+
+
+class DailyTransactionRollup(db.Model):
+    """
+    Number and total amount of an account's COMPLETED transactions per day,
+    type and direction (money coming in or going out of the account).
+    """
+
+    __tablename__ = "daily_transaction_rollup"
+
+    account_number: db.Mapped[int] = db.mapped_column(
+        db.Integer, db.ForeignKey("account.account_number"), primary_key=True
+    )
+    day: db.Mapped[date] = db.mapped_column(db.Date, primary_key=True)
+    transaction_type: db.Mapped[str] = db.mapped_column(
+        db.Enum("DEPOSIT", "WITHDRAWAL", "TRANSFER"), primary_key=True
+    )
+    direction: db.Mapped[str] = db.mapped_column(
+        db.Enum("CREDIT", "DEBIT"), primary_key=True
+    )
+    # Hot accounts spread their rows over several buckets; reads sum them
+    bucket: db.Mapped[int] = db.mapped_column(db.Integer, primary_key=True, default=0)
+    transaction_count: db.Mapped[int] = db.mapped_column(
+        db.Integer, nullable=False, default=0
+    )
+    total_amount: db.Mapped[float] = db.mapped_column(
+        db.DECIMAL(17, 2), nullable=False, default=0
+    )
@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Optional
+
+from app_dir.extensions import db
+
+
+class TransferSaga(db.Model):
+    """
+    Progress of a transfer between accounts on different shards, in the
+    directory (default) database (see TransferSagaService).
+
+    Both legs of the transfer carry the saga's reference code.
+    """
+
+    __tablename__ = "transfer_saga"
+
+    valid_states = ("STARTED", "DEBITED", "COMPLETED", "COMPENSATED", "FAILED")
+
+    saga_id: db.Mapped[int] = db.mapped_column(
+        db.Integer, primary_key=True, autoincrement=True
+    )
+    reference_code: db.Mapped[str] = db.mapped_column(
+        db.String(20), unique=True, nullable=False
+    )
+    account_from: db.Mapped[int] = db.mapped_column(db.Integer, nullable=False)
+    account_to: db.Mapped[int] = db.mapped_column(db.Integer, nullable=False)
+    from_shard: db.Mapped[int] = db.mapped_column(db.Integer, nullable=False)
+    to_shard: db.Mapped[int] = db.mapped_column(db.Integer, nullable=False)
+    amount: db.Mapped[float] = db.mapped_column(db.DECIMAL(13, 2), nullable=False)
+    description: db.Mapped[Optional[str]] = db.mapped_column(
+        db.String(255), nullable=True
+    )
+    state: db.Mapped[str] = db.mapped_column(
+        db.Enum(*valid_states), nullable=False, index=True
+    )
+    error: db.Mapped[Optional[str]] = db.mapped_column(db.String(255), nullable=True)
+    created_at: db.Mapped[datetime] = db.mapped_column(db.DateTime, nullable=False)
+    updated_at: db.Mapped[datetime] = db.mapped_column(db.DateTime, nullable=False)
@@ -1,10 +1,13 @@
-from flask import Blueprint, jsonify, request
+from datetime import date, datetime, timedelta, timezone
+
+from flask import Blueprint, current_app, jsonify, request
 from flask_jwt_extended import get_current_user, get_jwt_identity, jwt_required
 from sqlalchemy.exc import IntegrityError
 
 from app_dir.constants.http_status import (
     HTTP_BAD_REQUEST,
     HTTP_CREATED,
+    HTTP_FORBIDDEN,
     HTTP_OK,
     HTTP_RESOURCE_NOT_FOUND,
     HTTP_SERVER_ERROR,
@@ -12,9 +15,17 @@ from app_dir.constants.http_status import (
 )
 from app_dir.extensions import db
 from app_dir.models.account_model import Account
+from app_dir.services.account_number_service import AccountNumberService
 from app_dir.services.account_service import AccountService
+from app_dir.services.balance_service import BalanceService, end_of_day
+from app_dir.services.provisioning_service import ProvisioningService
+from app_dir.services.rollup_service import RollupService
+from app_dir.services.shard_service import ShardService
+from app_dir.utils.replica_routing import read_from_replica
+from app_dir.utils.single_flight import SingleFlight, coalesced_json_response
 
 accounts_bp = Blueprint("accounts", __name__)
+account_reads = SingleFlight("accounts.get_account")
 
 
 @accounts_bp.route("/<account_number>/pin", methods=["PUT"])
@@ -126,6 +137,9 @@ def create_account():
         return jsonify({"error": "Invalid account type"}), HTTP_BAD_REQUEST
 
     new_account = Account(
+        account_number=AccountNumberService.next_account_number(
+            current_app.config["ACCOUNT_NUMBER_BLOCK_SIZE"]
+        ),
         account_name=account_name,
         account_holder=user.username,
         account_type=account_type.upper(),
@@ -136,6 +150,7 @@ def create_account():
         new_account.set_pin(account_pin)
     except ValueError as e:
         return jsonify({"error": str(e)}), HTTP_BAD_REQUEST
+    ShardService.register_accounts([(new_account.account_number, user.user_id)])
     db.session.add(new_account)
     db.session.commit()
     return (
@@ -153,8 +168,75 @@ def create_account():
     )
 
 
+@accounts_bp.route("/bulk", methods=["POST"])
+@jwt_required()
+def provision_accounts():
+    """
+    Create many accounts at once, e.g. to onboard a corporate client.
+
+    Requires JWT authentication and the ADMIN role. Nothing is created if
+    any of the accounts is invalid.
+
+    :reqheader Authorization: JWT token required
+
+    Request JSON:
+        * accounts (list): Accounts to create (at most PROVISIONING_MAX_ACCOUNTS),
+          each with:
+
+          * user_id (int): Owner of the account
+          * account_name (str): Name for the new account
+          * account_type (str): Type of account
+          * account_pin (str): 4-digit PIN code to secure the account
+          * account_holder (str, optional): Holder name (default: the
+            owner's username)
+
+    :status 201: Accounts created successfully
+    :status 400: Missing or invalid accounts
+    :status 403: The user is not an admin
+    :status 500: Database or server error
+
+    :return: JSON with the new account numbers, in the order of the request
+    """
+    user = get_current_user()
+    if not [role for role in user.roles.split() if role.upper() == "ADMIN"]:
+        return jsonify({"error": "Admin role required"}), HTTP_FORBIDDEN
+
+    data = request.json
+    if not data or not isinstance(data.get("accounts"), list) or not data["accounts"]:
+        return jsonify({"error": "A list of accounts is required"}), HTTP_BAD_REQUEST
+    max_accounts = current_app.config["PROVISIONING_MAX_ACCOUNTS"]
+    if len(data["accounts"]) > max_accounts:
+        return (
+            jsonify({"error": f"At most {max_accounts} accounts per request"}),
+            HTTP_BAD_REQUEST,
+        )
+
+    try:
+        account_numbers = ProvisioningService.provision_accounts(
+            data["accounts"],
+            workers=current_app.config["PROVISIONING_WORKERS"],
+            chunk_size=current_app.config["PROVISIONING_CHUNK_SIZE"],
+            block_size=current_app.config["ACCOUNT_NUMBER_BLOCK_SIZE"],
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), HTTP_BAD_REQUEST
+    except Exception as e:
+        return jsonify({"error": str(e)}), HTTP_SERVER_ERROR
+
+    return (
+        jsonify(
+            {
+                "message": f"{len(account_numbers)} accounts created successfully",
+                "account_numbers": account_numbers,
+            }
+        ),
+        HTTP_CREATED,
+    )
+
+
 @accounts_bp.route("/<account_number>", methods=["GET"])
 @jwt_required()
+@read_from_replica
 def get_account(account_number):
     """
     Get details of a specific account.
@@ -175,33 +257,256 @@ def get_account(account_number):
     """
     user = get_current_user()
 
-    try:
+    def load_account():
         account = Account.query.filter_by(account_number=account_number).first()
 
         if not account:
-            return jsonify({"error": "Account not found"}), HTTP_RESOURCE_NOT_FOUND
+            return {"error": "Account not found"}, HTTP_RESOURCE_NOT_FOUND
 
         if account.user_id != user.user_id:
             # TODO: use auth account ownership function instead.
             return (
-                jsonify({"error": "You are not authorized to access this account"}),
+                {"error": "You are not authorized to access this account"},
                 HTTP_UNAUTHORIZED,
             )
 
         return (
-            jsonify(
-                {
-                    "account": {
-                        "account_number": account.account_number,
-                        "account_name": account.account_name,
-                        "account_type": account.account_type,
-                        "balance": account.balance,
-                        "holder": account.account_holder,
-                    }
+            {
+                "account": {
+                    "account_number": account.account_number,
+                    "account_name": account.account_name,
+                    "account_type": account.account_type,
+                    "balance": account.total_balance,
+                    "holder": account.account_holder,
                 }
-            ),
+            },
             HTTP_OK,
         )
 
+    try:
+        # Identical concurrent requests share one query and one serialized body
+        return coalesced_json_response(
+            account_reads, (user.user_id, account_number), load_account
+        )
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), HTTP_SERVER_ERROR
+
+
+@accounts_bp.route("", methods=["GET"])
+@jwt_required()
+@read_from_replica
+def get_accounts():
+    """
+    Get details of several accounts in one call.
+
+    Requires JWT authentication.
+
+    :reqheader Authorization: JWT token required
+
+    Query parameters:
+        * ids (str): Comma-separated account numbers, e.g. ``ids=1,2,3``
+          (at most ACCOUNTS_MAX_BATCH_SIZE)
+
+    Every requested account number gets an entry in the response, in the
+    order requested, with its own status: 200 with the account details,
+    401 if it belongs to another user (as for a single account) or 404
+    if it does not exist.
+
+    :status 200: Accounts looked up (see per-account status)
+    :status 400: Missing, invalid or too many account numbers
+    :status 500: Server error
+
+    :return: JSON containing a list of per-account results
+    """
+    user = get_current_user()
+
+    ids = request.args.get("ids")
+    if not ids:
+        return jsonify({"error": "Account numbers are required"}), HTTP_BAD_REQUEST
+
+    try:
+        account_numbers = list(
+            dict.fromkeys(int(number) for number in ids.split(",") if number.strip())
+        )
+    except ValueError:
+        return (
+            jsonify({"error": "Account numbers must be integers"}),
+            HTTP_BAD_REQUEST,
+        )
+
+    max_batch_size = current_app.config["ACCOUNTS_MAX_BATCH_SIZE"]
+    if len(account_numbers) > max_batch_size:
+        return (
+            jsonify(
+                {"error": f"At most {max_batch_size} accounts can be requested at once"}
+            ),
+            HTTP_BAD_REQUEST,
+        )
+
+    try:
+        accounts = AccountService.get_accounts(account_numbers)
+
+        results = []
+        for account_number in account_numbers:
+            account = accounts.get(account_number)
+            if not account:
+                results.append(
+                    {
+                        "account_number": account_number,
+                        "status": HTTP_RESOURCE_NOT_FOUND,
+                        "error": "Account not found",
+                    }
+                )
+            elif account.user_id != user.user_id:
+                results.append(
+                    {
+                        "account_number": account_number,
+                        "status": HTTP_UNAUTHORIZED,
+                        "error": "You are not authorized to access this account",
+                    }
+                )
+            else:
+                results.append(
+                    {
+                        "account_number": account_number,
+                        "status": HTTP_OK,
+                        "account": {
+                            "account_number": account.account_number,
+                            "account_name": account.account_name,
+                            "account_type": account.account_type,
+                            "balance": account.total_balance,
+                            "holder": account.account_holder,
+                        },
+                    }
+                )
+
+        return jsonify({"accounts": results}), HTTP_OK
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), HTTP_SERVER_ERROR
+
+
+@accounts_bp.route("/<account_number>/balance", methods=["GET"])
+@jwt_required()
+@read_from_replica
+def get_account_balance(account_number):
+    """
+    Get the balance of an account at a point in time.
+
+    Requires JWT authentication.
+
+    :param account_number: The account number to get the balance for
+    :type account_number: str
+
+    :reqheader Authorization: JWT token required
+
+    Query parameters:
+        * as_of (str, optional): ISO 8601 date or datetime (default: now).
+          A date means the end of that day; naive datetimes are UTC.
+
+    :status 200: Successfully retrieved balance
+    :status 400: Invalid as_of value, or as_of in the archived months
+    :status 401: Unauthorized: Account doesn't belong to user
+    :status 404: Account not found
+    :status 500: Server error
+
+    :return: JSON containing the balance and the snapshot it was based on
+    """
+    user = get_current_user()
+
+    as_of = request.args.get("as_of")
+    try:
+        if not as_of:
+            as_of = datetime.now(timezone.utc).replace(tzinfo=None)
+        elif len(as_of) == 10:
+            as_of = end_of_day(date.fromisoformat(as_of))
+        else:
+            as_of = datetime.fromisoformat(as_of)
+            if as_of.tzinfo is not None:
+                as_of = as_of.astimezone(timezone.utc).replace(tzinfo=None)
+    except ValueError:
+        return jsonify({"error": "as_of must be an ISO 8601 date"}), HTTP_BAD_REQUEST
+
+    try:
+        account = Account.query.filter_by(account_number=account_number).first()
+
+        if not account:
+            return jsonify({"error": "Account not found"}), HTTP_RESOURCE_NOT_FOUND
+
+        if account.user_id != user.user_id:
+            return (
+                jsonify({"error": "You are not authorized to access this account"}),
+                HTTP_UNAUTHORIZED,
+            )
+
+        balance = BalanceService.get_balance_as_of(account.account_number, as_of)
+        return jsonify({"balance": balance}), HTTP_OK
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), HTTP_BAD_REQUEST
+    except Exception as e:
+        return jsonify({"error": str(e)}), HTTP_SERVER_ERROR
+
+
+@accounts_bp.route("/<account_number>/summary", methods=["GET"])
+@jwt_required()
+@read_from_replica
+def get_account_summary(account_number):
+    """
+    Get transaction statistics of an account over a range of days.
+
+    Requires JWT authentication.
+
+    :param account_number: The account number to summarize
+    :type account_number: str
+
+    :reqheader Authorization: JWT token required
+
+    Query parameters:
+        * from (str, optional): First day, ISO 8601 date (default: 30 days ago)
+        * to (str, optional): Last day, ISO 8601 date (default: today)
+
+    :status 200: Successfully retrieved summary
+    :status 400: Invalid date range
+    :status 401: Unauthorized: Account doesn't belong to user
+    :status 404: Account not found
+    :status 500: Server error
+
+    :return: JSON containing counts and totals per transaction type
+    """
+    user = get_current_user()
+
+    try:
+        today = datetime.now(timezone.utc).date()
+        last_day = date.fromisoformat(request.args.get("to", today.isoformat()))
+        first_day = (
+            date.fromisoformat(request.args["from"])
+            if "from" in request.args
+            else last_day - timedelta(days=29)
+        )
+    except ValueError:
+        return (
+            jsonify({"error": "from and to must be ISO 8601 dates"}),
+            HTTP_BAD_REQUEST,
+        )
+    if first_day > last_day:
+        return jsonify({"error": "from must not be after to"}), HTTP_BAD_REQUEST
+
+    try:
+        account = Account.query.filter_by(account_number=account_number).first()
+
+        if not account:
+            return jsonify({"error": "Account not found"}), HTTP_RESOURCE_NOT_FOUND
+
+        if account.user_id != user.user_id:
+            return (
+                jsonify({"error": "You are not authorized to access this account"}),
+                HTTP_UNAUTHORIZED,
+            )
+
+        summary = RollupService.get_summary(account.account_number, first_day, last_day)
+        return jsonify({"summary": summary}), HTTP_OK
+
     except Exception as e:
         return jsonify({"error": str(e)}), HTTP_SERVER_ERROR
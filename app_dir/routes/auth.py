@@ -204,7 +204,7 @@ def authenticate_account(account_number):
                     "account": {
                         "account_number": account.account_number,
                         "account_name": account.account_name,
-                        "balance": account.balance,
+                        "balance": account.total_balance,
                         "account_type": account.account_type,
                         "holder": account.account_holder,
                         "currency": account.currency,
@@ -0,0 +1,30 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import get_current_user, jwt_required
+
+from app_dir.constants.http_status import HTTP_FORBIDDEN, HTTP_OK
+from app_dir.utils.metrics import collect_metrics
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("", methods=["GET"])
+@jwt_required()
+def get_metrics():
+    """
+    Get in-process performance metrics.
+
+    Requires JWT authentication with the admin role.
+
+    :reqheader Authorization: JWT token required
+
+    :status 200: Metrics retrieved successfully
+    :status 401: Missing or invalid token
+    :status 403: The user is not an admin
+
+    :return: JSON with the metrics of every registered collector
+    """
+    user = get_current_user()
+    if not [role for role in user.roles.split() if role.upper() == "ADMIN"]:
+        return jsonify({"error": "Admin role required"}), HTTP_FORBIDDEN
+
+    return jsonify({"metrics": collect_metrics()}), HTTP_OK
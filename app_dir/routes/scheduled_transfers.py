@@ -0,0 +1,154 @@
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import get_current_user, jwt_required
+
+from app_dir.constants.http_status import (
+    HTTP_BAD_REQUEST,
+    HTTP_CREATED,
+    HTTP_OK,
+    HTTP_RESOURCE_NOT_FOUND,
+    HTTP_SERVER_ERROR,
+)
+from app_dir.services.scheduled_transfer_service import ScheduledTransferService
+
+scheduled_transfers_bp = Blueprint("scheduled_transfers", __name__)
+
+
+@scheduled_transfers_bp.route("", methods=["POST"])
+@jwt_required()
+def create_scheduled_transfer():
+    """
+    Schedule a one-off or recurring transfer (standing order).
+
+    Requires JWT authentication.
+
+    :reqheader Authorization: JWT token required
+
+    Request JSON:
+        * from_account (int): Source account number, owned by the user
+        * to_account (int): Destination account number
+        * amount (str): Amount to transfer at each occurrence
+        * frequency (str): 'once', 'daily', 'weekly' or 'monthly'
+        * starts_at (str, optional): ISO 8601 datetime of the first
+          occurrence, not in the past; naive datetimes are UTC (default: now)
+        * description (str, optional): Description of the transfers
+
+    Monthly transfers keep the day of month of ``starts_at``, clamped to
+    the length of shorter months.
+
+    :status 201: Transfer scheduled
+    :status 400: Missing fields or invalid schedule
+    :status 500: Server error
+
+    :return: JSON containing the schedule
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "Missing request data"}), HTTP_BAD_REQUEST
+
+    from_account = data.get("from_account")
+    to_account = data.get("to_account")
+    frequency = data.get("frequency")
+    if not from_account or not to_account or not frequency:
+        return (
+            jsonify({"error": "from_account, to_account and frequency are required"}),
+            HTTP_BAD_REQUEST,
+        )
+
+    try:
+        amount = Decimal(str(data.get("amount")))
+        if not amount.is_finite():
+            raise ValueError(amount)
+        starts_at = data.get("starts_at")
+        if starts_at:
+            starts_at = datetime.fromisoformat(starts_at)
+            if starts_at.tzinfo is not None:
+                starts_at = starts_at.astimezone(timezone.utc).replace(tzinfo=None)
+        else:
+            starts_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    except (InvalidOperation, ValueError):
+        return (
+            jsonify({"error": "amount must be a number and starts_at ISO 8601"}),
+            HTTP_BAD_REQUEST,
+        )
+
+    try:
+        schedule = ScheduledTransferService.create_schedule(
+            get_current_user(),
+            int(from_account),
+            int(to_account),
+            amount,
+            frequency,
+            starts_at,
+            description=data.get("description"),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), HTTP_BAD_REQUEST
+    except Exception as e:
+        return jsonify({"error": str(e)}), HTTP_SERVER_ERROR
+
+    return jsonify({"schedule": schedule.get_schedule_details()}), HTTP_CREATED
+
+
+@scheduled_transfers_bp.route("", methods=["GET"])
+@jwt_required()
+def get_scheduled_transfers():
+    """
+    Get the authenticated user's active scheduled transfers, soonest first.
+
+    Requires JWT authentication.
+
+    :reqheader Authorization: JWT token required
+
+    :status 200: Successfully retrieved schedules
+    :status 500: Server error
+
+    :return: JSON containing a list of schedules
+    """
+    try:
+        schedules = ScheduledTransferService.get_schedules(get_current_user())
+        return (
+            jsonify(
+                {
+                    "schedules": [
+                        schedule.get_schedule_details() for schedule in schedules
+                    ]
+                }
+            ),
+            HTTP_OK,
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), HTTP_SERVER_ERROR
+
+
+@scheduled_transfers_bp.route("/<int:schedule_id>", methods=["DELETE"])
+@jwt_required()
+def cancel_scheduled_transfer(schedule_id):
+    """
+    Cancel a scheduled transfer. Occurrences already executed are kept.
+
+    Requires JWT authentication.
+
+    :param schedule_id: The ID of the schedule to cancel
+    :type schedule_id: int
+
+    :reqheader Authorization: JWT token required
+
+    :status 200: Schedule cancelled
+    :status 404: Schedule not found or not the user's
+    :status 500: Server error
+
+    :return: JSON containing the cancelled schedule
+    """
+    try:
+        schedule = ScheduledTransferService.cancel_schedule(
+            get_current_user(), schedule_id
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), HTTP_RESOURCE_NOT_FOUND
+    except Exception as e:
+        return jsonify({"error": str(e)}), HTTP_SERVER_ERROR
+
+    return jsonify({"schedule": schedule.get_schedule_details()}), HTTP_OK
@@ -1,18 +1,32 @@
+import math
+import time
 from decimal import Decimal
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request, url_for
 from flask_jwt_extended import get_current_user, jwt_required
 
 from app_dir.constants.http_status import (
+    HTTP_ACCEPTED,
     HTTP_BAD_REQUEST,
     HTTP_CREATED,
     HTTP_OK,
+    HTTP_RESOURCE_NOT_FOUND,
     HTTP_SERVER_ERROR,
+    HTTP_UNAUTHORIZED,
 )
+from app_dir.extensions import db
+from app_dir.models.account_model import Account
+from app_dir.models.transaction_model import Transaction
 from app_dir.services.account_service import AccountService
 from app_dir.services.auth_service import AuthService
+from app_dir.services.settlement_service import SettlementService
+from app_dir.utils.query_utilities import parse_fields
+from app_dir.utils.replica_routing import read_from_replica
+from app_dir.utils.response_utilities import compress_response, to_columnar
+from app_dir.utils.single_flight import SingleFlight, coalesced_json_response
 
 transactions_bp = Blueprint("transactions", __name__)
+transaction_reads = SingleFlight("transactions.get_transactions")
 
 
 @transactions_bp.route("", methods=["POST"])
@@ -36,7 +50,12 @@ def create_transaction():
         * amount (float): Amount to transfer/deposit/withdraw
         * description (str, optional): Description of the transaction
 
+    When ASYNC_SETTLEMENT_ENABLED is set, the transaction is only recorded
+    as PENDING and settled in the background; its status can be followed
+    at the URL in the Location header.
+
     :status 201: Transaction created successfully
+    :status 202: Transaction accepted for asynchronous settlement
     :status 400: Missing required fields or validation error
     :status 500: Server error
 
@@ -66,6 +85,7 @@ def create_transaction():
             },
             "error_message": "Source and destination accounts "
             "are required for transfers",
+            "accounts": (data.get("from_account"), data.get("to_account")),
             "handler": lambda: AccountService.transfer(
                 data.get("from_account"),
                 data.get("to_account"),
@@ -79,6 +99,10 @@ def create_transaction():
                 "account_number": data.get("account_number") or data.get("from_account")
             },
             "error_message": "Account number is required for withdrawals",
+            "accounts": (
+                data.get("account_number") or data.get("from_account"),
+                data.get("account_number") or data.get("from_account"),
+            ),
             "handler": lambda: AccountService.withdrawal(
                 data.get("account_number") or data.get("from_account"),
                 amount,
@@ -91,6 +115,10 @@ def create_transaction():
                 "account_number": data.get("account_number") or data.get("to_account")
             },
             "error_message": "Account number is required for deposits",
+            "accounts": (
+                data.get("account_number") or data.get("to_account"),
+                data.get("account_number") or data.get("to_account"),
+            ),
             "handler": lambda: AccountService.deposit(
                 data.get("account_number") or data.get("to_account"),
                 amount,
@@ -117,6 +145,19 @@ def create_transaction():
         if any(not value for value in config["required_fields"].values()):
             return jsonify({"error": config["error_message"]}), HTTP_BAD_REQUEST
 
+        if current_app.config["ASYNC_SETTLEMENT_ENABLED"]:
+            # Record the transaction as PENDING and let the workers settle it
+            transaction = AccountService.submit_transaction(
+                transaction_type, *config["accounts"], amount, description, user
+            )
+            SettlementService.notify_submitted()
+            response = jsonify(transaction.get_transaction_details())
+            response.headers["Location"] = url_for(
+                "api.v1.transactions.get_transaction",
+                transaction_id=transaction.transaction_id,
+            )
+            return response, HTTP_ACCEPTED
+
         # Execute the transaction
         transaction = config["handler"]()
 
@@ -128,6 +169,7 @@ def create_transaction():
 
 @transactions_bp.route("", methods=["GET"])
 @jwt_required()
+@read_from_replica
 def get_transactions():
     """
     Get transactions for the authenticated user.
@@ -139,14 +181,28 @@ def get_transactions():
     Request JSON:
         * account_number (int, optional): Filter transactions by account number
         * type (str, optional): Filter transactions by type
+        * q (str, optional): Only return transactions whose description
+          contains all these words, best matches first
         * limit (int, optional): Maximum number of transactions to return (default: 30)
         * offset (int, optional): Offset for pagination (default: 0)
+        * fields (str, optional): Comma-separated list of fields to return,
+          e.g. ``fields=amount,timestamp,status`` (default: all fields)
+        * format (str, optional): ``rows`` (default) or ``columnar``. The columnar
+          format returns one list per field, with ``transaction_type`` and
+          ``status`` dictionary-encoded as indexes into ``dictionaries``.
+
+    The response includes ``total``, the number of transactions matching the
+    filters across all pages (null for searches with ``q``).
+
+    The response body is gzip or deflate compressed when the client sends a
+    matching Accept-Encoding header and the body exceeds COMPRESSION_MIN_SIZE.
 
     :status 200: Successfully retrieved transactions
     :status 400: Invalid query parameters
+    :status 401: Unauthorized: The account doesn't belong to the user
     :status 500: Server error
 
-    :return: JSON containing a list of transactions
+    :return: JSON containing a list of transactions and their total
     """
     try:
         user = get_current_user()
@@ -154,25 +210,172 @@ def get_transactions():
         # Get query parameters
         account_number = request.args.get("account_number")
         transaction_type = request.args.get("type")
+        search_query = request.args.get("q")
         limit = request.args.get("limit", 30)
         offset = request.args.get("offset", 0)
+        fields = parse_fields(request.args.get("fields"), Transaction.detail_fields)
+        response_format = request.args.get("format", "rows").lower()
+        if response_format not in ("rows", "columnar"):
+            raise ValueError(f"Unknown response format: {response_format}")
+
+        def load_transactions():
+            if account_number and not AuthService.verify_account_ownership(
+                user, int(account_number)
+            ):
+                return (
+                    {"error": "You are not authorized to access this account"},
+                    HTTP_UNAUTHORIZED,
+                )
+
+            from app_dir.services.transaction_service import TransactionService
+
+            # One read gives the total and tells whether a cached first page
+            # is current
+            counts = None
+            if account_number and not search_query:
+                counts = TransactionService.get_account_counts(account_number)
+
+            transactions = TransactionService.get_transactions(
+                user=user,
+                account_number=account_number,
+                transaction_type=transaction_type,
+                limit=limit,
+                offset=offset,
+                fields=fields,
+                q=search_query,
+                counts=counts,
+            )
 
-        if account_number:
-            AuthService.verify_account_ownership(user, int(account_number))
-
-        from app_dir.services.transaction_service import TransactionService
-
-        transactions = TransactionService.get_transactions(
-            user=user,
-            account_number=account_number,
-            transaction_type=transaction_type,
-            limit=limit,
-            offset=offset,
+            # Searches are not counted ahead of time, so they have no total
+            total = None
+            if not search_query:
+                total = TransactionService.count_transactions(
+                    user, account_number, transaction_type, counts
+                )
+
+            if response_format == "columnar":
+                return (
+                    {
+                        "format": "columnar",
+                        "transactions": to_columnar(
+                            transactions,
+                            fields or Transaction.detail_fields,
+                            dictionary_fields=("transaction_type", "status"),
+                        ),
+                        "total": total,
+                    },
+                    HTTP_OK,
+                )
+            return {"transactions": transactions, "total": total}, HTTP_OK
+
+        # Identical concurrent requests share one query and one serialized body
+        request_key = (
+            user.user_id,
+            int(account_number) if account_number else None,
+            transaction_type.upper() if transaction_type else None,
+            search_query,
+            str(limit),
+            str(offset),
+            fields,
+            response_format,
+        )
+        response = coalesced_json_response(
+            transaction_reads, request_key, load_transactions
         )
 
-        return jsonify({"transactions": transactions}), HTTP_OK
+        compress_response(
+            response,
+            request.headers.get("Accept-Encoding"),
+            current_app.config["COMPRESSION_MIN_SIZE"],
+        )
+        return response
 
     except ValueError as e:
         return jsonify({"error": str(e)}), HTTP_BAD_REQUEST
     except Exception as e:
         return jsonify({"error": str(e)}), HTTP_SERVER_ERROR
+
+
+@transactions_bp.route("/<int:transaction_id>", methods=["GET"])
+@jwt_required()
+def get_transaction(transaction_id):
+    """
+    Get a transaction, optionally waiting for it to be settled.
+
+    Requires JWT authentication.
+
+    :param transaction_id: The ID of the transaction to retrieve
+    :type transaction_id: int
+
+    :reqheader Authorization: JWT token required
+
+    Query parameters:
+        * wait (float, optional): While the transaction is PENDING, wait up to
+          this many seconds for it to settle before responding (long-polling,
+          at most TRANSACTION_STATUS_MAX_WAIT, default: 0)
+
+    :status 200: Successfully retrieved transaction
+    :status 400: Invalid wait value
+    :status 401: Unauthorized: Transaction doesn't involve the user's accounts
+    :status 404: Transaction not found
+    :status 500: Server error
+
+    :return: JSON containing the transaction details
+    """
+    user = get_current_user()
+
+    try:
+        wait = float(request.args.get("wait", 0))
+    except ValueError:
+        wait = None
+    if wait is None or not math.isfinite(wait) or wait < 0:
+        return (
+            jsonify({"error": "wait must be a non-negative number"}),
+            HTTP_BAD_REQUEST,
+        )
+    wait = min(wait, current_app.config["TRANSACTION_STATUS_MAX_WAIT"])
+
+    try:
+        generation = SettlementService.settled_generation()
+        transaction = db.session.get(Transaction, transaction_id)
+        if not transaction:
+            return (
+                jsonify({"error": "Transaction not found"}),
+                HTTP_RESOURCE_NOT_FOUND,
+            )
+
+        owner_ids = {
+            account.user_id
+            for account in Account.query.filter(
+                Account.account_number.in_(
+                    (transaction.account_from, transaction.account_to)
+                )
+            )
+        }
+        if user.user_id not in owner_ids:
+            return (
+                jsonify({"error": "You are not authorized to access this transaction"}),
+                HTTP_UNAUTHORIZED,
+            )
+
+        deadline = time.monotonic() + wait
+        poll_interval = current_app.config["SETTLEMENT_POLL_INTERVAL"]
+        while transaction.status == "PENDING":
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # End the read transaction before waiting, so no snapshot or lock
+            # is held meanwhile and the new status is visible afterwards
+            db.session.rollback()
+            # Woken up early when a batch is settled in this process; the
+            # poll interval covers settlements made by other processes
+            SettlementService.wait_for_settlement(
+                generation, min(remaining, poll_interval)
+            )
+            generation = SettlementService.settled_generation()
+            transaction = db.session.get(Transaction, transaction_id)
+
+        return jsonify(transaction.get_transaction_details()), HTTP_OK
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), HTTP_SERVER_ERROR
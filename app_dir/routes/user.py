@@ -1,5 +1,6 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from flask_jwt_extended import get_current_user, jwt_required
+from sqlalchemy.orm import load_only
 
 from app_dir.constants.http_status import (
     HTTP_BAD_REQUEST,
@@ -10,7 +11,10 @@ from app_dir.constants.http_status import (
     HTTP_UNAUTHORIZED,
 )
 from app_dir.models.account_model import Account
+from app_dir.services.balance_bucket_service import BalanceBucketService
 from app_dir.services.user_service import UserService
+from app_dir.utils.query_utilities import parse_fields
+from app_dir.utils.replica_routing import read_from_replica
 
 # Change from singular to plural for consistency
 user_bp = Blueprint("users", __name__)
@@ -141,6 +145,51 @@ def get_current_user_profile():
         return jsonify({"error": str(e)}), HTTP_SERVER_ERROR
 
 
+@user_bp.route("/current/dashboard", methods=["GET"])
+@jwt_required()
+@read_from_replica
+def get_current_user_dashboard():
+    """
+    Get the current user's profile, accounts and latest transactions
+    in a single call.
+
+    Requires JWT authentication.
+
+    :reqheader Authorization: JWT token required
+
+    Query parameters:
+        * transactions_limit (int, optional): Maximum number of transactions
+          to return per account (default: DASHBOARD_TRANSACTIONS_PER_ACCOUNT)
+
+    :status 200: Dashboard retrieved successfully
+    :status 400: Invalid query parameters
+    :status 401: Not authenticated
+    :status 500: Server error
+
+    :return: JSON with user profile and accounts with their transactions
+    """
+    try:
+        current_user = get_current_user()
+
+        transactions_limit = int(
+            request.args.get(
+                "transactions_limit",
+                current_app.config["DASHBOARD_TRANSACTIONS_PER_ACCOUNT"],
+            )
+        )
+        max_limit = current_app.config["DASHBOARD_MAX_TRANSACTIONS_PER_ACCOUNT"]
+        if transactions_limit < 0 or transactions_limit > max_limit:
+            raise ValueError(f"transactions_limit must be between 0 and {max_limit}")
+
+        dashboard = UserService.get_dashboard(current_user, transactions_limit)
+        return jsonify(dashboard), HTTP_OK
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), HTTP_BAD_REQUEST
+    except Exception as e:
+        return jsonify({"error": str(e)}), HTTP_SERVER_ERROR
+
+
 @user_bp.route("/<user_id>/password", methods=["PUT"])
 @jwt_required()
 def update_password(user_id):
@@ -206,11 +255,21 @@ def get_accounts(user_id):
 
     :reqheader Authorization: JWT token required
 
+    Query parameters:
+        * fields (str, optional): Comma-separated list of fields to return,
+          e.g. ``fields=account_number,balance`` (default: all fields)
+
     :status 200: Successfully retrieved accounts
+    :status 400: Unknown field requested
     :status 500: Server error
 
     :return: JSON contains a list of accounts
     """
+    try:
+        fields = parse_fields(request.args.get("fields"), Account.detail_fields)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), HTTP_BAD_REQUEST
+
     try:
         current_user = get_current_user()
         return_user = UserService.get_user_by_id(user_id)
@@ -218,8 +277,20 @@ def get_accounts(user_id):
             True for role in current_user.roles.split() if role.upper() == "ADMIN"
         ]:
             raise ValueError("Unauthorized to retrieve accounts for this user")
-        accounts = Account.query.filter_by(user_id=user_id).all()
-        account_list = [account.get_account_details() for account in accounts]
+        accounts_query = Account.query.filter_by(user_id=user_id)
+        if fields:
+            # Only load the requested columns from the database, and
+            # bucket_count, which the balance depends on
+            accounts_query = accounts_query.options(
+                load_only(
+                    *(getattr(Account, field) for field in fields),
+                    Account.bucket_count,
+                )
+            )
+        accounts = accounts_query.all()
+        if not fields or "balance" in fields:
+            BalanceBucketService.load_bucket_balances(accounts)
+        account_list = [account.get_account_details(fields) for account in accounts]
 
         return jsonify({"accounts": account_list}), HTTP_OK
 
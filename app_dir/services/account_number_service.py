@@ -0,0 +1,128 @@
+import logging
+import os
+import threading
+from collections import deque
+
+from flask import current_app
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app_dir.extensions import db
+from app_dir.models.account_number_sequence_model import AccountNumberSequence
+from app_dir.utils.account_numbers import account_number_for
+
+logger = logging.getLogger("core")
+
+SEQUENCE_NAME = "account"
+
+
+class AccountNumberService:
+    """
+    Hands out account numbers from blocks reserved per process.
+
+    A block of sequence values is reserved in one short DB transaction of
+    its own, then mapped to unguessable, check-digit-valid account numbers
+    (see app_dir.utils.account_numbers) and handed out from memory, so
+    creating an account needs no extra query and does not contend on the
+    auto-increment lock. Numbers left in a block when the process exits
+    are skipped, never reused.
+    """
+
+    _lock = threading.Lock()
+    _available = deque()
+    # Process the block was reserved in; forked children reserve their own
+    _owner_pid = None
+
+    @staticmethod
+    def next_account_numbers(count=1, block_size=100):
+        """
+        Take ``count`` account numbers, reserving new blocks as needed.
+
+        :return: List of account numbers
+        """
+        with AccountNumberService._lock:
+            if AccountNumberService._owner_pid != os.getpid():
+                AccountNumberService._available.clear()
+                AccountNumberService._owner_pid = os.getpid()
+            available = AccountNumberService._available
+            if len(available) < count:
+                size = max(block_size, count - len(available))
+                first = AccountNumberService._reserve_block(size)
+                key = AccountNumberService._permutation_key()
+                available.extend(
+                    account_number_for(value, key)
+                    for value in range(first, first + size)
+                )
+            return [available.popleft() for _ in range(count)]
+
+    @staticmethod
+    def next_account_number(block_size=100):
+        """Take one account number."""
+        return AccountNumberService.next_account_numbers(1, block_size)[0]
+
+    @staticmethod
+    def _permutation_key():
+        """Key of the permutation of sequence values to account numbers."""
+        config = current_app.config
+        return (config["ACCOUNT_NUMBER_KEY"] or config["JWT_SECRET_KEY"]).encode()
+
+    @staticmethod
+    def _reserve_block(size, sequence=SEQUENCE_NAME):
+        """
+        Advance the sequence by ``size`` on a connection of its own, so the
+        sequence row is only locked for this short transaction.
+
+        :param sequence: Name of the sequence row; other ID ranges (e.g.
+            the user IDs of sharded users) use rows of their own
+
+        :return: First sequence value of the reserved block
+        """
+        sequences = AccountNumberSequence.__table__
+        for _ in range(2):
+            with db.engine.begin() as connection:
+                next_value = AccountNumberService._advance(
+                    connection, sequences, sequence, size
+                )
+                if next_value is not None:
+                    logger.info("Reserved %d values of sequence %s", size, sequence)
+                    return next_value - size
+            try:
+                # First use: create the sequence row
+                with db.engine.begin() as connection:
+                    connection.execute(
+                        insert(sequences).values(name=sequence, next_value=size)
+                    )
+                return 0
+            except IntegrityError:
+                # Created concurrently by another process: reserve again
+                continue
+        raise RuntimeError(f"Could not reserve values of sequence {sequence}")
+
+    @staticmethod
+    def _advance(connection, sequences, sequence, size):
+        """
+        Add ``size`` to a sequence row and read its new value back, in one
+        round trip where the database allows it.
+
+        :return: The new value, or None if the row does not exist yet
+        """
+        row = sequences.c.name == sequence
+        if connection.dialect.name == "mysql":
+            # LAST_INSERT_ID(expr) hands the new value back with the
+            # UPDATE's result, as its last insert ID
+            result = connection.execute(
+                update(sequences)
+                .where(row)
+                .values(next_value=func.last_insert_id(sequences.c.next_value + size))
+            )
+            return result.lastrowid if result.rowcount else None
+        statement = (
+            update(sequences)
+            .where(row)
+            .values(next_value=sequences.c.next_value + size)
+        )
+        if connection.dialect.update_returning:
+            return connection.scalar(statement.returning(sequences.c.next_value))
+        if not connection.execute(statement).rowcount:
+            return None
+        return connection.scalar(select(sequences.c.next_value).where(row))
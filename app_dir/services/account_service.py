@@ -4,14 +4,22 @@ from app_dir.extensions import db
 from app_dir.models.account_model import Account
 from app_dir.models.transaction_model import Transaction
 from app_dir.services.auth_service import AuthService
+from app_dir.services.balance_bucket_service import BalanceBucketService
+from app_dir.services.limit_service import LimitService
+from app_dir.services.outbox_service import OutboxService
+from app_dir.services.recent_transaction_service import RecentTransactionService
+from app_dir.services.rollup_service import RollupService
+from app_dir.services.screening_service import ScreeningService
+from app_dir.services.shard_service import ShardService
+from app_dir.services.transaction_count_service import TransactionCountService
+from app_dir.services.transfer_saga_service import TransferSagaService
+from app_dir.utils.shard_routing import selected_shard
 
 
 class AccountService:
     def __init__(self):
         pass
 
-    # TODO: Add reference code generation for transactions.
-    #  (most likely in the transaction model)
     @staticmethod
     def transfer(
         from_account_number, to_account_number, amount, description=None, user=None
@@ -19,6 +27,13 @@ class AccountService:
         """Process a transfer between two accounts"""
         from_account = Account.query.get(from_account_number)
         to_account = Account.query.get(to_account_number)
+        if from_account and not to_account and ShardService.is_enabled():
+            # The receiving account may live on another shard
+            to_shard = ShardService.get_account_shard(to_account_number)
+            if to_shard is not None and to_shard != selected_shard():
+                return TransferSagaService.transfer(
+                    from_account, to_account_number, to_shard, amount, description, user
+                )
         if not from_account or not to_account:
             raise ValueError(
                 f"Accounts not found for {from_account_number} and {to_account_number}"
@@ -31,6 +46,7 @@ class AccountService:
             transaction_type="TRANSFER",
             description=description or f"Transfer of ${amount:.2f}",
         )
+        screened = None
 
         try:
             # We always assume that the user is the one who owns the from_account
@@ -49,25 +65,48 @@ class AccountService:
             # Check if the transfer amount is valid
             if amount < 0:
                 raise ValueError("Transfer amount cannot be negative")
+            # Debits must see the full balance of bucketed accounts
+            BalanceBucketService.fold(from_account)
             # Check if the transfer amount is greater than the balance
             # of the form account
             if amount > from_account.balance:
                 raise ValueError("Not enough funds in account")
+            screened = ScreeningService.screen(
+                from_account.account_number, "TRANSFER", amount
+            )
+            # Checked last: it records the debit in today's usage
+            LimitService.consume_daily_limit(
+                from_account, "TRANSFER", amount, transaction.timestamp.date()
+            )
 
             from_account.latest_balance_change = -amount
-            to_account.latest_balance_change = +amount
-
             from_account.balance -= amount
-            to_account.balance += amount
+            bucket = BalanceBucketService.credit(to_account, amount)
 
             transaction.balance_after = from_account.balance
             transaction.status = "COMPLETED"
 
             db.session.add(transaction)
+            # Flushed so the outbox event carries the transaction ID
+            db.session.flush()
+            details = transaction.get_transaction_details()
+            RollupService.record_transactions([details], bucket=bucket)
+            TransactionCountService.record_transactions(
+                [details],
+                owners={
+                    from_account.account_number: from_account.user_id,
+                    to_account.account_number: to_account.user_id,
+                },
+                bucket=bucket,
+            )
+            OutboxService.enqueue_transactions([details])
             db.session.commit()
+            RecentTransactionService.record(transaction)
             return transaction
 
         except Exception as e:
+            # Failed debits do not count towards the velocity limits
+            ScreeningService.release(screened)
             transaction.status = "FAILED"
             transaction.balance_after = from_account.balance
             transaction.reason = str(e)
@@ -88,6 +127,7 @@ class AccountService:
             transaction_type="DEPOSIT",
             description=description or f"Deposit of ${amount:.2f}",
         )
+        screened = None
 
         try:
             if not AuthService.verify_account_ownership(user, account_number):
@@ -98,24 +138,41 @@ class AccountService:
                 raise ValueError(f"Account {account_number} is locked")
             if amount < 0:
                 raise ValueError("Withdraw amount cannot be negative")
+            screened = ScreeningService.screen(
+                account.account_number, "DEPOSIT", amount
+            )
 
-            account.latest_balance_change = +amount
-            account.balance += amount
+            bucket = BalanceBucketService.credit(account, amount)
 
-            transaction.balance_after = account.balance
+            transaction.balance_after = account.total_balance
             transaction.status = "COMPLETED"
 
             db.session.add(transaction)
+            # Flushed so the outbox event carries the transaction ID
+            db.session.flush()
+            details = transaction.get_transaction_details()
+            RollupService.record_transactions([details], bucket=bucket)
+            TransactionCountService.record_transactions([details], bucket=bucket)
+            OutboxService.enqueue_transactions([details])
 
             db.session.commit()
+            RecentTransactionService.record(transaction)
             return transaction
         except ValueError as e:
+            ScreeningService.release(screened)
             transaction.status = "FAILED"
-            transaction.balance_after = account.balance
+            transaction.balance_after = account.total_balance
             transaction.reason = str(e)
             db.session.add(transaction)
+            TransactionCountService.record_transactions(
+                [transaction.get_transaction_details()]
+            )
             db.session.commit()
+            RecentTransactionService.record(transaction)
             return transaction
+        except Exception:
+            ScreeningService.release(screened)
+            raise
 
     @staticmethod
     def withdrawal(account_number, amount, description=None, user=None):
@@ -131,6 +188,7 @@ class AccountService:
             transaction_type="WITHDRAWAL",
             description=description or f"Withdrawal of ${amount:.2f}",
         )
+        screened = None
 
         try:
             if not AuthService.verify_account_ownership(user, account_number):
@@ -141,8 +199,17 @@ class AccountService:
                 raise ValueError(f"Account {account_number} is locked")
             if amount < 0:
                 raise ValueError("Withdraw amount cannot be negative")
+            # Debits must see the full balance of bucketed accounts
+            BalanceBucketService.fold(account)
             if amount > account.balance:
                 raise ValueError("Not enough funds in account.")
+            screened = ScreeningService.screen(
+                account.account_number, "WITHDRAWAL", amount
+            )
+            # Checked last: it records the debit in today's usage
+            LimitService.consume_daily_limit(
+                account, "WITHDRAWAL", amount, transaction.timestamp.date()
+            )
 
             account.latest_balance_change = -amount
             account.balance -= amount
@@ -151,17 +218,159 @@ class AccountService:
             transaction.status = "COMPLETED"
 
             db.session.add(transaction)
+            # Flushed so the outbox event carries the transaction ID
+            db.session.flush()
+            details = transaction.get_transaction_details()
+            RollupService.record_transactions([details])
+            TransactionCountService.record_transactions([details])
+            OutboxService.enqueue_transactions([details])
 
             db.session.commit()
+            RecentTransactionService.record(transaction)
             return transaction
         except ValueError as e:
+            # Failed debits do not count towards the velocity limits
+            ScreeningService.release(screened)
             transaction.status = "FAILED"
-            transaction.balance_after = account.balance
+            transaction.balance_after = account.total_balance
             transaction.reason = str(e)  # TODO: add exception system for fail reasoning
             db.session.add(transaction)
+            TransactionCountService.record_transactions(
+                [transaction.get_transaction_details()]
+            )
             db.session.commit()
+            RecentTransactionService.record(transaction)
             # TODO: Add better logging.
             return transaction
+        except Exception:
+            ScreeningService.release(screened)
+            raise
+
+    @staticmethod
+    def submit_transaction(
+        transaction_type,
+        from_account_number,
+        to_account_number,
+        amount,
+        description=None,
+        user=None,
+    ):
+        """
+        Record a transaction as PENDING, to be settled asynchronously by
+        the settlement workers (see SettlementService).
+        """
+        transaction_type = transaction_type.upper()
+        from_account = Account.query.get(from_account_number)
+        to_account = Account.query.get(to_account_number)
+        if not from_account or not to_account:
+            raise ValueError(
+                f"Accounts not found for {from_account_number} and {to_account_number}"
+            )
+        # Transfers and withdrawals are checked against the source account,
+        # deposits against the account being deposited to
+        owned_account = to_account if transaction_type == "DEPOSIT" else from_account
+        if not AuthService.verify_account_ownership(user, owned_account.account_number):
+            raise ValueError("Account does not belong to the user")
+        if amount < 0:
+            raise ValueError("Transaction amount cannot be negative")
+
+        transaction = Transaction(
+            account_from=from_account.account_number,
+            account_to=to_account.account_number,
+            amount=amount,
+            timestamp=datetime.now(timezone.utc),
+            transaction_type=transaction_type,
+            description=description
+            or f"{transaction_type.capitalize()} of ${amount:.2f}",
+            status="PENDING",
+            balance_after=from_account.total_balance,
+        )
+        db.session.add(transaction)
+        TransactionCountService.record_transactions(
+            [transaction.get_transaction_details()],
+            owners={
+                from_account.account_number: from_account.user_id,
+                to_account.account_number: to_account.user_id,
+            },
+        )
+        db.session.commit()
+        RecentTransactionService.record(transaction)
+        return transaction
+
+    @staticmethod
+    def settle_pending_transaction(transaction):
+        """
+        Apply a PENDING transaction to the account balances and mark it
+        COMPLETED. Does not commit.
+
+        :return: False if the transaction was settled meanwhile by someone
+            else, and was left untouched
+        :raises ValueError: If the transaction cannot be settled; the caller
+            is responsible for rolling back and marking it FAILED
+        """
+        # Lock the rows so concurrent settlements of the same accounts queue
+        from_account = db.session.get(
+            Account, transaction.account_from, with_for_update=True
+        )
+        to_account = (
+            from_account
+            if transaction.account_to == transaction.account_from
+            else db.session.get(Account, transaction.account_to, with_for_update=True)
+        )
+        # Another settlement may have applied it while we waited for the locks
+        db.session.refresh(transaction, with_for_update=True)
+        if transaction.status != "PENDING":
+            return False
+        amount = transaction.amount
+        transaction_type = transaction.transaction_type
+
+        if from_account.is_locked or to_account.is_locked:
+            raise ValueError("One or both accounts are locked")
+        if amount < 0:
+            raise ValueError("Transaction amount cannot be negative")
+        if transaction_type != "DEPOSIT":
+            # Debits must see the full balance of bucketed accounts
+            BalanceBucketService.fold(from_account)
+        if transaction_type != "DEPOSIT" and amount > from_account.balance:
+            raise ValueError("Not enough funds in account")
+        screened = ScreeningService.screen(
+            from_account.account_number, transaction_type, amount
+        )
+        try:
+            if transaction_type != "DEPOSIT":
+                # Checked last: it records the debit in today's usage
+                LimitService.consume_daily_limit(
+                    from_account, transaction_type, amount, transaction.timestamp.date()
+                )
+
+            bucket = 0
+            if transaction_type != "DEPOSIT":
+                from_account.latest_balance_change = -amount
+                from_account.balance -= amount
+            if transaction_type != "WITHDRAWAL":
+                bucket = BalanceBucketService.credit(to_account, amount)
+
+            transaction.balance_after = from_account.total_balance
+            transaction.status = "COMPLETED"
+            details = transaction.get_transaction_details()
+            RollupService.record_transactions([details], bucket=bucket)
+            OutboxService.enqueue_transactions([details])
+        except Exception:
+            # Failed transactions do not count towards the velocity limits
+            ScreeningService.release(screened)
+            raise
+        return True
+
+    @staticmethod
+    def get_accounts(account_numbers):
+        """Get several accounts with a single query, keyed by account number"""
+        if not account_numbers:
+            return {}
+        accounts = Account.query.filter(
+            Account.account_number.in_(account_numbers)
+        ).all()
+        BalanceBucketService.load_bucket_balances(accounts)
+        return {account.account_number: account for account in accounts}
 
     @staticmethod
     def change_account_pin(user_id, account_number, current_pin, new_pin):
@@ -0,0 +1,292 @@
+import logging
+import os
+import re
+from collections import defaultdict
+from datetime import date, datetime, time, timezone
+
+from sqlalchemy import delete, desc, func, select, text
+
+from app_dir.extensions import db
+from app_dir.models.archived_balance_model import ArchivedAccountBalance
+from app_dir.models.transaction_archive_model import TransactionArchive
+from app_dir.models.transaction_model import Transaction
+from app_dir.services.balance_service import CREDIT_TYPES, DEBIT_TYPES
+from app_dir.services.transaction_search_service import TransactionSearchService
+from app_dir.utils.fixed_point import from_cents, to_cents
+from app_dir.utils.transaction_archive import (
+    EXTENSIONS,
+    encode_transaction,
+    read_archive,
+    write_archive,
+)
+from app_dir.utils.upsert import increment_counters
+
+logger = logging.getLogger("core")
+
+
+def add_months(month: date, months: int) -> date:
+    """Return the first day of the month ``months`` after ``month``."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Name of the monthly partition of the transaction table."""
+    return f"p{month:%Y%m}"
+
+
+class TransactionArchiveService:
+    """
+    Monthly archiving of the transaction table.
+
+    On MySQL the table is range-partitioned by month (see database.sql).
+    Archiving a month writes its transactions to a compressed file, records
+    the file and the month's net balance change per account, then drops
+    the month's partition (or deletes its rows on other databases).
+    Archived months are always the oldest ones, so the transaction table
+    only holds the transactions from ``get_archived_until()`` on.
+    """
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def get_archived_until():
+        """
+        Return the first day after the archived months, or None if nothing
+        was archived. Older transactions are only in the archive files.
+        """
+        last_month = db.session.scalar(select(func.max(TransactionArchive.month)))
+        return add_months(last_month, 1) if last_month else None
+
+    @staticmethod
+    def get_archived_transactions(
+        account_numbers,
+        transaction_type=None,
+        offset=0,
+        limit=30,
+        fields=None,
+        terms=None,
+    ):
+        """
+        Get a page of archived transactions involving ``account_numbers``,
+        newest first, continuing the order of the transaction table. With
+        search ``terms``, only the transactions whose description matches
+        them are included.
+
+        :return: List of transaction dicts with ``fields`` (default: all)
+        """
+        account_numbers = set(account_numbers)
+        transactions = []
+        archives = TransactionArchive.query.order_by(desc(TransactionArchive.month))
+        for archive in archives:
+            if limit <= 0:
+                break
+            rows = read_archive(
+                archive.path, archive.archive_format, account_numbers, transaction_type
+            )
+            if terms:
+                rows = [
+                    row
+                    for row in rows
+                    if TransactionSearchService.matches(row["description"], terms)
+                ]
+            if offset >= len(rows):
+                offset -= len(rows)
+                continue
+            page = rows[offset : offset + limit]
+            offset = 0
+            limit -= len(page)
+            transactions.extend(page)
+
+        if fields:
+            return [{field: row[field] for field in fields} for row in transactions]
+        return transactions
+
+    @staticmethod
+    def archive_before(cutoff_month: date, archive_dir, archive_format="COLUMNAR"):
+        """
+        Archive every month before ``cutoff_month``, oldest first.
+
+        :return: List of the months archived
+        """
+        archived_until = TransactionArchiveService.get_archived_until()
+        if archived_until:
+            # Finish dropping the last month if a previous run was interrupted
+            TransactionArchiveService._drop_month(add_months(archived_until, -1))
+            month = archived_until
+        else:
+            oldest = db.session.scalar(select(func.min(Transaction.timestamp)))
+            db.session.rollback()
+            if oldest is None:
+                return []
+            month = oldest.date().replace(day=1)
+
+        archived = []
+        while month < cutoff_month:
+            TransactionArchiveService.archive_month(month, archive_dir, archive_format)
+            archived.append(month)
+            month = add_months(month, 1)
+        return archived
+
+    @staticmethod
+    def archive_month(month: date, archive_dir, archive_format="COLUMNAR"):
+        """
+        Archive one month: write its transactions to a file, record the
+        archive and the accounts' net changes in one DB transaction, then
+        drop the month from the transaction table.
+
+        :return: The TransactionArchive of the month
+        """
+        archive_format = archive_format.upper()
+        if archive_format not in TransactionArchive.valid_formats:
+            raise ValueError(f"Unknown archive format: {archive_format}")
+        start = datetime.combine(month, time.min)
+        end = datetime.combine(add_months(month, 1), time.min)
+        transactions = Transaction.__table__
+        net_changes = defaultdict(int)
+
+        def archived_rows():
+            result = db.session.execute(
+                select(transactions)
+                .where(
+                    transactions.c.timestamp >= start, transactions.c.timestamp < end
+                )
+                .order_by(
+                    desc(transactions.c.timestamp), desc(transactions.c.transaction_id)
+                )
+                .execution_options(yield_per=10000)
+            )
+            for row in result.mappings():
+                if row["status"] == "COMPLETED":
+                    cents = to_cents(row["amount"])
+                    if row["transaction_type"] in CREDIT_TYPES:
+                        net_changes[row["account_to"]] += cents
+                    if row["transaction_type"] in DEBIT_TYPES:
+                        net_changes[row["account_from"]] -= cents
+                yield encode_transaction(row)
+
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(
+            archive_dir, f"transactions-{month:%Y-%m}.{EXTENSIONS[archive_format]}"
+        )
+        row_count = write_archive(path, archived_rows(), archive_format)
+
+        archive = TransactionArchive(
+            month=month,
+            path=path,
+            archive_format=archive_format,
+            row_count=row_count,
+            archived_at=datetime.now(timezone.utc),
+        )
+        try:
+            db.session.add(archive)
+            increment_counters(
+                db.session,
+                ArchivedAccountBalance,
+                [
+                    {"account_number": account_number, "net_change": from_cents(cents)}
+                    for account_number, cents in net_changes.items()
+                ],
+                ("account_number",),
+                ("net_change",),
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        TransactionArchiveService._drop_month(month)
+        logger.info("Archived %d transactions of %s to %s", row_count, month, path)
+        return archive
+
+    @staticmethod
+    def _get_partitions():
+        """Return the names of the transaction table's partitions (MySQL)."""
+        if db.session.get_bind().dialect.name != "mysql":
+            return set()
+        return set(
+            db.session.execute(
+                text(
+                    "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                    "WHERE TABLE_SCHEMA = DATABASE() "
+                    "AND TABLE_NAME = 'transaction' AND PARTITION_NAME IS NOT NULL"
+                )
+            )
+            .scalars()
+            .all()
+        )
+
+    @staticmethod
+    def _drop_month(month: date, chunk_size=10000):
+        """Remove a month's transactions from the transaction table."""
+        name = partition_name(month)
+        if name in TransactionArchiveService._get_partitions():
+            db.session.execute(text(f"ALTER TABLE `transaction` DROP PARTITION {name}"))
+            db.session.commit()
+            TransactionSearchService.purge_before(
+                datetime.combine(add_months(month, 1), time.min)
+            )
+            return
+
+        # No partition of its own: delete the rows in chunks
+        start = datetime.combine(month, time.min)
+        end = datetime.combine(add_months(month, 1), time.min)
+        while True:
+            transaction_ids = (
+                db.session.execute(
+                    select(Transaction.transaction_id)
+                    .filter(Transaction.timestamp >= start, Transaction.timestamp < end)
+                    .limit(chunk_size)
+                )
+                .scalars()
+                .all()
+            )
+            if not transaction_ids:
+                db.session.rollback()
+                return
+            db.session.execute(
+                delete(Transaction).where(
+                    Transaction.transaction_id.in_(transaction_ids)
+                ),
+                execution_options={"synchronize_session": False},
+            )
+            db.session.commit()
+
+    @staticmethod
+    def add_partitions(months_ahead=3):
+        """
+        Make sure the transaction table has a partition for every month up
+        to ``months_ahead`` months from now, by splitting the catch-all
+        ``p_future`` partition. Only applies to MySQL.
+
+        :return: Names of the partitions added
+        """
+        partitions = TransactionArchiveService._get_partitions()
+        if "p_future" not in partitions:
+            logger.info("The transaction table is not partitioned, nothing to add")
+            return []
+
+        added = []
+        month = date.today().replace(day=1)
+        last_month = add_months(month, months_ahead)
+        # Partitions can only be added after the last monthly one
+        monthly = sorted(name for name in partitions if re.fullmatch(r"p\d{6}", name))
+        if monthly:
+            newest = date(int(monthly[-1][1:5]), int(monthly[-1][5:7]), 1)
+            month = max(month, add_months(newest, 1))
+        while month <= last_month:
+            name = partition_name(month)
+            if name not in partitions:
+                db.session.execute(
+                    text(
+                        "ALTER TABLE `transaction` REORGANIZE PARTITION p_future INTO ("
+                        f"PARTITION {name} VALUES LESS THAN "
+                        f"('{add_months(month, 1).isoformat()}'), "
+                        "PARTITION p_future VALUES LESS THAN (MAXVALUE))"
+                    )
+                )
+                added.append(name)
+            month = add_months(month, 1)
+        db.session.commit()
+        return added
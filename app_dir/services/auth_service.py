@@ -8,6 +8,7 @@ from app_dir.extensions import jwt
 from app_dir.models.account_model import Account
 from app_dir.models.jwttoken import JWTToken
 from app_dir.models.user_model import User
+from app_dir.services.shard_service import ShardService
 from app_dir.services.user_service import UserService
 
 
@@ -24,6 +25,7 @@ def add_additional_claims(identity):
     user = UserService.get_user_by_username(identity)
     if user:
         return {
+            "user_id": user.user_id,
             "username": user.username,
             "email": user.email,
             "roles": user.roles,
@@ -40,6 +42,8 @@ def unauthenticated_response(auth_error_response: str):
 
 @jwt.token_in_blocklist_loader
 def token_in_blocklist(jwt_header, jwt_payload):
+    # Runs first for every protected request: select the user's shard
+    ShardService.select_for_claims(jwt_payload)
     try:
         identity = jwt_payload["jti"]
         token = JWTToken.query.filter_by(id=identity).one_or_none()
@@ -85,6 +89,7 @@ class AuthService:
         """Authenticate user with username and password.
         Checks if the provided password matches the stored hash.
         Return the user object if authentication is successful."""
+        ShardService.select_for_username(username)
         user = User.query.filter_by(
             username=username
         ).first()  # remember that username might not be unique
@@ -0,0 +1,176 @@
+import random
+
+from sqlalchemy import case, delete, func, insert, select, update
+
+from app_dir.extensions import db
+from app_dir.models.account_model import Account
+from app_dir.models.balance_bucket_model import AccountBalanceBucket
+
+
+class BalanceBucketService:
+    """
+    Sub-balance buckets for hot accounts.
+
+    Credits to a bucketed account add to one of its buckets, picked at
+    random, so concurrent deposits lock different rows instead of queuing
+    on the account row. Debits first fold the buckets into the account
+    balance, so they always check and change the full balance. Batch reads
+    use ``total_balance_expression`` to include the buckets.
+    """
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def total_balance_expression():
+        """SQL expression of an account's balance including its buckets."""
+        accounts = Account.__table__
+        buckets = AccountBalanceBucket.__table__
+        bucketed_balance = (
+            select(func.coalesce(func.sum(buckets.c.balance), 0))
+            .where(buckets.c.account_number == accounts.c.account_number)
+            .scalar_subquery()
+        )
+        return case(
+            (accounts.c.bucket_count > 0, accounts.c.balance + bucketed_balance),
+            else_=accounts.c.balance,
+        )
+
+    @staticmethod
+    def load_bucket_balances(accounts):
+        """
+        Read the bucket sums of the bucketed ``accounts`` with one grouped
+        query, so ``Account.total_balance`` needs no query per account.
+        """
+        bucketed = [account for account in accounts if account.bucket_count]
+        if not bucketed:
+            return
+        sums = dict(
+            db.session.execute(
+                select(
+                    AccountBalanceBucket.account_number,
+                    func.sum(AccountBalanceBucket.balance),
+                )
+                .filter(
+                    AccountBalanceBucket.account_number.in_(
+                        [account.account_number for account in bucketed]
+                    )
+                )
+                .group_by(AccountBalanceBucket.account_number)
+            ).all()
+        )
+        for account in bucketed:
+            account.bucket_balance = sums.get(account.account_number, 0)
+
+    @staticmethod
+    def credit(account, amount):
+        """
+        Add ``amount`` to an account, in a random bucket if it is bucketed.
+        Does not commit.
+
+        :return: Bucket credited (0 for accounts that are not bucketed), to
+            spread the account's rollup rows the same way
+        """
+        if not account.bucket_count:
+            account.latest_balance_change = +amount
+            account.balance += amount
+            return 0
+
+        # Bucket sums read before this credit are stale
+        account.__dict__.pop("bucket_balance", None)
+        bucket = random.randrange(account.bucket_count)
+        db.session.execute(
+            update(AccountBalanceBucket)
+            .where(
+                AccountBalanceBucket.account_number == account.account_number,
+                AccountBalanceBucket.bucket == bucket,
+            )
+            .values(balance=AccountBalanceBucket.balance + amount),
+            execution_options={"synchronize_session": False},
+        )
+        return bucket
+
+    @staticmethod
+    def fold(account):
+        """
+        Move the balance of an account's buckets into the account balance,
+        locking the account and its buckets. Does not commit.
+
+        :return: Amount moved
+        """
+        if not account.bucket_count:
+            return 0
+
+        account.__dict__.pop("bucket_balance", None)
+        db.session.refresh(account, with_for_update=True)
+        bucket_balances = (
+            db.session.execute(
+                select(AccountBalanceBucket.balance)
+                .filter(AccountBalanceBucket.account_number == account.account_number)
+                .with_for_update()
+            )
+            .scalars()
+            .all()
+        )
+        amount = sum(bucket_balances)
+        if amount:
+            db.session.execute(
+                update(AccountBalanceBucket)
+                .where(AccountBalanceBucket.account_number == account.account_number)
+                .values(balance=0),
+                execution_options={"synchronize_session": False},
+            )
+            account.balance += amount
+        return amount
+
+    @staticmethod
+    def fold_all():
+        """
+        Fold the buckets of every bucketed account, one DB transaction per
+        account.
+
+        :return: Number of accounts folded
+        """
+        accounts = Account.query.filter(Account.bucket_count > 0).all()
+        for account in accounts:
+            try:
+                BalanceBucketService.fold(account)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        return len(accounts)
+
+    @staticmethod
+    def set_bucket_count(account_number, bucket_count):
+        """
+        Spread an account's credits over ``bucket_count`` buckets, or stop
+        bucketing it with 0. Existing buckets are folded first.
+        """
+        account = db.session.get(Account, account_number)
+        if account is None:
+            raise ValueError(f"Account {account_number} not found")
+        if bucket_count < 0:
+            raise ValueError("Bucket count cannot be negative")
+
+        try:
+            BalanceBucketService.fold(account)
+            db.session.execute(
+                delete(AccountBalanceBucket).where(
+                    AccountBalanceBucket.account_number == account_number
+                )
+            )
+            if bucket_count:
+                db.session.execute(
+                    insert(AccountBalanceBucket),
+                    [
+                        {"account_number": account_number, "bucket": bucket}
+                        for bucket in range(bucket_count)
+                    ],
+                )
+            account.bucket_count = bucket_count
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return account
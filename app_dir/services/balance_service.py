@@ -0,0 +1,243 @@
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import and_, case, delete, desc, func, insert, select
+
+from app_dir.extensions import db
+from app_dir.models.account_model import Account
+from app_dir.models.archived_balance_model import ArchivedAccountBalance
+from app_dir.models.balance_snapshot_model import BalanceSnapshot
+from app_dir.models.transaction_archive_model import TransactionArchive
+from app_dir.models.transaction_model import Transaction
+from app_dir.services.balance_bucket_service import BalanceBucketService
+from app_dir.utils.fixed_point import from_cents, to_cents
+
+# Transaction types that credit ``account_to`` and debit ``account_from``
+CREDIT_TYPES = ("DEPOSIT", "TRANSFER")
+DEBIT_TYPES = ("WITHDRAWAL", "TRANSFER")
+
+
+def end_of_day(day: date) -> datetime:
+    """Last representable instant of ``day``."""
+    return datetime.combine(day, time.max)
+
+
+class BalanceService:
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def get_balance_changes(account_numbers, after=None, up_to=None):
+        """
+        Get the net effect of COMPLETED transactions on several accounts.
+
+        Credits (deposits and incoming transfers) and debits (withdrawals
+        and outgoing transfers) are summed with one grouped query each.
+
+        :param account_numbers: Accounts to compute the changes for
+        :param after: Only count transactions strictly after this time
+        :param up_to: Only count transactions at or before this time
+        :return: Dict mapping account numbers to the net change in cents
+        """
+        changes = {account_number: 0 for account_number in account_numbers}
+        if not account_numbers:
+            return changes
+
+        time_filters = [Transaction.status == "COMPLETED"]
+        if after is not None:
+            time_filters.append(Transaction.timestamp > after)
+        if up_to is not None:
+            time_filters.append(Transaction.timestamp <= up_to)
+
+        for column, types, sign in (
+            (Transaction.account_to, CREDIT_TYPES, 1),
+            (Transaction.account_from, DEBIT_TYPES, -1),
+        ):
+            rows = db.session.execute(
+                select(column, func.sum(Transaction.amount))
+                .filter(
+                    column.in_(account_numbers),
+                    Transaction.transaction_type.in_(types),
+                    *time_filters,
+                )
+                .group_by(column)
+            ).all()
+            for account_number, amount in rows:
+                changes[account_number] += sign * to_cents(amount)
+
+        return changes
+
+    @staticmethod
+    def get_balance_change(account_number, after=None, up_to=None):
+        """Get the net effect in cents of transactions on one account."""
+        filters = [
+            (Transaction.account_from == account_number)
+            | (Transaction.account_to == account_number),
+            Transaction.status == "COMPLETED",
+        ]
+        if after is not None:
+            filters.append(Transaction.timestamp > after)
+        if up_to is not None:
+            filters.append(Transaction.timestamp <= up_to)
+
+        credit = case(
+            (
+                and_(
+                    Transaction.account_to == account_number,
+                    Transaction.transaction_type.in_(CREDIT_TYPES),
+                ),
+                Transaction.amount,
+            ),
+            else_=0,
+        )
+        debit = case(
+            (
+                and_(
+                    Transaction.account_from == account_number,
+                    Transaction.transaction_type.in_(DEBIT_TYPES),
+                ),
+                Transaction.amount,
+            ),
+            else_=0,
+        )
+        change = db.session.execute(
+            select(func.sum(credit) - func.sum(debit)).filter(*filters)
+        ).scalar()
+        return to_cents(change or 0)
+
+    @staticmethod
+    def create_snapshots(snapshot_date: date, chunk_size=5000):
+        """
+        Record the end-of-day balance of every account for ``snapshot_date``.
+
+        The balance at the end of the day is the current balance minus the
+        transactions made since, so only the recent part of the history is
+        read. Accounts are processed in keyset chunks, one DB transaction
+        per chunk, and snapshots already taken for the day are replaced.
+
+        :param snapshot_date: Day to take the snapshots for
+        :param chunk_size: Number of accounts per chunk
+        :return: Number of snapshots written
+        """
+        cutoff = end_of_day(snapshot_date)
+        last_account_number = 0
+        written = 0
+
+        while True:
+            rows = db.session.execute(
+                select(
+                    Account.account_number,
+                    BalanceBucketService.total_balance_expression().label("balance"),
+                )
+                .filter(
+                    Account.account_number > last_account_number,
+                    Account.creation_date <= cutoff,
+                )
+                .order_by(Account.account_number)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+
+            account_numbers = [row.account_number for row in rows]
+            later_changes = BalanceService.get_balance_changes(
+                account_numbers, after=cutoff
+            )
+            snapshots = [
+                {
+                    "account_number": row.account_number,
+                    "snapshot_date": snapshot_date,
+                    "balance": from_cents(
+                        to_cents(row.balance) - later_changes[row.account_number]
+                    ),
+                }
+                for row in rows
+            ]
+
+            try:
+                db.session.execute(
+                    delete(BalanceSnapshot).filter(
+                        BalanceSnapshot.snapshot_date == snapshot_date,
+                        BalanceSnapshot.account_number.in_(account_numbers),
+                    )
+                )
+                db.session.execute(insert(BalanceSnapshot), snapshots)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+            written += len(snapshots)
+            last_account_number = account_numbers[-1]
+
+        return written
+
+    @staticmethod
+    def get_balance_as_of(account_number, as_of: datetime):
+        """
+        Get the balance of an account at a point in time.
+
+        Starts from the latest snapshot taken at or before ``as_of`` and
+        replays only the transactions made after it, so the cost is bounded
+        by the snapshot interval rather than the account's history. When
+        months were archived and no later snapshot exists, starts from the
+        balance at the end of the archived months instead, since their
+        transactions are no longer in the transaction table.
+
+        :param account_number: Account to get the balance for
+        :param as_of: Naive UTC time the balance is wanted for (inclusive)
+        :return: Dict with the balance and the snapshot used, if any
+        :raises ValueError: If ``as_of`` falls in the archived months
+        """
+        last_archived_month = db.session.scalar(
+            select(func.max(TransactionArchive.month))
+        )
+        archived_until = None
+        if last_archived_month is not None:
+            # First day of the month after the last archived one
+            archived_until = (last_archived_month + timedelta(days=31)).replace(day=1)
+            if as_of < datetime.combine(archived_until, time.min):
+                raise ValueError(
+                    f"Balances before {archived_until.isoformat()} are archived"
+                )
+
+        # Snapshots cover whole days, so the one for as_of's own day is only
+        # usable when the balance is wanted at the very end of that day
+        latest_usable_date = as_of.date()
+        if as_of < end_of_day(latest_usable_date):
+            latest_usable_date -= timedelta(days=1)
+
+        snapshot = (
+            BalanceSnapshot.query.filter(
+                BalanceSnapshot.account_number == account_number,
+                BalanceSnapshot.snapshot_date <= latest_usable_date,
+            )
+            .order_by(desc(BalanceSnapshot.snapshot_date))
+            .first()
+        )
+
+        if archived_until is not None and (
+            snapshot is None or snapshot.snapshot_date < archived_until
+        ):
+            # Replaying from an older snapshot would need the archived
+            # transactions: start from the end of the archived months
+            snapshot = None
+            archived = db.session.get(ArchivedAccountBalance, account_number)
+            after = end_of_day(archived_until - timedelta(days=1))
+            balance = to_cents(archived.net_change) if archived else 0
+        elif snapshot is not None:
+            after = end_of_day(snapshot.snapshot_date)
+            balance = to_cents(snapshot.balance)
+        else:
+            after = None
+            balance = 0
+
+        balance += BalanceService.get_balance_change(
+            account_number, after=after, up_to=as_of
+        )
+
+        return {
+            "account_number": account_number,
+            "as_of": as_of.replace(tzinfo=timezone.utc).isoformat(),
+            "balance": from_cents(balance),
+            "snapshot_date": snapshot.snapshot_date.isoformat() if snapshot else None,
+        }
@@ -0,0 +1,429 @@
+import csv
+import gzip
+import itertools
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from datetime import time as time_of_day
+from datetime import timezone
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import func, insert, or_, select, text, update
+
+from app_dir.extensions import db
+from app_dir.models.account_model import Account
+from app_dir.models.archived_balance_model import ArchivedAccountBalance
+from app_dir.models.import_checkpoint_model import ImportCheckpoint
+from app_dir.models.transaction_model import Transaction
+from app_dir.models.user_model import User
+from app_dir.services.archive_service import TransactionArchiveService
+from app_dir.services.balance_service import CREDIT_TYPES, DEBIT_TYPES
+
+logger = logging.getLogger("core")
+
+TRANSACTION_STATUSES = ("PENDING", "COMPLETED", "FAILED", "REVERSED")
+# Account types also accepted by their display name
+ACCOUNT_TYPE_NAMES = {
+    details["name"].upper(): account_type
+    for account_type, details in Account.valid_account_types.items()
+}
+
+
+def read_rows(path):
+    """
+    Stream the rows of a CSV or NDJSON file (optionally gzip-compressed) as
+    dicts, detecting the format from the file extension.
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as input_file:
+        if name.endswith(".csv"):
+            yield from csv.DictReader(input_file)
+        elif name.endswith((".ndjson", ".jsonl")):
+            for line in input_file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise ValueError(f"Unsupported input format: {path}")
+
+
+def _parse_int(row, field):
+    try:
+        return int(row[field])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"{field} must be an integer")
+
+
+def _parse_amount(row, field, required=True):
+    value = row.get(field)
+    if value in (None, ""):
+        if required:
+            raise ValueError(f"{field} is required")
+        return None
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"{field} must be a decimal number")
+    if amount != amount.quantize(Decimal("0.01")):
+        raise ValueError(f"{field} has more than 2 decimal places")
+    return amount
+
+
+def _parse_timestamp(row, field, required=True):
+    value = row.get(field)
+    if value in (None, ""):
+        if required:
+            raise ValueError(f"{field} is required")
+        return None
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be an ISO 8601 datetime")
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def _validate_account(row):
+    account_type = str(row.get("account_type") or "").upper()
+    account_type = ACCOUNT_TYPE_NAMES.get(account_type, account_type)
+    if account_type not in Account.valid_account_types:
+        raise ValueError(f"Unknown account type: {row.get('account_type')}")
+    holder = row.get("account_holder") or ""
+    name = row.get("account_name") or ""
+    if not holder or len(holder) > 45 or not name or len(name) > 45:
+        raise ValueError("account_holder and account_name must be 1-45 characters")
+
+    if row.get("pin_hash") and row.get("pin_salt"):
+        try:
+            pin_hash = bytes.fromhex(row["pin_hash"])
+            pin_salt = bytes.fromhex(row["pin_salt"])
+        except ValueError:
+            raise ValueError("pin_hash and pin_salt must be hexadecimal")
+    else:
+        pin = str(row.get("pin") or "")
+        if not pin.isdigit() or len(pin) != 4:
+            raise ValueError("pin must be 4 digits, or pin_hash and pin_salt given")
+        pin_salt = os.urandom(32)
+        pin_hash = Account.hash_pin(pin, pin_salt)
+
+    creation_date = _parse_timestamp(row, "creation_date", required=False)
+    return {
+        "account_number": _parse_int(row, "account_number"),
+        "user_id": _parse_int(row, "user_id"),
+        "account_holder": holder,
+        "account_type": account_type,
+        "account_name": name,
+        "creation_date": creation_date or datetime.now(timezone.utc),
+        # Rebuilt from the imported transactions
+        "balance": Decimal("0.00"),
+        "interest_rate": _parse_amount(row, "interest_rate", required=False)
+        or Decimal("0.000"),
+        "latest_balance_change": Decimal("0.00"),
+        "last_transaction_date": creation_date or datetime.now(timezone.utc),
+        "pin_hash": pin_hash,
+        "pin_salt": pin_salt,
+        "is_locked": str(row.get("is_locked") or "").lower() in ("1", "true"),
+        "bucket_count": 0,
+    }
+
+
+def _validate_transaction(row):
+    transaction_type = str(row.get("transaction_type") or "").upper()
+    if transaction_type not in ("DEPOSIT", "WITHDRAWAL", "TRANSFER"):
+        raise ValueError(f"Unknown transaction type: {row.get('transaction_type')}")
+    status = str(row.get("status") or "COMPLETED").upper()
+    if status not in TRANSACTION_STATUSES:
+        raise ValueError(f"Unknown status: {row.get('status')}")
+    amount = _parse_amount(row, "amount")
+    if amount <= 0:
+        raise ValueError("amount must be positive")
+    description = row.get("description") or None
+    if description and len(description) > 255:
+        raise ValueError("description is longer than 255 characters")
+    reference_code = row.get("reference_code") or None
+    if reference_code and len(reference_code) > 50:
+        raise ValueError("reference_code is longer than 50 characters")
+
+    transaction = {
+        "transaction_type": transaction_type,
+        "account_from": _parse_int(row, "account_from"),
+        "account_to": _parse_int(row, "account_to"),
+        "amount": amount,
+        "description": description,
+        "reference_code": reference_code or Transaction.generate_reference_code(),
+        "status": status,
+        "timestamp": _parse_timestamp(row, "timestamp"),
+        "balance_after": _parse_amount(row, "balance_after"),
+    }
+    if row.get("transaction_id") not in (None, ""):
+        transaction["transaction_id"] = _parse_int(row, "transaction_id")
+    return transaction
+
+
+VALIDATORS = {"ACCOUNTS": _validate_account, "TRANSACTIONS": _validate_transaction}
+
+
+def _validate_batch(kind, first_line, rows):
+    """
+    Validate and convert a batch of input rows. Runs in a worker process.
+
+    :return: Tuple of (valid rows, rejected rows with their line and error)
+    """
+    validate = VALIDATORS[kind]
+    valid = []
+    rejected = []
+    for line, row in enumerate(rows, start=first_line):
+        try:
+            valid.append(validate(row))
+        except ValueError as e:
+            rejected.append({"line": line, "error": str(e), "row": row})
+    return valid, rejected
+
+
+def _bounded_map(executor, function, argument_tuples, max_pending):
+    """
+    Like ``executor.map``, but only keeps ``max_pending`` calls in flight,
+    so a huge input is never read into memory all at once.
+    """
+    pending = deque()
+    for arguments in argument_tuples:
+        pending.append(executor.submit(function, *arguments))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class ImportService:
+    """
+    Bulk import of accounts and historical transactions from a legacy core.
+
+    Input rows are validated in a process pool and written in large batches
+    with executemany inserts (multi-row INSERTs on MySQL), with foreign key
+    checks deferred during the batch. Each batch is committed together with
+    the file's ImportCheckpoint, so an interrupted import resumes after the
+    last committed batch. Referential integrity is checked once at the end
+    and account balances are rebuilt from the ledger in one pass.
+    """
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def import_file(path, kind, workers=4, batch_size=5000, rejected_path=None):
+        """
+        Import a CSV or NDJSON file of accounts or transactions.
+
+        Rejected rows are appended to ``rejected_path`` (default:
+        ``<path>.rejected.ndjson``) with their line number and error.
+
+        :param kind: ``ACCOUNTS`` or ``TRANSACTIONS``
+        :return: Dict with the import's counters and rows per second
+        """
+        kind = kind.upper()
+        if kind not in VALIDATORS:
+            raise ValueError(f"Unknown import kind: {kind}")
+        source = os.path.abspath(path)
+        rejected_path = rejected_path or f"{path}.rejected.ndjson"
+        model = Account if kind == "ACCOUNTS" else Transaction
+
+        checkpoint = db.session.get(ImportCheckpoint, source)
+        if checkpoint is None:
+            checkpoint = ImportCheckpoint(
+                source=source,
+                kind=kind,
+                rows_processed=0,
+                rows_imported=0,
+                rows_rejected=0,
+                updated_at=datetime.now(timezone.utc),
+            )
+            db.session.add(checkpoint)
+            db.session.commit()
+        elif checkpoint.completed_at is not None:
+            logger.info("%s was already imported", source)
+            return ImportService._get_totals(checkpoint, 0, 0.0)
+        elif checkpoint.rows_processed:
+            logger.info(
+                "Resuming import of %s after %d rows", source, checkpoint.rows_processed
+            )
+
+        # Each batch is validated as one chunk per worker, so that even a
+        # single batch (e.g. of accounts, bound by PIN hashing) uses them all
+        chunk_size = max(1, -(-batch_size // workers))
+        rows = itertools.islice(read_rows(path), checkpoint.rows_processed, None)
+        chunks = iter(lambda: list(itertools.islice(rows, chunk_size)), [])
+        first_line = checkpoint.rows_processed + 1
+        argument_tuples = (
+            (kind, first_line + index * chunk_size, chunk)
+            for index, chunk in enumerate(chunks)
+        )
+
+        imported_now = 0
+        started = time.monotonic()
+        with (
+            ProcessPoolExecutor(max_workers=workers) as executor,
+            open(rejected_path, "a", encoding="utf-8") as rejected_file,
+        ):
+            results = _bounded_map(
+                executor, _validate_batch, argument_tuples, workers * 2
+            )
+            for group in iter(lambda: list(itertools.islice(results, workers)), []):
+                valid = [row for group_valid, _ in group for row in group_valid]
+                rejected = [
+                    row for _, group_rejected in group for row in group_rejected
+                ]
+                try:
+                    ImportService._defer_foreign_keys(True)
+                    if valid:
+                        db.session.execute(insert(model.__table__), valid)
+                    ImportService._defer_foreign_keys(False)
+                    checkpoint.rows_processed += len(valid) + len(rejected)
+                    checkpoint.rows_imported += len(valid)
+                    checkpoint.rows_rejected += len(rejected)
+                    checkpoint.updated_at = datetime.now(timezone.utc)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    raise
+
+                for row in rejected:
+                    rejected_file.write(json.dumps(row, default=str) + "\n")
+                imported_now += len(valid)
+                elapsed = time.monotonic() - started
+                logger.info(
+                    "Imported %d rows of %s (%.0f rows/s)",
+                    checkpoint.rows_imported,
+                    source,
+                    imported_now / elapsed if elapsed else 0,
+                )
+
+        checkpoint.completed_at = datetime.now(timezone.utc)
+        db.session.commit()
+        return ImportService._get_totals(
+            checkpoint, imported_now, time.monotonic() - started
+        )
+
+    @staticmethod
+    def _get_totals(checkpoint, imported_now, elapsed):
+        return {
+            "rows_processed": checkpoint.rows_processed,
+            "rows_imported": checkpoint.rows_imported,
+            "rows_rejected": checkpoint.rows_rejected,
+            "seconds": round(elapsed, 2),
+            "rows_per_second": round(imported_now / elapsed) if elapsed else 0,
+        }
+
+    @staticmethod
+    def _defer_foreign_keys(defer):
+        """
+        Turn foreign key checks off for the current batch on MySQL, or defer
+        them to the commit on SQLite. ``check_references`` verifies the
+        imported data once at the end instead.
+        """
+        dialect = db.session.get_bind().dialect.name
+        if dialect == "mysql":
+            db.session.execute(
+                text(f"SET SESSION foreign_key_checks = {int(not defer)}")
+            )
+        elif dialect == "sqlite" and defer:
+            db.session.execute(text("PRAGMA defer_foreign_keys = ON"))
+
+    @staticmethod
+    def check_references():
+        """
+        Count the rows whose foreign keys point nowhere, with one anti-join
+        per reference.
+
+        :return: Dict with the number of accounts without a user and of
+            transactions without their accounts
+        """
+        known_accounts = select(Account.account_number)
+        return {
+            "accounts_without_user": db.session.scalar(
+                select(func.count())
+                .select_from(Account)
+                .filter(Account.user_id.not_in(select(User.user_id)))
+            ),
+            "transactions_without_account": db.session.scalar(
+                select(func.count())
+                .select_from(Transaction)
+                .filter(
+                    or_(
+                        Transaction.account_from.not_in(known_accounts),
+                        Transaction.account_to.not_in(known_accounts),
+                    )
+                )
+            ),
+        }
+
+    @staticmethod
+    def rebuild_balances(chunk_size=1000):
+        """
+        Set every account's balance to the net of its COMPLETED
+        transactions (plus its archived net change), reading the ledger in
+        one grouped pass.
+
+        :return: Number of accounts updated
+        """
+        archived_until = TransactionArchiveService.get_archived_until()
+        conditions = [Transaction.status == "COMPLETED"]
+        if archived_until is not None:
+            conditions.append(
+                Transaction.timestamp
+                >= datetime.combine(archived_until, time_of_day.min)
+            )
+
+        balances = dict(
+            db.session.execute(
+                select(
+                    ArchivedAccountBalance.account_number,
+                    ArchivedAccountBalance.net_change,
+                )
+            ).all()
+        )
+        for column, types, sign in (
+            (Transaction.account_to, CREDIT_TYPES, 1),
+            (Transaction.account_from, DEBIT_TYPES, -1),
+        ):
+            for account_number, amount in db.session.execute(
+                select(column, func.sum(Transaction.amount))
+                .filter(Transaction.transaction_type.in_(types), *conditions)
+                .group_by(column)
+            ):
+                balances[account_number] = (
+                    balances.get(account_number, 0) + sign * amount
+                )
+
+        account_numbers = db.session.scalars(
+            select(Account.account_number).filter(Account.bucket_count == 0)
+        ).all()
+        accounts = Account.__table__
+        statement = (
+            update(accounts)
+            .where(accounts.c.account_number == db.bindparam("b_account_number"))
+            .values(balance=db.bindparam("b_balance"))
+        )
+        try:
+            for start in range(0, len(account_numbers), chunk_size):
+                db.session.execute(
+                    statement,
+                    [
+                        {
+                            "b_account_number": account_number,
+                            "b_balance": balances.get(account_number, Decimal("0.00")),
+                        }
+                        for account_number in account_numbers[
+                            start : start + chunk_size
+                        ]
+                    ],
+                )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return len(account_numbers)
@@ -0,0 +1,185 @@
+import logging
+from datetime import date, datetime, timezone
+
+from sqlalchemy import bindparam, insert, select, update
+
+from app_dir.extensions import db
+from app_dir.models.account_model import Account
+from app_dir.models.interest_accrual_model import InterestAccrualRun
+from app_dir.models.transaction_model import Transaction
+from app_dir.services.balance_bucket_service import BalanceBucketService
+from app_dir.services.outbox_service import OutboxService
+from app_dir.services.recent_transaction_service import RecentTransactionService
+from app_dir.services.rollup_service import RollupService
+from app_dir.services.transaction_count_service import TransactionCountService
+from app_dir.utils.fixed_point import (
+    RATE_SCALE,
+    divide_half_even,
+    from_cents,
+    to_cents,
+    to_scaled_rate,
+)
+
+logger = logging.getLogger("core")
+
+DAYS_PER_YEAR = 365
+# Denominator turning cents * rate-in-thousandths-of-a-percent into daily cents
+DAILY_RATE_DENOMINATOR = 100 * RATE_SCALE * DAYS_PER_YEAR
+
+
+class InterestService:
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def compute_daily_interest(balances_cents, scaled_rates):
+        """
+        Compute one day of interest for a batch of accounts.
+
+        Works on whole cents and rates in thousandths of a percent, so the
+        result is exact integer cents (rounded half to even), never float.
+
+        :param balances_cents: Balances in cents
+        :param scaled_rates: Annual rates in thousandths of a percent
+        :return: List of daily interest amounts in cents
+        """
+        return [
+            divide_half_even(balance * rate, DAILY_RATE_DENOMINATOR)
+            for balance, rate in zip(balances_cents, scaled_rates)
+        ]
+
+    @staticmethod
+    def get_reference_code(accrual_date: date, account_number: int) -> str:
+        """Reference code of an accrual, unique per account and day."""
+        return f"INT{accrual_date:%y%m%d}{account_number}"
+
+    @staticmethod
+    def accrue_interest(accrual_date: date, chunk_size=5000):
+        """
+        Accrue one day of interest on every account with a positive balance
+        and interest rate.
+
+        Accounts are read in keyset chunks of ``chunk_size``. Each chunk is
+        applied in a single DB transaction with a bulk ``UPDATE`` of the
+        balances, a bulk insert of DEPOSIT transactions and an update of the
+        run checkpoint, so an interrupted run resumes after the last
+        committed chunk and never accrues the same account twice.
+
+        :param accrual_date: Day the interest is accrued for
+        :param chunk_size: Number of accounts per chunk
+        :return: The InterestAccrualRun for the day
+        """
+        run = db.session.get(InterestAccrualRun, accrual_date)
+        if run is None:
+            run = InterestAccrualRun(
+                accrual_date=accrual_date,
+                last_account_number=0,
+                accounts_processed=0,
+                total_interest=0,
+                started_at=datetime.now(timezone.utc),
+            )
+            db.session.add(run)
+            db.session.commit()
+        elif run.completed_at is not None:
+            logger.info("Interest for %s was already accrued", accrual_date)
+            return run
+        else:
+            logger.info(
+                "Resuming interest accrual for %s after account %s",
+                accrual_date,
+                run.last_account_number,
+            )
+
+        description = f"Interest accrual for {accrual_date.isoformat()}"
+        accounts = Account.__table__
+        update_balances = (
+            update(accounts)
+            .where(accounts.c.account_number == bindparam("b_account_number"))
+            .values(
+                balance=accounts.c.balance + bindparam("b_interest"),
+                latest_balance_change=bindparam("b_interest"),
+                last_transaction_date=bindparam("b_timestamp"),
+            )
+        )
+        # Interest is earned on the full balance of bucketed accounts
+        total_balance = BalanceBucketService.total_balance_expression()
+
+        while True:
+            rows = db.session.execute(
+                select(
+                    Account.account_number,
+                    total_balance.label("balance"),
+                    Account.interest_rate,
+                )
+                .filter(
+                    Account.account_number > run.last_account_number,
+                    total_balance > 0,
+                    Account.interest_rate > 0,
+                )
+                .order_by(Account.account_number)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+
+            account_numbers = [row.account_number for row in rows]
+            balances = [to_cents(row.balance) for row in rows]
+            interest = InterestService.compute_daily_interest(
+                balances, [to_scaled_rate(row.interest_rate) for row in rows]
+            )
+            timestamp = datetime.now(timezone.utc)
+
+            updates = []
+            transactions = []
+            for account_number, balance, amount in zip(
+                account_numbers, balances, interest
+            ):
+                if amount <= 0:
+                    continue
+                updates.append(
+                    {
+                        "b_account_number": account_number,
+                        "b_interest": from_cents(amount),
+                        "b_timestamp": timestamp,
+                    }
+                )
+                transactions.append(
+                    {
+                        "transaction_type": "DEPOSIT",
+                        "amount": from_cents(amount),
+                        "description": description,
+                        "reference_code": InterestService.get_reference_code(
+                            accrual_date, account_number
+                        ),
+                        "account_from": account_number,
+                        "account_to": account_number,
+                        "status": "COMPLETED",
+                        "timestamp": timestamp,
+                        "balance_after": from_cents(balance + amount),
+                    }
+                )
+
+            try:
+                if updates:
+                    db.session.execute(update_balances, updates)
+                    db.session.execute(insert(Transaction), transactions)
+                    RollupService.record_transactions(transactions)
+                    TransactionCountService.record_transactions(transactions)
+                    # Bulk inserted without IDs; the reference code identifies them
+                    OutboxService.enqueue_transactions(transactions)
+                run.last_account_number = account_numbers[-1]
+                run.accounts_processed += len(updates)
+                run.total_interest = from_cents(
+                    to_cents(run.total_interest) + sum(interest)
+                )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            RecentTransactionService.invalidate(
+                {transaction["account_from"] for transaction in transactions}
+            )
+
+        run.completed_at = datetime.now(timezone.utc)
+        db.session.commit()
+        return run
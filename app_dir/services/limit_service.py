@@ -0,0 +1,90 @@
+from datetime import date
+
+from sqlalchemy import update
+
+from app_dir.extensions import db
+from app_dir.models.account_daily_usage_model import AccountDailyUsage
+from app_dir.models.account_model import Account
+from app_dir.utils.upsert import increment_counters
+
+# Usage column and account type limit for each kind of debit
+LIMITED_DEBITS = {
+    "WITHDRAWAL": ("withdrawal_total", "daily_withdrawal_limit"),
+    "TRANSFER": ("transfer_total", "daily_transfer_limit"),
+}
+
+
+class LimitService:
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def consume_daily_limit(account: Account, transaction_type, amount, day: date):
+        """
+        Add a debit to the account's usage for the day if it fits within the
+        daily limit of the account type.
+
+        The check and the increment are one conditional ``UPDATE`` of the
+        account's usage row for the day, so concurrent debits can never
+        exceed the limit. Must be called in the same DB transaction as the
+        debit itself, after every other check has passed.
+
+        :raises ValueError: If the debit would exceed the daily limit
+        """
+        column, limit_name = LIMITED_DEBITS[transaction_type]
+        limit = Account.valid_account_types[account.account_type][limit_name]
+        if limit is None:
+            return
+
+        # Make sure the usage row for the day exists without changing it
+        increment_counters(
+            db.session,
+            AccountDailyUsage,
+            [
+                {
+                    "account_number": account.account_number,
+                    "day": day,
+                    "withdrawal_total": 0,
+                    "transfer_total": 0,
+                }
+            ],
+            ("account_number", "day"),
+            ("withdrawal_total", "transfer_total"),
+        )
+
+        usage = AccountDailyUsage.__table__
+        result = db.session.execute(
+            update(usage)
+            .where(
+                usage.c.account_number == account.account_number,
+                usage.c.day == day,
+                usage.c[column] + amount <= limit,
+            )
+            .values({column: usage.c[column] + amount})
+        )
+        if result.rowcount != 1:
+            raise ValueError(
+                f"Daily {transaction_type.lower()} limit of {limit} exceeded"
+            )
+
+    @staticmethod
+    def release_daily_limit(account: Account, transaction_type, amount, day: date):
+        """
+        Remove a reversed debit from the account's usage for ``day``, the
+        day it was consumed on. Must be called in the same DB transaction
+        as the reversal.
+        """
+        column, limit_name = LIMITED_DEBITS[transaction_type]
+        if Account.valid_account_types[account.account_type][limit_name] is None:
+            return
+
+        usage = AccountDailyUsage.__table__
+        db.session.execute(
+            update(usage)
+            .where(
+                usage.c.account_number == account.account_number,
+                usage.c.day == day,
+                usage.c[column] >= amount,
+            )
+            .values({column: usage.c[column] - amount})
+        )
@@ -0,0 +1,245 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import delete, insert, select, update
+
+from app_dir.extensions import db
+from app_dir.models.outbox_model import OutboxEvent
+from app_dir.utils.metrics import register_collector
+from app_dir.utils.outbox_sinks import create_sink
+
+logger = logging.getLogger("core")
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class OutboxService:
+    """
+    Transactional outbox for notifications about completed transactions.
+
+    Events are inserted in the same DB transaction as the transactions they
+    describe, and a background dispatcher delivers them in batches to the
+    configured sink with at-least-once semantics: an event is marked as
+    dispatched only after the sink accepted it, and failed batches are
+    retried with exponential backoff. The dispatcher also deletes the
+    events delivered more than OUTBOX_RETENTION_DAYS ago.
+    """
+
+    _dispatcher = None
+    _stopping = threading.Event()
+    _stats_lock = threading.Lock()
+    _stats = {"dispatched": 0, "failed_attempts": 0, "lag_seconds": 0.0, "pruned": 0}
+    # (time, events dispatched) of recent batches, for the throughput
+    _recent_batches = deque()
+
+    @staticmethod
+    def enqueue_transactions(transactions):
+        """
+        Add a ``transaction.completed`` event per transaction. Does not commit.
+
+        :param transactions: Transaction details as dicts (see
+            ``Transaction.get_transaction_details``)
+        """
+        if not current_app.config.get("OUTBOX_ENABLED", False) or not transactions:
+            return
+        now = _utcnow()
+        db.session.execute(
+            insert(OutboxEvent),
+            [
+                {
+                    "event_type": "transaction.completed",
+                    "payload": json.dumps(transaction, default=str),
+                    "created_at": now,
+                    "attempts": 0,
+                    "next_attempt_at": now,
+                }
+                for transaction in transactions
+            ],
+        )
+
+    @staticmethod
+    def start(app):
+        """Start the background dispatcher for ``app``."""
+        if OutboxService._dispatcher is not None:
+            return
+        OutboxService._stopping.clear()
+        OutboxService._dispatcher = threading.Thread(
+            target=OutboxService._run_dispatcher,
+            args=(app, create_sink(app.config["OUTBOX_SINK_URL"])),
+            name="outbox-dispatcher",
+            daemon=True,
+        )
+        OutboxService._dispatcher.start()
+        register_collector("outbox", OutboxService.stats)
+
+    @staticmethod
+    def stop():
+        """Stop the dispatcher after its current batch."""
+        OutboxService._stopping.set()
+        if OutboxService._dispatcher is not None:
+            OutboxService._dispatcher.join()
+            OutboxService._dispatcher = None
+
+    @staticmethod
+    def _run_dispatcher(app, sink):
+        poll_interval = app.config["OUTBOX_POLL_INTERVAL"]
+        prune_interval = app.config["OUTBOX_PRUNE_INTERVAL"]
+        next_prune = time.monotonic()
+        with app.app_context():
+            while not OutboxService._stopping.is_set():
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + prune_interval
+                    try:
+                        OutboxService.prune_dispatched(
+                            timedelta(days=app.config["OUTBOX_RETENTION_DAYS"]),
+                            batch_size=app.config["OUTBOX_PRUNE_BATCH_SIZE"],
+                        )
+                    except Exception:
+                        db.session.rollback()
+                        logger.exception("Outbox pruning failed")
+                    finally:
+                        db.session.remove()
+                try:
+                    dispatched = OutboxService.dispatch_batch(
+                        sink,
+                        batch_size=app.config["OUTBOX_BATCH_SIZE"],
+                        base_backoff=app.config["OUTBOX_BASE_BACKOFF"],
+                        max_backoff=app.config["OUTBOX_MAX_BACKOFF"],
+                    )
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Outbox dispatcher failed a batch")
+                    dispatched = 0
+                finally:
+                    db.session.remove()
+                if not dispatched:
+                    OutboxService._stopping.wait(poll_interval)
+        sink.close()
+
+    @staticmethod
+    def dispatch_batch(sink, batch_size=100, base_backoff=1.0, max_backoff=300.0):
+        """
+        Deliver the oldest due events to ``sink``.
+
+        :return: Number of events delivered
+        """
+        now = _utcnow()
+        events = (
+            db.session.execute(
+                select(OutboxEvent)
+                .filter(
+                    OutboxEvent.dispatched_at.is_(None),
+                    OutboxEvent.next_attempt_at <= now,
+                )
+                .order_by(OutboxEvent.event_id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            .scalars()
+            .all()
+        )
+        if not events:
+            db.session.rollback()
+            with OutboxService._stats_lock:
+                OutboxService._stats["lag_seconds"] = 0.0
+            return 0
+
+        event_ids = [event.event_id for event in events]
+        lag = (now - events[0].created_at).total_seconds()
+        try:
+            sink.send([event.get_event_details() for event in events])
+        except Exception as e:
+            attempts = max(event.attempts for event in events) + 1
+            backoff = min(max_backoff, base_backoff * 2 ** (attempts - 1))
+            logger.warning("Outbox delivery failed, retrying in %ss: %s", backoff, e)
+            db.session.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.event_id.in_(event_ids))
+                .values(
+                    attempts=OutboxEvent.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=backoff),
+                    last_error=str(e)[:255],
+                ),
+                execution_options={"synchronize_session": False},
+            )
+            db.session.commit()
+            with OutboxService._stats_lock:
+                OutboxService._stats["failed_attempts"] += 1
+                OutboxService._stats["lag_seconds"] = lag
+            return 0
+
+        db.session.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.event_id.in_(event_ids))
+            .values(dispatched_at=_utcnow(), attempts=OutboxEvent.attempts + 1),
+            execution_options={"synchronize_session": False},
+        )
+        db.session.commit()
+
+        with OutboxService._stats_lock:
+            OutboxService._stats["dispatched"] += len(events)
+            OutboxService._stats["lag_seconds"] = lag
+            OutboxService._recent_batches.append((time.monotonic(), len(events)))
+        return len(events)
+
+    @staticmethod
+    def prune_dispatched(retention, batch_size=5000):
+        """
+        Delete the events dispatched more than ``retention`` (a timedelta)
+        ago, ``batch_size`` at a time so no delete holds locks for long.
+
+        :return: Number of events deleted
+        """
+        cutoff = _utcnow() - retention
+        deleted = 0
+        while True:
+            event_ids = (
+                db.session.execute(
+                    select(OutboxEvent.event_id)
+                    .filter(OutboxEvent.dispatched_at < cutoff)
+                    .order_by(OutboxEvent.dispatched_at, OutboxEvent.event_id)
+                    .limit(batch_size)
+                )
+                .scalars()
+                .all()
+            )
+            if not event_ids:
+                db.session.rollback()
+                break
+            db.session.execute(
+                delete(OutboxEvent).where(OutboxEvent.event_id.in_(event_ids)),
+                execution_options={"synchronize_session": False},
+            )
+            db.session.commit()
+            deleted += len(event_ids)
+            if len(event_ids) < batch_size:
+                break
+
+        with OutboxService._stats_lock:
+            OutboxService._stats["pruned"] += deleted
+        if deleted:
+            logger.info("Pruned %d dispatched outbox events", deleted)
+        return deleted
+
+    @staticmethod
+    def stats():
+        """
+        Return delivery counters, the age of the oldest event in the last
+        batch (lag) and the number of events delivered per second over the
+        last minute.
+        """
+        with OutboxService._stats_lock:
+            recent = OutboxService._recent_batches
+            cutoff = time.monotonic() - 60
+            while recent and recent[0][0] < cutoff:
+                recent.popleft()
+            stats = dict(OutboxService._stats)
+            stats["events_per_second"] = sum(count for _, count in recent) / 60
+        return stats
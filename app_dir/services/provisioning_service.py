@@ -0,0 +1,151 @@
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select
+
+from app_dir.extensions import db
+from app_dir.models.account_model import Account
+from app_dir.models.user_model import User
+from app_dir.services.account_number_service import AccountNumberService
+from app_dir.services.shard_service import ShardService
+
+logger = logging.getLogger("core")
+
+
+def _hash_new_pin(pin):
+    """Salt and hash one PIN. Runs in a worker process."""
+    salt = os.urandom(32)
+    return salt, Account.hash_pin(pin, salt)
+
+
+class ProvisioningService:
+    """
+    Bulk creation of accounts, e.g. when onboarding a corporate client.
+
+    PINs are hashed in a shared process pool, and each chunk of accounts is
+    inserted with a single multi-row statement; the whole request is one
+    DB transaction.
+    """
+
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    @staticmethod
+    def get_executor(workers):
+        """Get the process pool PINs are hashed in, creating it on first use."""
+        with ProvisioningService._executor_lock:
+            if ProvisioningService._executor is None:
+                ProvisioningService._executor = ProcessPoolExecutor(max_workers=workers)
+            return ProvisioningService._executor
+
+    @staticmethod
+    def shutdown():
+        """Shut the process pool down, e.g. when the app stops."""
+        with ProvisioningService._executor_lock:
+            if ProvisioningService._executor is not None:
+                ProvisioningService._executor.shutdown()
+                ProvisioningService._executor = None
+
+    @staticmethod
+    def validate_accounts(specs):
+        """
+        Check the requested accounts and their users before any PIN is hashed.
+
+        :raises ValueError: Naming the index of the first invalid account
+        """
+        for index, spec in enumerate(specs):
+            if not isinstance(spec, dict):
+                raise ValueError(f"Account {index}: must be an object")
+            missing = [
+                field
+                for field in ("user_id", "account_name", "account_type", "account_pin")
+                if not spec.get(field)
+            ]
+            if missing:
+                raise ValueError(f"Account {index}: missing {', '.join(missing)}")
+            if str(spec["account_type"]).upper() not in Account.valid_account_types:
+                raise ValueError(f"Account {index}: invalid account type")
+            if len(spec["account_name"]) > 45:
+                raise ValueError(f"Account {index}: account name is too long")
+            pin = spec["account_pin"]
+            if not isinstance(pin, str) or not pin.isdigit() or len(pin) != 4:
+                raise ValueError(f"Account {index}: PIN must be 4 digits")
+
+        user_ids = {int(spec["user_id"]) for spec in specs}
+        usernames = dict(
+            db.session.execute(
+                select(User.user_id, User.username).filter(User.user_id.in_(user_ids))
+            ).all()
+        )
+        unknown = user_ids - usernames.keys()
+        if unknown:
+            raise ValueError(f"Users not found: {sorted(unknown)}")
+        return usernames
+
+    @staticmethod
+    def provision_accounts(specs, workers=4, chunk_size=1000, block_size=100):
+        """
+        Create many accounts at once.
+
+        :param specs: Dicts with user_id, account_name, account_type and
+            account_pin, and optionally account_holder (default: the
+            user's username)
+        :param workers: Size of the PIN hashing process pool
+        :param chunk_size: Number of accounts per INSERT statement
+        :param block_size: Minimum number of account numbers to reserve
+        :return: The new account numbers, in the order of ``specs``
+        :raises ValueError: If any account is invalid; nothing is created
+        """
+        usernames = ProvisioningService.validate_accounts(specs)
+        executor = ProvisioningService.get_executor(workers)
+        hashed_pins = executor.map(
+            _hash_new_pin,
+            [spec["account_pin"] for spec in specs],
+            chunksize=max(1, len(specs) // (workers * 4)),
+        )
+
+        account_numbers = AccountNumberService.next_account_numbers(
+            len(specs), block_size
+        )
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                "account_number": account_number,
+                "user_id": int(spec["user_id"]),
+                "account_holder": (
+                    spec.get("account_holder") or usernames[int(spec["user_id"])]
+                )[:45],
+                "account_type": spec["account_type"].upper(),
+                "account_name": spec["account_name"],
+                "creation_date": now,
+                "balance": 0,
+                "interest_rate": 0,
+                "latest_balance_change": 0,
+                "last_transaction_date": now,
+                "bucket_count": 0,
+                "is_locked": False,
+                "pin_salt": salt,
+                "pin_hash": pin_hash,
+            }
+            for account_number, spec, (salt, pin_hash) in zip(
+                account_numbers, specs, hashed_pins
+            )
+        ]
+
+        ShardService.register_accounts(
+            [(row["account_number"], row["user_id"]) for row in rows]
+        )
+        try:
+            for start in range(0, len(rows), chunk_size):
+                db.session.execute(
+                    insert(Account.__table__).values(rows[start : start + chunk_size])
+                )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        logger.info("Provisioned %d accounts", len(account_numbers))
+        return account_numbers
@@ -0,0 +1,281 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+from flask import current_app
+
+from app_dir.utils.metrics import register_collector
+
+
+class RecentTransactions:
+    """The latest transactions of one account, newest first."""
+
+    __slots__ = ("user_id", "transactions", "complete", "loaded_at", "counts")
+
+    def __init__(self, user_id, transactions, size, complete, loaded_at, counts=None):
+        self.user_id = user_id
+        self.transactions = deque(transactions, maxlen=size)
+        # True when these are all of the account's transactions
+        self.complete = complete
+        self.loaded_at = loaded_at
+        # The account's transaction counts per type (see
+        # TransactionCountService) the ring is consistent with, or None
+        self.counts = counts
+
+    def add(self, details):
+        """Add a transaction, keeping the ring ordered newest first."""
+        transactions = self.transactions
+        position = 0
+        while (
+            position < len(transactions)
+            and transactions[position]["timestamp"] > details["timestamp"]
+        ):
+            position += 1
+        if len(transactions) == transactions.maxlen:
+            # The oldest transaction drops out of the ring
+            self.complete = False
+            if position == len(transactions):
+                return
+            transactions.pop()
+        transactions.insert(position, details)
+
+
+class RecentTransactionCache:
+    """
+    Bounded in-memory cache of the latest transactions of each account.
+
+    Each account has a ring of at most ``per_account`` transaction details,
+    filled from the database on a miss and kept current by adding the
+    transactions committed by this process. Rings older than
+    ``ttl_seconds`` are reloaded, which bounds how long the writes of other
+    processes go unseen. Callers that pass the account's current
+    transaction counts to ``get`` also get the ring reloaded as soon as
+    another process wrote to the account. At most ``max_items``
+    transactions are kept in total; the least recently used accounts are
+    evicted first.
+    """
+
+    def __init__(self, per_account=30, max_items=100000, ttl_seconds=30):
+        self.per_account = per_account
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self._rings = OrderedDict()
+        self._items = 0
+        # Accounts being loaded, with the number of loads and of writes seen
+        # meanwhile; a load that overlapped a write is not stored
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.discarded_loads = 0
+        self.stale_rings = 0
+        self.evictions = 0
+
+    def get(
+        self,
+        account_number,
+        user_id,
+        limit,
+        transaction_type=None,
+        now=None,
+        counts=None,
+    ):
+        """
+        Return the latest ``limit`` transactions of an account, optionally
+        of a single type, or None if the ring cannot answer for sure.
+        Only the user the ring was loaded for is served from it.
+
+        :param counts: The account's current transaction counts per type;
+            a ring that saw different counts is dropped as stale
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            ring = self._rings.get(account_number)
+            if ring is not None and self._expired(ring, now):
+                self._remove(account_number)
+                ring = None
+            if ring is not None and counts is not None and ring.counts != counts:
+                # Written to by another process since it was loaded
+                self._remove(account_number)
+                self.stale_rings += 1
+                ring = None
+            if ring is None or ring.user_id != user_id or limit > self.per_account:
+                self.misses += 1
+                return None
+
+            transactions = ring.transactions
+            if transaction_type is not None:
+                transactions = [
+                    details
+                    for details in transactions
+                    if details["transaction_type"] == transaction_type
+                ]
+            # Any prefix of the ring is a prefix of the account's history
+            if len(transactions) < limit and not ring.complete:
+                self.misses += 1
+                return None
+
+            self._rings.move_to_end(account_number)
+            self.hits += 1
+            return [dict(details) for details in list(transactions)[:limit]]
+
+    def begin_load(self, account_number):
+        """
+        Start loading an account's ring from the database.
+
+        :return: Token to pass to ``end_load``
+        """
+        with self._lock:
+            loading = self._loading.setdefault(account_number, [0, 0])
+            loading[0] += 1
+            return loading[1]
+
+    def end_load(
+        self, account_number, token, user_id, transactions, now=None, counts=None
+    ):
+        """
+        Store the transactions loaded since ``begin_load``, newest first,
+        unless the account was written to in the meantime. Pass None for
+        ``transactions`` if the load failed, and the account's transaction
+        counts per type read with them as ``counts``.
+
+        :return: True if the ring was stored
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            loading = self._loading[account_number]
+            loading[0] -= 1
+            stale = loading[1] != token
+            if not loading[0]:
+                del self._loading[account_number]
+            if transactions is None:
+                return False
+            if stale:
+                self.discarded_loads += 1
+                return False
+
+            self._remove(account_number)
+            transactions = transactions[: self.per_account]
+            self._rings[account_number] = RecentTransactions(
+                user_id,
+                transactions,
+                self.per_account,
+                len(transactions) < self.per_account,
+                now,
+                dict(counts) if counts is not None else None,
+            )
+            self._items += len(transactions)
+            self.loads += 1
+            self._evict()
+            return True
+
+    def add(self, account_number, details):
+        """Add a committed transaction to the account's ring, if cached."""
+        with self._lock:
+            self._written(account_number)
+            ring = self._rings.get(account_number)
+            if ring is None:
+                return
+            if ring.counts is not None:
+                transaction_type = details["transaction_type"]
+                ring.counts[transaction_type] = ring.counts.get(transaction_type, 0) + 1
+            self._items -= len(ring.transactions)
+            ring.add(details)
+            self._items += len(ring.transactions)
+            self._evict()
+
+    def invalidate(self, account_numbers):
+        """Drop the rings of accounts whose transactions changed."""
+        with self._lock:
+            for account_number in account_numbers:
+                self._written(account_number)
+                self._remove(account_number)
+
+    def _written(self, account_number):
+        loading = self._loading.get(account_number)
+        if loading is not None:
+            loading[1] += 1
+
+    def _expired(self, ring, now):
+        return self.ttl_seconds is not None and now - ring.loaded_at > self.ttl_seconds
+
+    def _remove(self, account_number):
+        ring = self._rings.pop(account_number, None)
+        if ring is not None:
+            self._items -= len(ring.transactions)
+
+    def _evict(self):
+        """Evict the least recently used rings to stay under ``max_items``."""
+        while self._items > self.max_items and self._rings:
+            _, ring = self._rings.popitem(last=False)
+            self._items -= len(ring.transactions)
+            self.evictions += 1
+
+    def stats(self):
+        """Return the cache size and hit counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "accounts": len(self._rings),
+                "transactions": self._items,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "loads": self.loads,
+                "discarded_loads": self.discarded_loads,
+                "stale_rings": self.stale_rings,
+                "evictions": self.evictions,
+            }
+
+
+class RecentTransactionService:
+    """
+    Serves the first page of an account's transactions from memory (see
+    RecentTransactionCache). AccountService adds the transactions it
+    commits; other writers invalidate the accounts they touch.
+    """
+
+    _cache = None
+    _cache_lock = threading.Lock()
+
+    @staticmethod
+    def get_cache():
+        """
+        Return the process-wide cache, built from the app config, or None
+        if it is disabled.
+        """
+        if not current_app.config.get("RECENT_TRANSACTIONS_ENABLED", False):
+            return None
+        if RecentTransactionService._cache is None:
+            with RecentTransactionService._cache_lock:
+                if RecentTransactionService._cache is None:
+                    config = current_app.config
+                    cache = RecentTransactionCache(
+                        per_account=config["RECENT_TRANSACTIONS_PER_ACCOUNT"],
+                        max_items=config["RECENT_TRANSACTIONS_MAX_ITEMS"],
+                        ttl_seconds=config["RECENT_TRANSACTIONS_TTL_SECONDS"],
+                    )
+                    register_collector("recent_transactions", cache.stats)
+                    RecentTransactionService._cache = cache
+        return RecentTransactionService._cache
+
+    @staticmethod
+    def record(transaction):
+        """
+        Add a transaction to the rings of its accounts. Must be called after
+        it is committed; its details are then read back as stored.
+        """
+        cache = RecentTransactionService.get_cache()
+        if cache is None:
+            return
+        details = transaction.get_transaction_details()
+        for account_number in {details["account_from"], details["account_to"]}:
+            cache.add(account_number, details)
+
+    @staticmethod
+    def invalidate(account_numbers):
+        """Drop the cached transactions of ``account_numbers``."""
+        cache = RecentTransactionService.get_cache()
+        if cache is not None:
+            cache.invalidate(account_numbers)
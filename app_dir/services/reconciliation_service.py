@@ -0,0 +1,260 @@
+import csv
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time
+
+from sqlalchemy import create_engine, func, or_, select
+
+from app_dir.models.account_model import Account
+from app_dir.models.archived_balance_model import ArchivedAccountBalance
+from app_dir.models.transaction_model import Transaction
+from app_dir.services.archive_service import TransactionArchiveService
+from app_dir.services.balance_bucket_service import BalanceBucketService
+from app_dir.services.balance_service import CREDIT_TYPES, DEBIT_TYPES
+from app_dir.utils.fixed_point import from_cents, to_cents
+from app_dir.utils.throttle import RateLimiter
+
+logger = logging.getLogger("core")
+
+REPORT_FIELDS = ("account_number", "stored_balance", "computed_balance", "difference")
+
+# Per-process state of the reconciliation workers
+_engine = None
+_rate_limiter = None
+
+
+def _init_worker(database_uri, rows_per_second):
+    """Give each worker process its own engine and share of the DB budget."""
+    global _engine, _rate_limiter
+    _engine = create_engine(database_uri, pool_size=1, max_overflow=0)
+    _rate_limiter = RateLimiter(rows_per_second)
+
+
+def _reconcile_range(account_range, chunk_size, archived_until=None):
+    """
+    Reconcile the accounts whose numbers fall in ``account_range``.
+
+    Runs in a worker process. Accounts are read in chunks; for each chunk
+    the balances and the transactions are read in the same DB transaction,
+    and the transactions are streamed and applied in order. When months
+    were archived, the accounts start from their archived net change and
+    only the transactions from ``archived_until`` on are read.
+
+    :return: Tuple of (range start, discrepancies, accounts checked, rows read)
+    """
+    first, last = account_range
+    accounts_table = Account.__table__
+    archived_table = ArchivedAccountBalance.__table__
+    transactions_table = Transaction.__table__
+    live_conditions = [transactions_table.c.status == "COMPLETED"]
+    if archived_until is not None:
+        live_conditions.append(
+            transactions_table.c.timestamp >= datetime.combine(archived_until, time.min)
+        )
+    discrepancies = []
+    accounts_checked = 0
+    rows_read = 0
+    last_account_number = first - 1
+
+    while True:
+        with _engine.connect() as connection, connection.begin():
+            accounts = connection.execute(
+                select(
+                    accounts_table.c.account_number,
+                    BalanceBucketService.total_balance_expression().label("balance"),
+                )
+                .where(
+                    accounts_table.c.account_number > last_account_number,
+                    accounts_table.c.account_number <= last,
+                )
+                .order_by(accounts_table.c.account_number)
+                .limit(chunk_size)
+            ).all()
+            if not accounts:
+                break
+            account_numbers = [account.account_number for account in accounts]
+            computed = dict.fromkeys(account_numbers, 0)
+            if archived_until is not None:
+                for account_number, net_change in connection.execute(
+                    select(
+                        archived_table.c.account_number, archived_table.c.net_change
+                    ).where(archived_table.c.account_number.in_(account_numbers))
+                ):
+                    computed[account_number] = to_cents(net_change)
+
+            transactions = connection.execution_options(
+                stream_results=True, yield_per=chunk_size
+            ).execute(
+                select(
+                    transactions_table.c.account_from,
+                    transactions_table.c.account_to,
+                    transactions_table.c.transaction_type,
+                    transactions_table.c.amount,
+                )
+                .where(
+                    or_(
+                        transactions_table.c.account_from.in_(account_numbers),
+                        transactions_table.c.account_to.in_(account_numbers),
+                    ),
+                    *live_conditions,
+                )
+                .order_by(transactions_table.c.transaction_id)
+            )
+            for partition in transactions.partitions():
+                for account_from, account_to, transaction_type, amount in partition:
+                    cents = to_cents(amount)
+                    if account_to in computed and transaction_type in CREDIT_TYPES:
+                        computed[account_to] += cents
+                    if account_from in computed and transaction_type in DEBIT_TYPES:
+                        computed[account_from] -= cents
+                rows_read += len(partition)
+                _rate_limiter.acquire(len(partition))
+            rows_read += len(accounts)
+            _rate_limiter.acquire(len(accounts))
+
+        for account_number, balance in accounts:
+            stored = to_cents(balance or 0)
+            if stored != computed[account_number]:
+                discrepancies.append(
+                    {
+                        "account_number": account_number,
+                        "stored_balance": str(from_cents(stored)),
+                        "computed_balance": str(from_cents(computed[account_number])),
+                        "difference": str(
+                            from_cents(stored - computed[account_number])
+                        ),
+                    }
+                )
+        accounts_checked += len(accounts)
+        last_account_number = account_numbers[-1]
+
+    return first, discrepancies, accounts_checked, rows_read
+
+
+class ReconciliationService:
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def split_account_ranges(session, range_size, after=None):
+        """
+        Split the existing account numbers into consecutive ranges of
+        ``range_size`` accounts, whatever the gaps between the numbers.
+
+        Every ``range_size``-th account number ends a range; they are read
+        with one scan of the primary key.
+
+        :param after: Only plan the accounts numbered above it
+        :return: List of (first, last) account numbers, both inclusive
+        """
+        conditions = [] if after is None else [Account.account_number > after]
+        numbered = (
+            select(
+                Account.account_number,
+                func.row_number()
+                .over(order_by=Account.account_number)
+                .label("position"),
+            )
+            .where(*conditions)
+            .subquery()
+        )
+        lowest, highest = session.execute(
+            select(
+                func.min(Account.account_number), func.max(Account.account_number)
+            ).where(*conditions)
+        ).one()
+        if lowest is None:
+            return []
+        ends = session.scalars(
+            select(numbered.c.account_number)
+            .where(numbered.c.position % range_size == 0)
+            .order_by(numbered.c.account_number)
+        ).all()
+        if not ends or ends[-1] != highest:
+            ends.append(highest)
+        starts = [lowest] + [end + 1 for end in ends[:-1]]
+        return list(zip(starts, ends))
+
+    @staticmethod
+    def reconcile(
+        session,
+        database_uri,
+        report_path,
+        workers=4,
+        range_size=10000,
+        chunk_size=1000,
+        rows_per_second=None,
+    ):
+        """
+        Compare every account's stored balance with the sum of its COMPLETED
+        transactions, spreading account ranges across a process pool.
+
+        Discrepancies are appended to a CSV report. The last account number
+        of the finished ranges is recorded in ``<report_path>.checkpoint``
+        (ranges finish in order), so running again with the same report
+        resumes after it.
+
+        :param session: Session used to plan the account ranges
+        :param database_uri: URI the worker processes connect to
+        :param report_path: CSV file the discrepancies are written to
+        :param workers: Number of worker processes
+        :param range_size: Number of accounts per unit of work
+        :param chunk_size: Number of accounts read per DB transaction
+        :param rows_per_second: DB rows all workers may read per second in
+            total, or None for no limit
+        :return: Dict with the run's counters
+        """
+        checkpoint_path = f"{report_path}.checkpoint"
+        reconciled_through = None
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as checkpoint_file:
+                reconciled_through = json.load(checkpoint_file)["reconciled_through"]
+            logger.info("Resuming reconciliation after account %s", reconciled_through)
+
+        pending = ReconciliationService.split_account_ranges(
+            session, range_size, after=reconciled_through
+        )
+        totals = {"accounts_checked": 0, "rows_read": 0, "discrepancies": 0}
+        if not pending:
+            return totals
+
+        write_header = not os.path.exists(report_path)
+        archived_until = TransactionArchiveService.get_archived_until()
+        worker_budget = rows_per_second / workers if rows_per_second else None
+
+        with (
+            open(report_path, "a", newline="") as report_file,
+            ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(database_uri, worker_budget),
+            ) as executor,
+        ):
+            report = csv.DictWriter(report_file, fieldnames=REPORT_FIELDS)
+            if write_header:
+                report.writeheader()
+
+            results = executor.map(
+                _reconcile_range,
+                pending,
+                [chunk_size] * len(pending),
+                [archived_until] * len(pending),
+            )
+            # Results come in the order of the ranges
+            for (_, last), (_, discrepancies, accounts_checked, rows_read) in zip(
+                pending, results
+            ):
+                report.writerows(discrepancies)
+                report_file.flush()
+
+                with open(f"{checkpoint_path}.tmp", "w") as checkpoint_file:
+                    json.dump({"reconciled_through": last}, checkpoint_file)
+                os.replace(f"{checkpoint_path}.tmp", checkpoint_path)
+
+                totals["accounts_checked"] += accounts_checked
+                totals["rows_read"] += rows_read
+                totals["discrepancies"] += len(discrepancies)
+
+        return totals
@@ -0,0 +1,243 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import delete, func, insert, select
+
+from app_dir.extensions import db
+from app_dir.models.account_model import Account
+from app_dir.models.transaction_model import Transaction
+from app_dir.models.transaction_rollup_model import DailyTransactionRollup
+from app_dir.services.archive_service import TransactionArchiveService
+from app_dir.services.balance_service import CREDIT_TYPES, DEBIT_TYPES
+from app_dir.utils.fixed_point import divide_half_even, from_cents, to_cents
+from app_dir.utils.upsert import increment_counters
+
+logger = logging.getLogger("core")
+
+ROLLUP_KEY = ("account_number", "day", "transaction_type", "direction", "bucket")
+
+
+class RollupService:
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def record_transactions(
+        transactions, bucket=0, account_numbers=None, reverse=False
+    ):
+        """
+        Add COMPLETED transactions to the daily rollups.
+
+        Must be called before the commit that stores the transactions, so
+        the rollups are updated in the same DB transaction.
+
+        :param transactions: Transaction details as dicts (see
+            ``Transaction.get_transaction_details``)
+        :param bucket: Rollup bucket to add to. Credits to a hot account
+            spread over several rollup rows, like its balance buckets (see
+            BalanceBucketService), so they do not all lock the same row
+        :param account_numbers: Only update the rollups of these accounts,
+            e.g. the local side of a cross-shard transfer (None for all)
+        :param reverse: Subtract the transactions instead, when they are
+            reversed
+        """
+        sign = -1 if reverse else 1
+        totals = defaultdict(lambda: [0, 0])
+        for transaction in transactions:
+            if transaction["status"] != "COMPLETED":
+                continue
+            transaction_type = transaction["transaction_type"]
+            day = transaction["timestamp"].date()
+            cents = to_cents(transaction["amount"])
+            if transaction_type in CREDIT_TYPES and (
+                account_numbers is None or transaction["account_to"] in account_numbers
+            ):
+                total = totals[
+                    (transaction["account_to"], day, transaction_type, "CREDIT", bucket)
+                ]
+                total[0] += sign
+                total[1] += sign * cents
+            if transaction_type in DEBIT_TYPES and (
+                account_numbers is None
+                or transaction["account_from"] in account_numbers
+            ):
+                total = totals[
+                    (
+                        transaction["account_from"],
+                        day,
+                        transaction_type,
+                        "DEBIT",
+                        bucket,
+                    )
+                ]
+                total[0] += sign
+                total[1] += sign * cents
+
+        increment_counters(
+            db.session,
+            DailyTransactionRollup,
+            [
+                {
+                    **dict(zip(ROLLUP_KEY, key)),
+                    "transaction_count": count,
+                    "total_amount": from_cents(cents),
+                }
+                for key, (count, cents) in totals.items()
+            ],
+            ROLLUP_KEY,
+            ("transaction_count", "total_amount"),
+        )
+
+    @staticmethod
+    def backfill(first_day: date, last_day: date, chunk_size=5000):
+        """
+        Rebuild the rollups of the days between ``first_day`` and ``last_day``
+        (inclusive) from the transaction table. Archived days are skipped.
+
+        Accounts are processed in keyset chunks, each replaced in one DB
+        transaction with grouped queries and a multi-row insert.
+
+        :return: Number of rollup rows written
+        """
+        # Archived days are no longer in the transaction table: keep their rollups
+        archived_until = TransactionArchiveService.get_archived_until()
+        if archived_until is not None and first_day < archived_until:
+            logger.warning("Not rebuilding the rollups of archived days")
+            first_day = archived_until
+            if first_day > last_day:
+                return 0
+        start = datetime.combine(first_day, time.min)
+        end = datetime.combine(last_day + timedelta(days=1), time.min)
+        day = func.date(Transaction.timestamp, type_=db.Date)
+        last_account_number = 0
+        written = 0
+
+        while True:
+            account_numbers = (
+                db.session.execute(
+                    select(Account.account_number)
+                    .filter(Account.account_number > last_account_number)
+                    .order_by(Account.account_number)
+                    .limit(chunk_size)
+                )
+                .scalars()
+                .all()
+            )
+            if not account_numbers:
+                break
+
+            rows = []
+            for column, types, direction in (
+                (Transaction.account_to, CREDIT_TYPES, "CREDIT"),
+                (Transaction.account_from, DEBIT_TYPES, "DEBIT"),
+            ):
+                grouped = db.session.execute(
+                    select(
+                        column,
+                        day,
+                        Transaction.transaction_type,
+                        func.count(),
+                        func.sum(Transaction.amount),
+                    )
+                    .filter(
+                        column.in_(account_numbers),
+                        Transaction.transaction_type.in_(types),
+                        Transaction.status == "COMPLETED",
+                        Transaction.timestamp >= start,
+                        Transaction.timestamp < end,
+                    )
+                    .group_by(column, day, Transaction.transaction_type)
+                ).all()
+                rows.extend(
+                    {
+                        "account_number": account_number,
+                        "day": rollup_day,
+                        "transaction_type": transaction_type,
+                        "direction": direction,
+                        "bucket": 0,
+                        "transaction_count": count,
+                        "total_amount": amount,
+                    }
+                    for account_number, rollup_day, transaction_type, count, amount in (
+                        grouped
+                    )
+                )
+
+            try:
+                db.session.execute(
+                    delete(DailyTransactionRollup).filter(
+                        DailyTransactionRollup.account_number.in_(account_numbers),
+                        DailyTransactionRollup.day >= first_day,
+                        DailyTransactionRollup.day <= last_day,
+                    )
+                )
+                if rows:
+                    db.session.execute(insert(DailyTransactionRollup), rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+            written += len(rows)
+            last_account_number = account_numbers[-1]
+
+        return written
+
+    @staticmethod
+    def get_summary(account_number, first_day: date, last_day: date):
+        """
+        Summarize an account's transactions between two days (inclusive)
+        using only the daily rollups.
+
+        :return: Dict with totals per type and direction, overall credits and
+            debits, and average daily inflow and outflow
+        """
+        rows = db.session.execute(
+            select(
+                DailyTransactionRollup.transaction_type,
+                DailyTransactionRollup.direction,
+                func.sum(DailyTransactionRollup.transaction_count),
+                func.sum(DailyTransactionRollup.total_amount),
+            )
+            .filter(
+                DailyTransactionRollup.account_number == account_number,
+                DailyTransactionRollup.day >= first_day,
+                DailyTransactionRollup.day <= last_day,
+            )
+            .group_by(
+                DailyTransactionRollup.transaction_type,
+                DailyTransactionRollup.direction,
+            )
+        ).all()
+
+        days = (last_day - first_day).days + 1
+        totals = {"CREDIT": 0, "DEBIT": 0}
+        by_type = []
+        for transaction_type, direction, count, amount in rows:
+            cents = to_cents(amount)
+            totals[direction] += cents
+            by_type.append(
+                {
+                    "transaction_type": transaction_type,
+                    "direction": direction,
+                    "count": int(count),
+                    "amount": from_cents(cents),
+                }
+            )
+
+        return {
+            "account_number": account_number,
+            "from": first_day.isoformat(),
+            "to": last_day.isoformat(),
+            "days": days,
+            "totals": by_type,
+            "total_credits": from_cents(totals["CREDIT"]),
+            "total_debits": from_cents(totals["DEBIT"]),
+            "average_daily_inflow": from_cents(
+                divide_half_even(totals["CREDIT"], days)
+            ),
+            "average_daily_outflow": from_cents(
+                divide_half_even(totals["DEBIT"], days)
+            ),
+        }
@@ -0,0 +1,385 @@
+import calendar
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import insert, select
+
+from app_dir.extensions import db
+from app_dir.models.scheduled_transfer_model import ScheduledTransfer
+from app_dir.models.transaction_model import Transaction
+from app_dir.services.account_service import AccountService
+from app_dir.services.auth_service import AuthService
+from app_dir.services.recent_transaction_service import RecentTransactionService
+from app_dir.services.settlement_service import SettlementService
+from app_dir.services.transaction_count_service import TransactionCountService
+from app_dir.utils.metrics import register_collector
+
+logger = logging.getLogger("core")
+
+
+# How far in the past starts_at may be, to allow for clock skew and latency
+START_TOLERANCE = timedelta(minutes=1)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ScheduledTransferService:
+    """
+    Scheduled and recurring transfers.
+
+    A single scheduler thread keeps a min-heap of the schedules due before
+    a horizon (SCHEDULER_LOOKAHEAD seconds ahead), refilled every
+    SCHEDULER_REFILL_INTERVAL seconds with an index range scan on
+    ``(is_active, next_run_at)``, so each refill only reads the schedules
+    due soon, never the whole table. Due schedules are executed in batches:
+    their transfers are inserted as PENDING transactions with one
+    statement, in the same DB transaction that advances the schedules, and
+    settled by the settlement batch path (see SettlementService).
+    """
+
+    _scheduler = None
+    _stopping = threading.Event()
+    # Guards the heap, and wakes the scheduler up when a schedule is added
+    _wakeup = threading.Condition()
+    # (next_run_at, schedule_id) of the schedules due before _horizon
+    _heap = []
+    # Run time of each schedule in the heap, to skip superseded entries
+    _queued = {}
+    _horizon = datetime.min
+    _stats_lock = threading.Lock()
+    _stats = {"refills": 0, "executed": 0, "deactivated": 0}
+
+    @staticmethod
+    def get_run_time(starts_at, frequency, occurrence):
+        """
+        Return when occurrence number ``occurrence`` (from 0) of a schedule
+        runs, or None if the schedule has no such occurrence. Monthly
+        schedules keep their day of month, clamped to the length of the
+        month (a transfer starting on the 31st runs on February 28th).
+        """
+        if frequency == "ONCE":
+            return starts_at if occurrence == 0 else None
+        if frequency == "DAILY":
+            return starts_at + timedelta(days=occurrence)
+        if frequency == "WEEKLY":
+            return starts_at + timedelta(weeks=occurrence)
+        month_index = starts_at.month - 1 + occurrence
+        year = starts_at.year + month_index // 12
+        month = month_index % 12 + 1
+        day = min(starts_at.day, calendar.monthrange(year, month)[1])
+        return starts_at.replace(year=year, month=month, day=day)
+
+    @staticmethod
+    def create_schedule(
+        user,
+        from_account_number,
+        to_account_number,
+        amount,
+        frequency,
+        starts_at,
+        description=None,
+    ):
+        """
+        Schedule a transfer from one of the user's accounts.
+
+        :param starts_at: UTC time of the first occurrence (naive), not in
+            the past: the scheduler would make every missed occurrence at once
+        :raises ValueError: If the schedule is invalid
+        """
+        frequency = frequency.upper()
+        if frequency not in ScheduledTransfer.valid_frequencies:
+            raise ValueError(f"Unknown frequency: {frequency}")
+        if starts_at < _utcnow() - START_TOLERANCE:
+            raise ValueError("starts_at cannot be in the past")
+        if amount <= 0:
+            raise ValueError("Transfer amount must be positive")
+        if not AuthService.verify_account_ownership(user, from_account_number):
+            raise ValueError("sender account does not belong to the user")
+        if not AccountService.get_accounts([to_account_number]):
+            raise ValueError(f"Account {to_account_number} not found")
+
+        schedule = ScheduledTransfer(
+            user_id=user.user_id,
+            account_from=from_account_number,
+            account_to=to_account_number,
+            amount=amount,
+            description=description,
+            frequency=frequency,
+            starts_at=starts_at,
+            run_count=0,
+            next_run_at=starts_at,
+            is_active=True,
+        )
+        db.session.add(schedule)
+        db.session.commit()
+        ScheduledTransferService._enqueue(
+            [(schedule.next_run_at, schedule.schedule_id)]
+        )
+        return schedule
+
+    @staticmethod
+    def get_schedules(user):
+        """Get the user's active schedules, soonest first."""
+        return (
+            ScheduledTransfer.query.filter_by(user_id=user.user_id, is_active=True)
+            .order_by(ScheduledTransfer.next_run_at)
+            .all()
+        )
+
+    @staticmethod
+    def cancel_schedule(user, schedule_id):
+        """
+        Deactivate one of the user's schedules. Heap entries of cancelled
+        schedules are skipped when they come due.
+
+        :raises ValueError: If the schedule is not one of the user's
+        """
+        schedule = db.session.get(ScheduledTransfer, schedule_id)
+        if schedule is None or schedule.user_id != user.user_id:
+            raise ValueError(f"Scheduled transfer {schedule_id} not found")
+        schedule.is_active = False
+        db.session.commit()
+        return schedule
+
+    @staticmethod
+    def _enqueue(entries):
+        """Add (run time, schedule ID) pairs due before the horizon to the heap."""
+        with ScheduledTransferService._wakeup:
+            queued = ScheduledTransferService._queued
+            added = False
+            for run_at, schedule_id in entries:
+                if run_at > ScheduledTransferService._horizon:
+                    continue
+                if queued.get(schedule_id) == run_at:
+                    continue
+                queued[schedule_id] = run_at
+                heapq.heappush(ScheduledTransferService._heap, (run_at, schedule_id))
+                added = True
+            if added:
+                ScheduledTransferService._wakeup.notify()
+
+    @staticmethod
+    def load_due(now, lookahead, limit):
+        """
+        Move the horizon to ``now + lookahead`` and queue the active
+        schedules due before it, overdue ones included.
+
+        At most ``limit`` schedules are read; when there are more, the
+        horizon stops at the last one read and the next refill continues.
+
+        :return: Number of schedules read
+        """
+        horizon = now + timedelta(seconds=lookahead)
+        rows = db.session.execute(
+            select(ScheduledTransfer.next_run_at, ScheduledTransfer.schedule_id)
+            .filter(
+                ScheduledTransfer.is_active.is_(True),
+                ScheduledTransfer.next_run_at <= horizon,
+            )
+            .order_by(ScheduledTransfer.next_run_at)
+            .limit(limit)
+        ).all()
+        db.session.rollback()
+        if len(rows) == limit:
+            horizon = rows[-1].next_run_at
+
+        with ScheduledTransferService._wakeup:
+            ScheduledTransferService._horizon = horizon
+        ScheduledTransferService._enqueue([tuple(row) for row in rows])
+        with ScheduledTransferService._stats_lock:
+            ScheduledTransferService._stats["refills"] += 1
+        return len(rows)
+
+    @staticmethod
+    def pop_due(now, limit):
+        """Remove and return up to ``limit`` schedule IDs due at ``now``."""
+        schedule_ids = []
+        with ScheduledTransferService._wakeup:
+            heap = ScheduledTransferService._heap
+            queued = ScheduledTransferService._queued
+            while heap and heap[0][0] <= now and len(schedule_ids) < limit:
+                run_at, schedule_id = heapq.heappop(heap)
+                if queued.get(schedule_id) == run_at:
+                    del queued[schedule_id]
+                    schedule_ids.append(schedule_id)
+        return schedule_ids
+
+    @staticmethod
+    def run_schedules(schedule_ids, now):
+        """
+        Execute the occurrences of the given schedules that are due at
+        ``now`` and advance them to their next occurrence.
+
+        Schedules are locked with SKIP LOCKED, so several scheduler
+        processes never run the same occurrence twice. Schedules whose
+        accounts no longer exist or whose source account changed owner are
+        deactivated.
+
+        :return: Number of transfers submitted
+        """
+        schedules = (
+            db.session.execute(
+                select(ScheduledTransfer)
+                .filter(
+                    ScheduledTransfer.schedule_id.in_(schedule_ids),
+                    ScheduledTransfer.is_active.is_(True),
+                    ScheduledTransfer.next_run_at <= now,
+                )
+                .with_for_update(skip_locked=True)
+            )
+            .scalars()
+            .all()
+        )
+        if not schedules:
+            db.session.rollback()
+            return 0
+
+        accounts = AccountService.get_accounts(
+            {schedule.account_from for schedule in schedules}
+            | {schedule.account_to for schedule in schedules}
+        )
+        timestamp = datetime.now(timezone.utc)
+        transactions = []
+        rescheduled = []
+        deactivated = 0
+        for schedule in schedules:
+            from_account = accounts.get(schedule.account_from)
+            if (
+                from_account is None
+                or schedule.account_to not in accounts
+                or from_account.user_id != schedule.user_id
+            ):
+                logger.warning(
+                    "Deactivating scheduled transfer %s: invalid accounts",
+                    schedule.schedule_id,
+                )
+                schedule.is_active = False
+                deactivated += 1
+                continue
+
+            transactions.append(
+                {
+                    "account_from": schedule.account_from,
+                    "account_to": schedule.account_to,
+                    "amount": schedule.amount,
+                    "timestamp": timestamp,
+                    "transaction_type": "TRANSFER",
+                    "description": schedule.description
+                    or f"Scheduled transfer of ${schedule.amount:.2f}",
+                    "status": "PENDING",
+                    "balance_after": from_account.total_balance,
+                }
+            )
+            schedule.run_count += 1
+            schedule.last_run_at = now
+            next_run_at = ScheduledTransferService.get_run_time(
+                schedule.starts_at, schedule.frequency, schedule.run_count
+            )
+            if next_run_at is None:
+                schedule.is_active = False
+            else:
+                schedule.next_run_at = next_run_at
+                rescheduled.append((next_run_at, schedule.schedule_id))
+
+        try:
+            if transactions:
+                db.session.execute(insert(Transaction), transactions)
+                TransactionCountService.record_transactions(transactions)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        RecentTransactionService.invalidate(
+            {transaction["account_from"] for transaction in transactions}
+            | {transaction["account_to"] for transaction in transactions}
+        )
+
+        ScheduledTransferService._enqueue(rescheduled)
+        with ScheduledTransferService._stats_lock:
+            ScheduledTransferService._stats["executed"] += len(transactions)
+            ScheduledTransferService._stats["deactivated"] += deactivated
+        return len(transactions)
+
+    @staticmethod
+    def start(app):
+        """Start the scheduler thread for ``app``."""
+        if ScheduledTransferService._scheduler is not None:
+            return
+        ScheduledTransferService._stopping.clear()
+        ScheduledTransferService._scheduler = threading.Thread(
+            target=ScheduledTransferService._run_scheduler,
+            args=(app,),
+            name="transfer-scheduler",
+            daemon=True,
+        )
+        ScheduledTransferService._scheduler.start()
+        register_collector("scheduler", ScheduledTransferService.stats)
+
+    @staticmethod
+    def stop():
+        """Stop the scheduler after its current batch."""
+        ScheduledTransferService._stopping.set()
+        with ScheduledTransferService._wakeup:
+            ScheduledTransferService._wakeup.notify_all()
+        if ScheduledTransferService._scheduler is not None:
+            ScheduledTransferService._scheduler.join()
+            ScheduledTransferService._scheduler = None
+
+    @staticmethod
+    def _run_scheduler(app):
+        lookahead = app.config["SCHEDULER_LOOKAHEAD"]
+        refill_interval = app.config["SCHEDULER_REFILL_INTERVAL"]
+        batch_size = app.config["SCHEDULER_BATCH_SIZE"]
+        max_queued = app.config["SCHEDULER_MAX_QUEUED"]
+        next_refill = datetime.min
+        with app.app_context():
+            while not ScheduledTransferService._stopping.is_set():
+                now = _utcnow()
+                try:
+                    if now >= next_refill:
+                        ScheduledTransferService.load_due(now, lookahead, max_queued)
+                        next_refill = now + timedelta(seconds=refill_interval)
+                    schedule_ids = ScheduledTransferService.pop_due(now, batch_size)
+                    if schedule_ids:
+                        ScheduledTransferService.run_schedules(schedule_ids, now)
+                        ScheduledTransferService._settle_submitted(batch_size)
+                        continue
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Transfer scheduler failed a batch")
+                finally:
+                    db.session.remove()
+
+                # Sleep until the next schedule or refill is due, or a
+                # schedule due sooner is added
+                with ScheduledTransferService._wakeup:
+                    wake_at = next_refill
+                    if ScheduledTransferService._heap:
+                        wake_at = min(wake_at, ScheduledTransferService._heap[0][0])
+                    timeout = (wake_at - _utcnow()).total_seconds()
+                    if timeout > 0:
+                        ScheduledTransferService._wakeup.wait(timeout)
+
+    @staticmethod
+    def _settle_submitted(batch_size):
+        """Hand the submitted transfers over to the settlement batch path."""
+        if current_app.config["ASYNC_SETTLEMENT_ENABLED"]:
+            SettlementService.notify_submitted()
+            return
+        # No settlement workers: settle the batch on the scheduler thread
+        while SettlementService.settle_batch(batch_size=batch_size):
+            pass
+
+    @staticmethod
+    def stats():
+        """Return the heap size and the number of executed transfers."""
+        with ScheduledTransferService._stats_lock:
+            stats = dict(ScheduledTransferService._stats)
+        with ScheduledTransferService._wakeup:
+            stats["queued"] = len(ScheduledTransferService._queued)
+        return stats
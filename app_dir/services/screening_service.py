@@ -0,0 +1,298 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict
+from typing import Optional
+
+from flask import current_app
+
+from app_dir.utils.fixed_point import to_cents
+from app_dir.utils.metrics import register_collector
+
+
+class SlidingWindow:
+    """
+    Count and sum of amounts of an account's recent transactions, kept in a
+    ring of fixed-size time buckets. Updating it is O(number of buckets) in
+    the worst case and O(1) amortized.
+    """
+
+    __slots__ = (
+        "bucket_seconds",
+        "buckets",
+        "counts",
+        "sums",
+        "head",
+        "count",
+        "total",
+        "last_seen",
+    )
+
+    def __init__(self, window_seconds, buckets):
+        self.bucket_seconds = window_seconds / buckets
+        self.buckets = buckets
+        self.counts = array("q", bytes(8 * buckets))
+        self.sums = array("q", bytes(8 * buckets))
+        self.head = 0
+        self.count = 0
+        self.total = 0
+        self.last_seen = 0
+
+    def advance(self, now):
+        """Drop the buckets that have fallen out of the window."""
+        self.last_seen = now
+        bucket = int(now / self.bucket_seconds)
+        expired = bucket - self.head
+        if expired <= 0:
+            return
+        if expired >= self.buckets:
+            self.counts = array("q", bytes(8 * self.buckets))
+            self.sums = array("q", bytes(8 * self.buckets))
+            self.count = 0
+            self.total = 0
+        else:
+            for offset in range(1, expired + 1):
+                index = (self.head + offset) % self.buckets
+                self.count -= self.counts[index]
+                self.total -= self.sums[index]
+                self.counts[index] = 0
+                self.sums[index] = 0
+        self.head = bucket
+
+    def add(self, amount_cents):
+        """
+        Add a transaction to the current bucket.
+
+        :return: The bucket it was added to, for ``remove``
+        """
+        index = self.head % self.buckets
+        self.counts[index] += 1
+        self.sums[index] += amount_cents
+        self.count += 1
+        self.total += amount_cents
+        return self.head
+
+    def remove(self, amount_cents, bucket):
+        """Remove a transaction added to ``bucket``, unless it expired."""
+        index = bucket % self.buckets
+        if bucket <= self.head - self.buckets or not self.counts[index]:
+            return
+        self.counts[index] -= 1
+        self.sums[index] -= amount_cents
+        self.count -= 1
+        self.total -= amount_cents
+
+
+class ScreeningRule(ABC):
+    """
+    Base class of the velocity screening rules.
+
+    A rule looks at the transactions of one type made from an account
+    within ``window_seconds`` and returns a reason to reject the new one,
+    or None to let it through.
+    """
+
+    def __init__(self, transaction_type, window_seconds):
+        self.transaction_type = transaction_type
+        self.window_seconds = window_seconds
+
+    @abstractmethod
+    def check(self, count, total_cents, amount_cents) -> Optional[str]:
+        """
+        :param count: Transactions already in the window
+        :param total_cents: Their total amount in cents
+        :param amount_cents: Amount of the new transaction in cents
+        """
+
+
+class MaxCountRule(ScreeningRule):
+    """Reject more than ``max_count`` transactions within the window."""
+
+    def __init__(self, transaction_type, window_seconds, max_count):
+        super().__init__(transaction_type, window_seconds)
+        self.max_count = max_count
+
+    def check(self, count, total_cents, amount_cents):
+        if count + 1 > self.max_count:
+            return (
+                f"more than {self.max_count} {self.transaction_type.lower()}s "
+                f"in {self.window_seconds} seconds"
+            )
+        return None
+
+
+class MaxAmountRule(ScreeningRule):
+    """Reject transactions whose total within the window exceeds a maximum."""
+
+    def __init__(self, transaction_type, window_seconds, max_amount):
+        super().__init__(transaction_type, window_seconds)
+        self.max_amount = max_amount
+        self.max_cents = to_cents(max_amount)
+
+    def check(self, count, total_cents, amount_cents):
+        if total_cents + amount_cents > self.max_cents:
+            return (
+                f"{self.transaction_type.lower()}s over {self.max_amount} "
+                f"in {self.window_seconds} seconds"
+            )
+        return None
+
+
+RULE_TYPES = {"max_count": MaxCountRule, "max_amount": MaxAmountRule}
+
+
+class TransactionScreener:
+    """
+    In-memory velocity screening of transactions.
+
+    Keeps one sliding window per account, transaction type and rule window
+    length. Windows not touched for ``ttl_seconds`` are evicted, and at
+    most ``max_windows`` are kept (least recently used are evicted first).
+    """
+
+    def __init__(self, rules=(), buckets=12, ttl_seconds=3600, max_windows=2000000):
+        self.rules = {}
+        self.buckets = buckets
+        self.ttl_seconds = ttl_seconds
+        self.max_windows = max_windows
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+        self.screened = 0
+        self.flagged = 0
+        self.released = 0
+        for rule in rules:
+            self.register_rule(rule)
+
+    def register_rule(self, rule: ScreeningRule):
+        """Add a rule; it applies to transactions of its type."""
+        self.rules.setdefault(rule.transaction_type, []).append(rule)
+
+    def screen(self, account_number, transaction_type, amount, now=None):
+        """
+        Check a transaction against the rules and record it if it passes.
+
+        :return: Receipt to pass to ``release`` if the transaction does not
+            go through after all, or None if no rule applies
+        :raises ValueError: If a rule flags the transaction
+        """
+        rules = self.rules.get(transaction_type)
+        if not rules:
+            return None
+        now = time.time() if now is None else now
+        amount_cents = to_cents(amount)
+
+        with self._lock:
+            self.screened += 1
+            windows = {}
+            for rule in rules:
+                key = (account_number, transaction_type, rule.window_seconds)
+                window = self._get_window(key, now)
+                reason = rule.check(window.count, window.total, amount_cents)
+                if reason:
+                    self.flagged += 1
+                    raise ValueError(f"Transaction flagged by screening: {reason}")
+                windows[key] = window
+
+            recorded = [
+                (key, window.add(amount_cents)) for key, window in windows.items()
+            ]
+            self._evict(now)
+        return amount_cents, recorded
+
+    def release(self, receipt):
+        """
+        Remove a transaction recorded by ``screen`` that was then rejected
+        by a later check or rolled back, so it does not count towards the
+        velocity limits.
+        """
+        amount_cents, recorded = receipt
+        with self._lock:
+            self.released += 1
+            for key, bucket in recorded:
+                window = self._windows.get(key)
+                if window is not None:
+                    window.remove(amount_cents, bucket)
+
+    def _get_window(self, key, now):
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = SlidingWindow(key[2], self.buckets)
+        else:
+            self._windows.move_to_end(key)
+        window.advance(now)
+        return window
+
+    def _evict(self, now):
+        """Evict expired windows and keep the total under ``max_windows``."""
+        windows = self._windows
+        while windows:
+            key, window = next(iter(windows.items()))
+            if (
+                len(windows) <= self.max_windows
+                and now - window.last_seen < self.ttl_seconds
+            ):
+                break
+            del windows[key]
+
+    def stats(self):
+        """Return the number of tracked windows and screening counters."""
+        with self._lock:
+            return {
+                "tracked_windows": len(self._windows),
+                "screened": self.screened,
+                "flagged": self.flagged,
+                "released": self.released,
+            }
+
+
+class ScreeningService:
+    """Screening stage run in front of AccountService debits and credits."""
+
+    _screener = None
+    _screener_lock = threading.Lock()
+
+    @staticmethod
+    def get_screener() -> TransactionScreener:
+        """Return the process-wide screener, built from the app config."""
+        if ScreeningService._screener is None:
+            with ScreeningService._screener_lock:
+                if ScreeningService._screener is None:
+                    config = current_app.config
+                    screener = TransactionScreener(
+                        rules=[
+                            RULE_TYPES[rule["rule"]](
+                                rule["transaction_type"],
+                                rule["window_seconds"],
+                                rule["limit"],
+                            )
+                            for rule in config["SCREENING_RULES"]
+                        ],
+                        buckets=config["SCREENING_WINDOW_BUCKETS"],
+                        ttl_seconds=config["SCREENING_TTL_SECONDS"],
+                        max_windows=config["SCREENING_MAX_WINDOWS"],
+                    )
+                    register_collector("screening", screener.stats)
+                    ScreeningService._screener = screener
+        return ScreeningService._screener
+
+    @staticmethod
+    def screen(account_number, transaction_type, amount):
+        """
+        Screen a transaction if screening is enabled.
+
+        :return: Receipt to pass to ``release`` if the transaction fails a
+            later check or is rolled back
+        :raises ValueError: If the transaction is flagged
+        """
+        if not current_app.config.get("SCREENING_ENABLED", True):
+            return None
+        return ScreeningService.get_screener().screen(
+            account_number, transaction_type, amount
+        )
+
+    @staticmethod
+    def release(receipt):
+        """Stop counting a screened transaction that did not go through."""
+        if receipt is not None:
+            ScreeningService.get_screener().release(receipt)
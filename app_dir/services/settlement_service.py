@@ -0,0 +1,180 @@
+import logging
+import threading
+
+from sqlalchemy import select, update
+
+from app_dir.extensions import db
+from app_dir.models.transaction_model import Transaction
+from app_dir.services.account_service import AccountService
+from app_dir.services.recent_transaction_service import RecentTransactionService
+from app_dir.utils.metrics import register_collector
+
+logger = logging.getLogger("core")
+
+
+class SettlementService:
+    """
+    Local worker pool settling PENDING transactions.
+
+    Each worker owns the source accounts whose number modulo the number of
+    workers equals its index, and settles their transactions in
+    transaction_id order, so transactions from one account are always
+    applied in the order they were submitted. Every poll settles a
+    micro-batch in one DB transaction, with a savepoint per transaction so
+    a failure only affects the transaction that caused it.
+    """
+
+    _workers = []
+    _stopping = threading.Event()
+    # Notified when new transactions are submitted or a batch is settled
+    _submitted = threading.Condition()
+    _settled = threading.Condition()
+    _settled_generation = 0
+    _stats_lock = threading.Lock()
+    _stats = {"batches": 0, "completed": 0, "failed": 0}
+
+    @staticmethod
+    def start(app):
+        """Start the settlement workers configured for ``app``."""
+        if SettlementService._workers:
+            return
+        SettlementService._stopping.clear()
+        worker_count = app.config["SETTLEMENT_WORKERS"]
+        for index in range(worker_count):
+            worker = threading.Thread(
+                target=SettlementService._run_worker,
+                args=(app, index, worker_count),
+                name=f"settlement-worker-{index}",
+                daemon=True,
+            )
+            worker.start()
+            SettlementService._workers.append(worker)
+        register_collector("settlement", SettlementService.stats)
+
+    @staticmethod
+    def stop():
+        """Stop the workers after their current batch."""
+        SettlementService._stopping.set()
+        SettlementService.notify_submitted()
+        for worker in SettlementService._workers:
+            worker.join()
+        SettlementService._workers = []
+
+    @staticmethod
+    def notify_submitted():
+        """Wake the workers up after PENDING transactions were submitted."""
+        with SettlementService._submitted:
+            SettlementService._submitted.notify_all()
+
+    @staticmethod
+    def settled_generation():
+        """Return a counter increased every time this process settles a batch."""
+        return SettlementService._settled_generation
+
+    @staticmethod
+    def wait_for_settlement(generation, timeout):
+        """
+        Block until a batch is settled after ``generation`` was read (see
+        ``settled_generation``) or ``timeout`` seconds have passed.
+        """
+        with SettlementService._settled:
+            SettlementService._settled.wait_for(
+                lambda: SettlementService._settled_generation != generation, timeout
+            )
+
+    @staticmethod
+    def _run_worker(app, index, worker_count):
+        poll_interval = app.config["SETTLEMENT_POLL_INTERVAL"]
+        batch_size = app.config["SETTLEMENT_BATCH_SIZE"]
+        with app.app_context():
+            while not SettlementService._stopping.is_set():
+                try:
+                    settled = SettlementService.settle_batch(
+                        index, worker_count, batch_size
+                    )
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Settlement worker %d failed a batch", index)
+                    settled = 0
+                finally:
+                    db.session.remove()
+
+                if not settled:
+                    with SettlementService._submitted:
+                        SettlementService._submitted.wait(poll_interval)
+
+    @staticmethod
+    def settle_batch(index=0, worker_count=1, batch_size=100):
+        """
+        Settle the oldest PENDING transactions of the worker's accounts.
+
+        :return: Number of transactions settled
+        """
+        transactions = (
+            db.session.execute(
+                select(Transaction)
+                .filter(
+                    Transaction.status == "PENDING",
+                    Transaction.account_from % worker_count == index,
+                )
+                .order_by(Transaction.transaction_id)
+                .limit(batch_size)
+                # Claim the batch: rows claimed by another worker or
+                # process are skipped rather than settled twice
+                .with_for_update(skip_locked=True)
+            )
+            .scalars()
+            .all()
+        )
+        if not transactions:
+            db.session.rollback()
+            return 0
+
+        # Read before settling: failed settlements expire their transaction
+        account_numbers = {transaction.account_from for transaction in transactions} | {
+            transaction.account_to for transaction in transactions
+        }
+        completed = failed = 0
+        for transaction in transactions:
+            transaction_id = transaction.transaction_id
+            try:
+                with db.session.begin_nested():
+                    if not AccountService.settle_pending_transaction(transaction):
+                        continue
+                completed += 1
+            except ValueError as e:
+                logger.info("Transaction %s failed: %s", transaction_id, e)
+                transaction.status = "FAILED"
+                failed += 1
+            except Exception:
+                # E.g. bad data: fail it rather than the whole batch, which
+                # would be claimed again by every poll
+                logger.exception("Transaction %s could not be settled", transaction_id)
+                with db.session.begin_nested():
+                    db.session.execute(
+                        update(Transaction)
+                        .where(Transaction.transaction_id == transaction_id)
+                        .values(status="FAILED")
+                        .execution_options(synchronize_session=False)
+                    )
+                db.session.expire(transaction)
+                failed += 1
+        db.session.commit()
+        RecentTransactionService.invalidate(account_numbers)
+
+        with SettlementService._stats_lock:
+            SettlementService._stats["batches"] += 1
+            SettlementService._stats["completed"] += completed
+            SettlementService._stats["failed"] += failed
+        with SettlementService._settled:
+            SettlementService._settled_generation += 1
+            SettlementService._settled.notify_all()
+        return len(transactions)
+
+    @staticmethod
+    def stats():
+        """Return the number of settled batches and transactions."""
+        with SettlementService._stats_lock:
+            stats = dict(SettlementService._stats)
+        stats["workers"] = len(SettlementService._workers)
+        return stats
@@ -0,0 +1,554 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, or_, select, text, update
+
+from app_dir.extensions import db
+from app_dir.models.account_daily_usage_model import AccountDailyUsage
+from app_dir.models.account_model import Account
+from app_dir.models.archived_balance_model import ArchivedAccountBalance
+from app_dir.models.balance_bucket_model import AccountBalanceBucket
+from app_dir.models.balance_snapshot_model import BalanceSnapshot
+from app_dir.models.jwttoken import JWTToken
+from app_dir.models.scheduled_transfer_model import ScheduledTransfer
+from app_dir.models.shard_account_model import ShardAccount
+from app_dir.models.shard_user_model import ShardUser
+from app_dir.models.transaction_count_model import AccountTransactionCount
+from app_dir.models.transaction_model import Transaction
+from app_dir.models.transaction_rollup_model import DailyTransactionRollup
+from app_dir.models.user_model import User
+from app_dir.services.account_number_service import AccountNumberService
+from app_dir.utils.metrics import register_collector
+from app_dir.utils.shard_routing import (
+    ShardUnavailableError,
+    select_shard,
+    shard_bind_key,
+)
+
+logger = logging.getLogger("core")
+
+USER_ID_SEQUENCE = "user_id"
+# Account owners cached per process; accounts never change owner
+ACCOUNT_CACHE_SIZE = 100000
+# Tables holding a user's data, in foreign key order
+MOVED_MODELS = (
+    User,
+    Account,
+    JWTToken,
+    AccountBalanceBucket,
+    AccountDailyUsage,
+    AccountTransactionCount,
+    ArchivedAccountBalance,
+    BalanceSnapshot,
+    DailyTransactionRollup,
+    ScheduledTransfer,
+    Transaction,
+)
+# Auto-increment keys, reassigned by the shard the rows are moved to
+GENERATED_KEYS = {"transaction": "transaction_id", "scheduled_transfer": "schedule_id"}
+COPY_CHUNK_SIZE = 1000
+
+
+class ShardService:
+    """
+    Horizontal sharding of users and their accounts by user_id.
+
+    With DATABASE_SHARD_URIS set, every user lives on one shard, with their
+    accounts, transactions and tokens. The default database is the
+    directory: it allocates user IDs and records the shard of each user
+    and the owner of each account (ShardUser, ShardAccount). New users are
+    placed on shard ``user_id % number of shards``; ``move_user`` and
+    ``rebalance`` move them later.
+
+    Each request selects its user's shard from the JWT claims (or from
+    the username when logging in), and db.session then sends every
+    statement to it. Directory entries are cached for
+    SHARD_DIRECTORY_TTL_SECONDS.
+    """
+
+    _lock = threading.Lock()
+    _users = {}
+    _accounts = OrderedDict()
+    _stats = {"directory_lookups": 0, "moves": 0, "moved_rows": 0}
+    _collector_registered = False
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def is_enabled():
+        """Return True if the data is split over several shards."""
+        return bool(current_app.config["DATABASE_SHARD_URIS"])
+
+    @staticmethod
+    def get_shard_count():
+        return len(current_app.config["DATABASE_SHARD_URIS"])
+
+    @staticmethod
+    def get_engine(shard):
+        """Return the engine of ``shard``."""
+        return db.engines[shard_bind_key(shard)]
+
+    @staticmethod
+    def get_user_shard(user_id, allow_moving=False):
+        """
+        Return the shard of a user, or None if the user is unknown.
+
+        :raises ShardUnavailableError: If the user is being moved
+        """
+        ShardService._register_collector()
+        now = time.monotonic()
+        with ShardService._lock:
+            entry = ShardService._users.get(user_id)
+        if (
+            entry is None
+            or now - entry[2] > current_app.config["SHARD_DIRECTORY_TTL_SECONDS"]
+        ):
+            users = ShardUser.__table__
+            with db.engine.connect() as connection:
+                row = connection.execute(
+                    select(users.c.shard, users.c.moving_to).where(
+                        users.c.user_id == user_id
+                    )
+                ).first()
+            if row is None:
+                return None
+            entry = (row.shard, row.moving_to, now)
+            with ShardService._lock:
+                ShardService._users[user_id] = entry
+                ShardService._stats["directory_lookups"] += 1
+
+        shard, moving_to, _ = entry
+        if moving_to is not None and not allow_moving:
+            raise ShardUnavailableError(
+                f"User {user_id} is being moved to another shard, retry shortly"
+            )
+        return shard
+
+    @staticmethod
+    def get_account_shard(account_number):
+        """
+        Return the shard of an account's owner, or None if it is unknown.
+
+        :raises ShardUnavailableError: If the owner is being moved
+        """
+        account_number = int(account_number)
+        with ShardService._lock:
+            user_id = ShardService._accounts.get(account_number)
+            if user_id is not None:
+                ShardService._accounts.move_to_end(account_number)
+        if user_id is None:
+            accounts = ShardAccount.__table__
+            with db.engine.connect() as connection:
+                user_id = connection.scalar(
+                    select(accounts.c.user_id).where(
+                        accounts.c.account_number == account_number
+                    )
+                )
+            if user_id is None:
+                return None
+            with ShardService._lock:
+                ShardService._accounts[account_number] = user_id
+                if len(ShardService._accounts) > ACCOUNT_CACHE_SIZE:
+                    ShardService._accounts.popitem(last=False)
+        return ShardService.get_user_shard(user_id)
+
+    @staticmethod
+    def select_for_claims(jwt_payload):
+        """
+        Select the shard of the user a JWT was issued to. Tokens issued
+        before sharding was enabled have no user_id claim and are looked up
+        by username.
+        """
+        if not ShardService.is_enabled():
+            return
+        user_id = jwt_payload.get("user_id")
+        if user_id is None:
+            ShardService.select_for_username(jwt_payload["sub"])
+        else:
+            select_shard(ShardService.get_user_shard(user_id))
+
+    @staticmethod
+    def select_for_username(username):
+        """Select the shard of the user with ``username``, if any."""
+        if not ShardService.is_enabled():
+            return
+        users = ShardUser.__table__
+        with db.engine.connect() as connection:
+            user_id = connection.scalar(
+                select(users.c.user_id).where(users.c.username == username)
+            )
+        select_shard(
+            ShardService.get_user_shard(user_id) if user_id is not None else None
+        )
+
+    @staticmethod
+    def register_user(username):
+        """
+        Allocate a user ID, place the user on a shard and select it.
+
+        :return: The new user's ID
+        :raises ValueError: If the username is taken
+        """
+        user_id = AccountNumberService._reserve_block(1, USER_ID_SEQUENCE) + 1
+        shard = user_id % ShardService.get_shard_count()
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(
+                    insert(ShardUser.__table__).values(
+                        user_id=user_id, username=username, shard=shard
+                    )
+                )
+        except Exception as e:
+            raise ValueError("Username already exists") from e
+        select_shard(shard)
+        return user_id
+
+    @staticmethod
+    def unregister_user(user_id):
+        """Remove a user whose creation failed from the directory."""
+        with db.engine.begin() as connection:
+            connection.execute(
+                delete(ShardUser.__table__).where(
+                    ShardUser.__table__.c.user_id == user_id
+                )
+            )
+
+    @staticmethod
+    def register_accounts(accounts):
+        """
+        Record the owners of new accounts in the directory.
+
+        :param accounts: List of (account_number, user_id) tuples
+        """
+        if not accounts or not ShardService.is_enabled():
+            return
+        with db.engine.begin() as connection:
+            connection.execute(
+                insert(ShardAccount.__table__),
+                [
+                    {"account_number": account_number, "user_id": user_id}
+                    for account_number, user_id in accounts
+                ],
+            )
+
+    @staticmethod
+    def move_user(user_id, to_shard, grace_seconds=10):
+        """
+        Move a user and everything of their accounts to ``to_shard``.
+
+        The user is marked as moving in the directory first, and their
+        requests are refused until the move is done; the move waits
+        ``grace_seconds`` for requests in flight and cached directory
+        entries to expire. The data is copied in one DB transaction on the
+        target shard, the directory is switched, then the data is deleted
+        from the source shard. Running it again finishes an interrupted
+        move.
+
+        Transactions shared with accounts that stay on the source shard
+        are kept there too. Moved transactions and scheduled transfers get
+        new IDs on the target shard; their reference codes are kept.
+
+        :return: Dict with the number of rows copied and deleted
+        """
+        users = ShardUser.__table__
+        with db.engine.begin() as connection:
+            row = connection.execute(
+                select(users.c.shard, users.c.moving_to).where(
+                    users.c.user_id == user_id
+                )
+            ).first()
+        if row is None:
+            raise ValueError(f"User {user_id} not found in the shard directory")
+        from_shard = row.shard
+        if from_shard == to_shard and row.moving_to is None:
+            return ShardService._delete_leftovers(user_id, to_shard)
+
+        if row.moving_to != to_shard:
+            with db.engine.begin() as connection:
+                connection.execute(
+                    update(users)
+                    .where(users.c.user_id == user_id)
+                    .values(moving_to=to_shard)
+                )
+            time.sleep(grace_seconds)
+
+        copied = ShardService._copy_user(user_id, from_shard, to_shard)
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(users)
+                .where(users.c.user_id == user_id)
+                .values(shard=to_shard, moving_to=None)
+            )
+        with ShardService._lock:
+            ShardService._users.pop(user_id, None)
+
+        result = ShardService._delete_from(user_id, from_shard)
+        result["copied"] = copied
+        with ShardService._lock:
+            ShardService._stats["moves"] += 1
+            ShardService._stats["moved_rows"] += copied
+        logger.info(
+            "Moved user %d from shard %d to %d (%d rows)",
+            user_id,
+            from_shard,
+            to_shard,
+            copied,
+        )
+        return result
+
+    @staticmethod
+    def _user_filters(user_id, account_numbers):
+        """Conditions selecting a user's rows in each moved table."""
+        filters = {}
+        for model in MOVED_MODELS:
+            table = model.__table__
+            if table.name == "transaction":
+                filters[table.name] = or_(
+                    table.c.account_from.in_(account_numbers),
+                    table.c.account_to.in_(account_numbers),
+                )
+            elif "user_id" in table.c:
+                filters[table.name] = table.c.user_id == user_id
+            else:
+                filters[table.name] = table.c.account_number.in_(account_numbers)
+        return filters
+
+    @staticmethod
+    def _foreign_key_checks(connection, enabled):
+        """
+        Turn foreign key checks off while moving rows: transfers and
+        scheduled transfers may reference accounts of another shard.
+        """
+        if connection.dialect.name == "mysql":
+            connection.execute(text(f"SET SESSION foreign_key_checks = {int(enabled)}"))
+        elif connection.dialect.name == "sqlite" and not enabled:
+            connection.execute(text("PRAGMA defer_foreign_keys = ON"))
+
+    @staticmethod
+    def _copy_user(user_id, from_shard, to_shard):
+        """
+        Copy a user's rows to ``to_shard`` in one DB transaction, unless a
+        previous run already did.
+
+        :return: Number of rows copied
+        """
+        accounts = Account.__table__
+        transactions = Transaction.__table__
+        with ShardService.get_engine(to_shard).begin() as target:
+            if target.scalar(
+                select(func.count()).select_from(User).where(User.user_id == user_id)
+            ):
+                return 0
+            ShardService._foreign_key_checks(target, False)
+
+            with ShardService.get_engine(from_shard).connect() as source:
+                account_numbers = source.scalars(
+                    select(accounts.c.account_number).where(
+                        accounts.c.user_id == user_id
+                    )
+                ).all()
+                filters = ShardService._user_filters(user_id, account_numbers)
+                copied = 0
+                for model in MOVED_MODELS:
+                    table = model.__table__
+                    rows = [
+                        dict(row)
+                        for row in source.execute(
+                            select(table).where(filters[table.name])
+                        ).mappings()
+                    ]
+                    generated_key = GENERATED_KEYS.get(table.name)
+                    if generated_key:
+                        for row in rows:
+                            del row[generated_key]
+                    if table.name == "transaction":
+                        # The other leg of a cross-shard transfer may
+                        # already be on the target shard
+                        rows = ShardService._skip_existing_transactions(
+                            target, transactions, rows
+                        )
+                    for start in range(0, len(rows), COPY_CHUNK_SIZE):
+                        target.execute(
+                            insert(table), rows[start : start + COPY_CHUNK_SIZE]
+                        )
+                    copied += len(rows)
+            ShardService._foreign_key_checks(target, True)
+        return copied
+
+    @staticmethod
+    def _skip_existing_transactions(connection, transactions, rows):
+        codes = [row["reference_code"] for row in rows]
+        existing = set()
+        for start in range(0, len(codes), COPY_CHUNK_SIZE):
+            existing.update(
+                connection.scalars(
+                    select(transactions.c.reference_code).where(
+                        transactions.c.reference_code.in_(
+                            codes[start : start + COPY_CHUNK_SIZE]
+                        )
+                    )
+                )
+            )
+        return [row for row in rows if row["reference_code"] not in existing]
+
+    @staticmethod
+    def _delete_from(user_id, shard):
+        """
+        Delete a moved user's rows from ``shard`` in one DB transaction,
+        keeping the transactions of the accounts that stay there.
+
+        :return: Dict with the number of rows deleted
+        """
+        accounts = Account.__table__
+        transactions = Transaction.__table__
+        deleted = 0
+        with ShardService.get_engine(shard).begin() as connection:
+            ShardService._foreign_key_checks(connection, False)
+            account_numbers = connection.scalars(
+                select(accounts.c.account_number).where(accounts.c.user_id == user_id)
+            ).all()
+            filters = ShardService._user_filters(user_id, account_numbers)
+            remaining = select(accounts.c.account_number).where(
+                accounts.c.user_id != user_id
+            )
+            filters["transaction"] = (
+                filters["transaction"]
+                & transactions.c.account_from.not_in(remaining)
+                & transactions.c.account_to.not_in(remaining)
+            )
+            for model in reversed(MOVED_MODELS):
+                table = model.__table__
+                deleted += connection.execute(
+                    delete(table).where(filters[table.name])
+                ).rowcount
+            ShardService._foreign_key_checks(connection, True)
+        return {"deleted": deleted}
+
+    @staticmethod
+    def _delete_leftovers(user_id, shard):
+        """Finish a move that stopped before the source shard was cleaned."""
+        result = {"copied": 0, "deleted": 0}
+        for other in range(ShardService.get_shard_count()):
+            if other == shard:
+                continue
+            with ShardService.get_engine(other).connect() as connection:
+                leftover = connection.scalar(
+                    select(func.count())
+                    .select_from(User)
+                    .where(User.user_id == user_id)
+                )
+            if leftover:
+                result["deleted"] += ShardService._delete_from(user_id, other)[
+                    "deleted"
+                ]
+        return result
+
+    @staticmethod
+    def plan_rebalance(max_moves=None):
+        """
+        Plan moves from the shards with the most users to those with the
+        fewest, until they differ by at most one user.
+
+        :return: List of (user_id, from_shard, to_shard) moves
+        """
+        users = ShardUser.__table__
+        with db.engine.connect() as connection:
+            counts = dict.fromkeys(range(ShardService.get_shard_count()), 0)
+            counts.update(
+                connection.execute(
+                    select(users.c.shard, func.count()).group_by(users.c.shard)
+                ).all()
+            )
+            moves = []
+            while max_moves is None or len(moves) < max_moves:
+                fullest = max(counts, key=counts.get)
+                emptiest = min(counts, key=counts.get)
+                if counts[fullest] - counts[emptiest] <= 1:
+                    break
+                # Newest users first: they have the least data to move
+                user_id = connection.scalar(
+                    select(users.c.user_id)
+                    .where(
+                        users.c.shard == fullest,
+                        users.c.user_id.not_in([move[0] for move in moves] or [0]),
+                    )
+                    .order_by(users.c.user_id.desc())
+                    .limit(1)
+                )
+                moves.append((user_id, fullest, emptiest))
+                counts[fullest] -= 1
+                counts[emptiest] += 1
+        return moves
+
+    @staticmethod
+    def rebuild_directory():
+        """
+        Record every user and account of every shard in the directory, e.g.
+        after importing data into the shards, and move the user ID sequence
+        past the highest user ID.
+
+        :return: Dict with the number of users and accounts recorded
+        """
+        users = ShardUser.__table__
+        accounts = ShardAccount.__table__
+        totals = {"users": 0, "accounts": 0}
+        highest_user_id = 0
+        with db.engine.begin() as directory:
+            known_users = set(directory.scalars(select(users.c.user_id)))
+            known_accounts = set(directory.scalars(select(accounts.c.account_number)))
+            for shard in range(ShardService.get_shard_count()):
+                with ShardService.get_engine(shard).connect() as connection:
+                    new_users = [
+                        {"user_id": user_id, "username": username, "shard": shard}
+                        for user_id, username in connection.execute(
+                            select(User.user_id, User.username)
+                        )
+                        if user_id not in known_users
+                    ]
+                    new_accounts = [
+                        {"account_number": account_number, "user_id": user_id}
+                        for account_number, user_id in connection.execute(
+                            select(Account.account_number, Account.user_id)
+                        )
+                        if account_number not in known_accounts
+                    ]
+                    highest_user_id = max(
+                        highest_user_id,
+                        connection.scalar(select(func.max(User.user_id))) or 0,
+                    )
+                if new_users:
+                    directory.execute(insert(users), new_users)
+                if new_accounts:
+                    directory.execute(insert(accounts), new_accounts)
+                totals["users"] += len(new_users)
+                totals["accounts"] += len(new_accounts)
+
+        next_user_id = AccountNumberService._reserve_block(1, USER_ID_SEQUENCE) + 1
+        if next_user_id <= highest_user_id:
+            AccountNumberService._reserve_block(
+                highest_user_id - next_user_id + 1, USER_ID_SEQUENCE
+            )
+        with ShardService._lock:
+            ShardService._users.clear()
+            ShardService._accounts.clear()
+        return totals
+
+    @staticmethod
+    def _register_collector():
+        if not ShardService._collector_registered:
+            ShardService._collector_registered = True
+            register_collector("shards", ShardService.stats)
+
+    @staticmethod
+    def stats():
+        """Return directory cache sizes and move counters."""
+        with ShardService._lock:
+            return {
+                **ShardService._stats,
+                "cached_users": len(ShardService._users),
+                "cached_accounts": len(ShardService._accounts),
+            }
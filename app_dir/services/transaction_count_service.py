@@ -0,0 +1,230 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, time
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import aliased
+
+from app_dir.extensions import db
+from app_dir.models.account_model import Account
+from app_dir.models.transaction_archive_model import TransactionArchive
+from app_dir.models.transaction_count_model import AccountTransactionCount
+from app_dir.models.transaction_model import Transaction
+from app_dir.services.archive_service import TransactionArchiveService
+from app_dir.utils.transaction_archive import read_archive
+from app_dir.utils.upsert import increment_counters
+
+logger = logging.getLogger("core")
+
+COUNT_KEY = ("account_number", "transaction_type", "bucket")
+
+
+class TransactionCountService:
+    """
+    Per-account transaction counts, kept in step with the transaction table
+    so list endpoints can return totals without counting rows.
+
+    A transaction is counted once for each distinct account it involves.
+    Transfers between two accounts of the same owner are also recorded as
+    ``shared_count`` on the source account, so the owner's total is the sum
+    of the counts minus the shared ones.
+    """
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def record_transactions(transactions, owners=None, bucket=0, account_numbers=None):
+        """
+        Count newly inserted transactions.
+
+        Must be called before the commit that stores the transactions, so
+        the counts are updated in the same DB transaction.
+
+        :param transactions: Transaction details as dicts (see
+            ``Transaction.get_transaction_details``)
+        :param owners: Dict mapping account numbers to their user_id, if
+            already known; the owners of the other accounts of transfers
+            are read with one query
+        :param bucket: Counter bucket to add to (see BalanceBucketService)
+        :param account_numbers: Only count for these accounts, e.g. the local
+            side of a cross-shard transfer (None for all)
+        """
+        owners = dict(owners or {})
+        missing = {
+            account_number
+            for transaction in transactions
+            if transaction["account_from"] != transaction["account_to"]
+            for account_number in (
+                transaction["account_from"],
+                transaction["account_to"],
+            )
+            if account_number not in owners
+        }
+        if missing:
+            owners.update(
+                db.session.execute(
+                    select(Account.account_number, Account.user_id).filter(
+                        Account.account_number.in_(missing)
+                    )
+                ).all()
+            )
+
+        counts = defaultdict(lambda: [0, 0])
+        for transaction in transactions:
+            account_from = transaction["account_from"]
+            account_to = transaction["account_to"]
+            transaction_type = transaction["transaction_type"]
+            counts[(account_from, transaction_type, bucket)][0] += 1
+            if account_to != account_from:
+                counts[(account_to, transaction_type, bucket)][0] += 1
+                if owners.get(account_from) == owners.get(account_to):
+                    counts[(account_from, transaction_type, bucket)][1] += 1
+        if account_numbers is not None:
+            counts = {
+                key: value for key, value in counts.items() if key[0] in account_numbers
+            }
+
+        increment_counters(
+            db.session,
+            AccountTransactionCount,
+            [
+                {
+                    **dict(zip(COUNT_KEY, key)),
+                    "transaction_count": count,
+                    "shared_count": shared,
+                }
+                for key, (count, shared) in counts.items()
+            ],
+            COUNT_KEY,
+            ("transaction_count", "shared_count"),
+        )
+
+    @staticmethod
+    def get_counts_by_type(account_number):
+        """
+        Number of transactions of each type listed for one account, e.g.
+        ``{"DEPOSIT": 3, "TRANSFER": 1}``. Types without transactions are
+        left out.
+        """
+        counts = AccountTransactionCount
+        rows = db.session.execute(
+            select(counts.transaction_type, func.sum(counts.transaction_count))
+            .filter(counts.account_number == account_number)
+            .group_by(counts.transaction_type)
+        ).all()
+        return {
+            transaction_type: int(count) for transaction_type, count in rows if count
+        }
+
+    @staticmethod
+    def get_total(account_numbers, transaction_type=None, all_owner_accounts=True):
+        """
+        Number of transactions listed for ``account_numbers``.
+
+        :param all_owner_accounts: Whether ``account_numbers`` are all the
+            accounts of one owner, whose shared transfers are listed once
+        """
+        if not account_numbers:
+            return 0
+        total = func.sum(AccountTransactionCount.transaction_count)
+        if all_owner_accounts:
+            total = total - func.sum(AccountTransactionCount.shared_count)
+        query = select(func.coalesce(total, 0)).filter(
+            AccountTransactionCount.account_number.in_(account_numbers)
+        )
+        if transaction_type is not None:
+            query = query.filter(
+                AccountTransactionCount.transaction_type == transaction_type
+            )
+        return db.session.scalar(query)
+
+    @staticmethod
+    def rebuild():
+        """
+        Recount every account's transactions from the transaction table and
+        the archive files, e.g. after a bulk import.
+
+        :return: Number of counter rows written
+        """
+        archived_until = TransactionArchiveService.get_archived_until()
+        live = []
+        if archived_until is not None:
+            # Rows of a month being archived may still be in the table
+            live.append(
+                Transaction.timestamp >= datetime.combine(archived_until, time.min)
+            )
+        counts = defaultdict(lambda: [0, 0])
+        owners = dict(
+            db.session.execute(select(Account.account_number, Account.user_id)).all()
+        )
+        from_owner = aliased(Account)
+        to_owner = aliased(Account)
+
+        # Each transaction once for its source account...
+        for account_number, transaction_type, count in db.session.execute(
+            select(
+                Transaction.account_from,
+                Transaction.transaction_type,
+                func.count(),
+            )
+            .filter(*live)
+            .group_by(Transaction.account_from, Transaction.transaction_type)
+        ):
+            counts[(account_number, transaction_type)][0] += count
+        # ...and once for a different destination account
+        for account_number, transaction_type, count in db.session.execute(
+            select(Transaction.account_to, Transaction.transaction_type, func.count())
+            .filter(Transaction.account_to != Transaction.account_from, *live)
+            .group_by(Transaction.account_to, Transaction.transaction_type)
+        ):
+            counts[(account_number, transaction_type)][0] += count
+        for account_number, transaction_type, count in db.session.execute(
+            select(Transaction.account_from, Transaction.transaction_type, func.count())
+            .join(from_owner, from_owner.account_number == Transaction.account_from)
+            .join(to_owner, to_owner.account_number == Transaction.account_to)
+            .filter(
+                Transaction.account_to != Transaction.account_from,
+                from_owner.user_id == to_owner.user_id,
+                *live,
+            )
+            .group_by(Transaction.account_from, Transaction.transaction_type)
+        ):
+            counts[(account_number, transaction_type)][1] += count
+
+        for archive in TransactionArchive.query.order_by(TransactionArchive.month):
+            for transaction in read_archive(
+                archive.path, archive.archive_format, set(owners)
+            ):
+                account_from = transaction["account_from"]
+                account_to = transaction["account_to"]
+                transaction_type = transaction["transaction_type"]
+                counts[(account_from, transaction_type)][0] += 1
+                if account_to != account_from:
+                    counts[(account_to, transaction_type)][0] += 1
+                    if owners.get(account_from) == owners.get(account_to):
+                        counts[(account_from, transaction_type)][1] += 1
+
+        try:
+            db.session.execute(delete(AccountTransactionCount))
+            rows = [
+                {
+                    "account_number": account_number,
+                    "transaction_type": transaction_type,
+                    "bucket": 0,
+                    "transaction_count": count,
+                    "shared_count": shared,
+                }
+                for (account_number, transaction_type), (
+                    count,
+                    shared,
+                ) in counts.items()
+            ]
+            if rows:
+                db.session.execute(insert(AccountTransactionCount), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        logger.info("Rebuilt %d transaction count rows", len(rows))
+        return len(rows)
@@ -0,0 +1,160 @@
+import re
+
+from sqlalchemy import Float, Integer, text
+
+from app_dir.extensions import db
+
+SEARCH_TERM = re.compile(r"\w+")
+# Longer queries are cut to their first terms
+MAX_TERMS = 8
+# Owners with more accounts are filtered by the join instead of the index
+MAX_ACCOUNT_TERMS = 200
+
+
+class TransactionSearchService:
+    """
+    Full-text search over transaction descriptions.
+
+    The index is the ``transaction_search`` table, maintained by triggers on
+    the transaction table: an FTS5 table on SQLite (see transaction_model)
+    and a table with a FULLTEXT index on MySQL (see database.sql), as
+    partitioned InnoDB tables cannot have FULLTEXT indexes themselves. All
+    terms must match as whole words: prefix matching would expand common
+    prefixes into huge posting lists.
+
+    Each entry also holds its transaction's account numbers as tokens, so
+    the index itself intersects the terms with the owner's accounts:
+    otherwise a common word such as "payment" would match a large part of
+    the table before the owner filter is applied.
+    """
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def parse_terms(query):
+        """
+        Split a search query into lower-case terms.
+
+        :raises ValueError: If the query contains no words
+        """
+        terms = SEARCH_TERM.findall(query.lower())[:MAX_TERMS]
+        if not terms:
+            raise ValueError("Search query must contain at least one word")
+        return terms
+
+    @staticmethod
+    def match_subquery(terms, account_numbers):
+        """
+        Select the IDs of the transactions of ``account_numbers`` matching
+        all ``terms``, with their relevance ``score`` (higher is better).
+        """
+        dialect = db.session.get_bind().dialect.name
+        account_tokens = None
+        if len(account_numbers) <= MAX_ACCOUNT_TERMS:
+            account_tokens = [f"a{int(number)}" for number in account_numbers]
+        if dialect == "sqlite":
+            query = (
+                "description : (" + " AND ".join(f'"{term}"' for term in terms) + ")"
+            )
+            if account_tokens:
+                query += " AND accounts : (" + " OR ".join(account_tokens) + ")"
+            # bm25() is lower for better matches; the accounts are not weighed
+            statement = text(
+                "SELECT rowid AS transaction_id, "
+                "-bm25(transaction_search, 1.0, 0.0) AS score "
+                "FROM transaction_search WHERE transaction_search MATCH :query"
+            ).bindparams(query=query)
+        elif dialect == "mysql":
+            # Terms shorter than innodb_ft_min_token_size never match
+            query = " ".join(f"+{term}" for term in terms)
+            if account_tokens:
+                query += " +(" + " ".join(account_tokens) + ")"
+            statement = text(
+                "SELECT transaction_id, "
+                "MATCH (description, accounts) AGAINST (:query IN BOOLEAN MODE) "
+                "AS score FROM transaction_search "
+                "WHERE MATCH (description, accounts) AGAINST (:query IN BOOLEAN MODE)"
+            ).bindparams(query=query)
+        else:
+            raise ValueError(f"Transaction search is not supported on {dialect}")
+        return statement.columns(transaction_id=Integer, score=Float).subquery("search")
+
+    @staticmethod
+    def matches(description, terms):
+        """Check a description against ``terms`` in Python (archived rows)."""
+        words = set(SEARCH_TERM.findall((description or "").lower()))
+        return all(term in words for term in terms)
+
+    @staticmethod
+    def rebuild(chunk_size=100000):
+        """Rebuild the index from the transaction table, e.g. after a restore."""
+        dialect = db.session.get_bind().dialect.name
+        try:
+            if dialect == "sqlite":
+                db.session.execute(
+                    text(
+                        "INSERT INTO transaction_search (transaction_search) "
+                        "VALUES ('delete-all')"
+                    )
+                )
+                db.session.execute(
+                    text(
+                        "INSERT INTO transaction_search "
+                        "(rowid, description, accounts) "
+                        "SELECT transaction_id, description, "
+                        "'a' || account_from || ' a' || account_to "
+                        'FROM "transaction"'
+                    )
+                )
+            elif dialect == "mysql":
+                db.session.execute(text("DELETE FROM transaction_search"))
+                last_id = 0
+                while True:
+                    next_id = db.session.scalar(
+                        text(
+                            "SELECT MAX(transaction_id) FROM (SELECT transaction_id "
+                            "FROM `transaction` WHERE transaction_id > :last_id "
+                            "ORDER BY transaction_id LIMIT :chunk_size) AS chunk"
+                        ),
+                        {"last_id": last_id, "chunk_size": chunk_size},
+                    )
+                    if next_id is None:
+                        break
+                    db.session.execute(
+                        text(
+                            "INSERT INTO transaction_search "
+                            "(transaction_id, timestamp, description, accounts) "
+                            "SELECT transaction_id, timestamp, description, "
+                            "CONCAT('a', account_from, ' a', account_to) "
+                            "FROM `transaction` WHERE transaction_id > :last_id "
+                            "AND transaction_id <= :next_id"
+                        ),
+                        {"last_id": last_id, "next_id": next_id},
+                    )
+                    db.session.commit()
+                    last_id = next_id
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def purge_before(end, chunk_size=10000):
+        """
+        Remove the entries of transactions before ``end`` from the MySQL
+        index, after their partitions were dropped (which fires no triggers).
+        """
+        if db.session.get_bind().dialect.name != "mysql":
+            return
+        while True:
+            result = db.session.execute(
+                text(
+                    "DELETE FROM transaction_search WHERE timestamp < :end "
+                    "LIMIT :chunk_size"
+                ),
+                {"end": end, "chunk_size": chunk_size},
+            )
+            db.session.commit()
+            if result.rowcount < chunk_size:
+                return
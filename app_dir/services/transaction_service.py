@@ -1,8 +1,16 @@
-from sqlalchemy import desc
+from datetime import datetime, time
 
+from sqlalchemy import desc, func, select
+from sqlalchemy.orm import aliased
+
+from app_dir.extensions import db
 from app_dir.models.account_model import Account
 from app_dir.models.transaction_model import Transaction
 from app_dir.models.user_model import User
+from app_dir.services.archive_service import TransactionArchiveService
+from app_dir.services.recent_transaction_service import RecentTransactionService
+from app_dir.services.transaction_count_service import TransactionCountService
+from app_dir.services.transaction_search_service import TransactionSearchService
 
 
 class TransactionService:
@@ -11,8 +19,35 @@ class TransactionService:
 
     @staticmethod
     def get_transactions(
-        user: User, account_number=None, transaction_type=None, limit=30, offset=0
+        user: User,
+        account_number=None,
+        transaction_type=None,
+        limit=30,
+        offset=0,
+        fields=None,
+        q=None,
+        counts=None,
     ):
+        """
+        Get a page of the user's transactions, newest first.
+
+        With a search query ``q`` only the transactions whose description
+        contains all of its words are returned, best matches
+        first (see TransactionSearchService).
+
+        When ``fields`` is given only those columns are selected from the
+        database and each transaction is returned as a dict of just those
+        fields, instead of loading full ``Transaction`` objects.
+
+        Pages that reach past the oldest transaction still in the table
+        continue into the archived months (see TransactionArchiveService).
+
+        First pages of a single account are served from memory when its
+        latest transactions are cached (see RecentTransactionService) and
+        the cache saw the account's current transaction counts. Pass the
+        counts as ``counts`` when already read (see ``get_account_counts``)
+        to spare reading them again.
+        """
         # Default values for limit and offset if not provided or invalid
         try:
             limit = int(limit) if limit is not None else 30
@@ -23,18 +58,98 @@ class TransactionService:
             limit = 30
             offset = 0
 
+        if account_number is not None and not offset and not q:
+            transactions = TransactionService._get_recent_transactions(
+                user, int(account_number), transaction_type, limit, fields, counts
+            )
+            if transactions is not None:
+                return transactions
+
+        return TransactionService._query_transactions(
+            user, account_number, transaction_type, limit, offset, fields, q
+        )
+
+    @staticmethod
+    def _get_recent_transactions(
+        user: User, account_number, transaction_type, limit, fields, counts
+    ):
+        """
+        Serve a first page of one of the user's accounts from the recent
+        transactions cache, loading the account's ring on a miss.
+
+        :return: The page, or None if it has to be queried
+        """
+        cache = RecentTransactionService.get_cache()
+        if cache is None or limit > cache.per_account:
+            return None
+        if transaction_type is not None:
+            transaction_type = transaction_type.upper()
+            if transaction_type not in ("DEPOSIT", "WITHDRAWAL", "TRANSFER"):
+                transaction_type = None
+
+        # The maintained counts are updated by every process, so a ring that
+        # missed another process's writes disagrees with them and is
+        # reloaded. They are read like the page would be, from a replica
+        # if the request reads from one, so a ring is never older than the
+        # database the page would otherwise be queried from.
+        if counts is None:
+            counts = TransactionService.get_account_counts(account_number)
+        # Rings are only loaded for, and only served to, the account's owner
+        transactions = cache.get(
+            account_number, user.user_id, limit, transaction_type, counts=counts
+        )
+        if transactions is None:
+            if transaction_type is not None:
+                # Only whole rings are loaded; a ring may still answer typed
+                # pages once an untyped request has loaded it
+                return None
+            account = db.session.get(Account, account_number)
+            if account is None or account.user_id != user.user_id:
+                return None
+            token = cache.begin_load(account_number)
+            loaded = None
+            try:
+                loaded = TransactionService._query_transactions(
+                    user, account_number, None, cache.per_account, 0, None, None
+                )
+            finally:
+                cache.end_load(
+                    account_number, token, user.user_id, loaded, counts=counts
+                )
+            transactions = loaded[:limit]
+
+        if fields:
+            return [{field: row[field] for field in fields} for row in transactions]
+        return transactions
+
+    @staticmethod
+    def _query_transactions(
+        user: User, account_number, transaction_type, limit, offset, fields, q
+    ):
+        """Query a page of transactions for ``get_transactions``."""
         try:
-            base_query = (
-                Transaction.query.join(
-                    Account,
-                    (
-                        (Transaction.account_from == Account.account_number)
-                        | (Transaction.account_to == Account.account_number)
-                    ),
+            # Transactions are matched against a subquery of the user's
+            # accounts rather than a join, so no DISTINCT is needed and any
+            # subset of columns can be selected safely.
+            user_accounts = select(Account.account_number).filter(
+                Account.user_id == user.user_id
+            )
+            if fields:
+                base_query = db.session.query(
+                    *(getattr(Transaction, field) for field in fields)
                 )
-                .filter(Account.user_id == user.user_id)
-                .distinct()
+            else:
+                base_query = Transaction.query
+            base_query = base_query.filter(
+                Transaction.account_from.in_(user_accounts)
+                | Transaction.account_to.in_(user_accounts)
             )
+            # Rows of a month being archived may still be in the table
+            archived_until = TransactionArchiveService.get_archived_until()
+            if archived_until is not None:
+                base_query = base_query.filter(
+                    Transaction.timestamp >= datetime.combine(archived_until, time.min)
+                )
 
             # Apply optional filters
             if account_number is not None:
@@ -51,20 +166,145 @@ class TransactionService:
                 "WITHDRAWAL",
                 "TRANSFER",
             ]:
+                transaction_type = transaction_type.upper()
                 base_query = base_query.filter(
-                    Transaction.transaction_type == transaction_type.upper()
+                    Transaction.transaction_type == transaction_type
                 )
+            else:
+                transaction_type = None
+
+            terms = None
+            order_by = [desc(Transaction.timestamp)]
+            if q:
+                terms = TransactionSearchService.parse_terms(q)
+                if account_number is not None:
+                    search_accounts = [account_number]
+                else:
+                    search_accounts = db.session.scalars(user_accounts).all()
+                if not search_accounts:
+                    return []
+                search = TransactionSearchService.match_subquery(terms, search_accounts)
+                base_query = base_query.join(
+                    search, search.c.transaction_id == Transaction.transaction_id
+                )
+                order_by.insert(0, desc(search.c.score))
 
             transactions = (
-                base_query.order_by(desc(Transaction.timestamp))
-                .offset(offset)
-                .limit(limit)
-                .all()
+                base_query.order_by(*order_by).offset(offset).limit(limit).all()
             )
 
-            result = [t.get_transaction_details() for t in transactions]
+            if fields:
+                result = [dict(row._mapping) for row in transactions]
+            else:
+                result = [t.get_transaction_details() for t in transactions]
+
+            if archived_until is not None and len(result) < limit:
+                # The table is exhausted: continue the page in the archive
+                if result or not offset:
+                    table_count = offset + len(result)
+                else:
+                    table_count = base_query.order_by(None).count()
+                if account_number is not None:
+                    account_numbers = [account_number]
+                else:
+                    account_numbers = db.session.scalars(user_accounts).all()
+                result.extend(
+                    TransactionArchiveService.get_archived_transactions(
+                        account_numbers,
+                        transaction_type,
+                        offset=max(0, offset - table_count),
+                        limit=limit - len(result),
+                        fields=fields,
+                        terms=terms,
+                    )
+                )
 
             return result
 
         except Exception as e:
             raise e
+
+    @staticmethod
+    def get_account_counts(account_number):
+        """Number of transactions of each type listed for one account."""
+        return TransactionCountService.get_counts_by_type(int(account_number))
+
+    @staticmethod
+    def count_transactions(
+        user: User, account_number=None, transaction_type=None, counts=None
+    ):
+        """
+        Total number of transactions ``get_transactions`` can page through
+        with the same filters, read from the maintained per-account counts
+        (see TransactionCountService) without touching the transaction table.
+
+        :param counts: The counts of ``account_number`` if already read
+            with ``get_account_counts``
+        """
+        if transaction_type is not None:
+            transaction_type = transaction_type.upper()
+            if transaction_type not in ("DEPOSIT", "WITHDRAWAL", "TRANSFER"):
+                transaction_type = None
+        if account_number is not None:
+            if counts is None:
+                counts = TransactionService.get_account_counts(account_number)
+            if transaction_type is not None:
+                return counts.get(transaction_type, 0)
+            return sum(counts.values())
+        account_numbers = db.session.scalars(
+            select(Account.account_number).filter(Account.user_id == user.user_id)
+        ).all()
+        return TransactionCountService.get_total(account_numbers, transaction_type)
+
+    @staticmethod
+    def get_latest_transactions_per_account(account_numbers, per_account=5):
+        """
+        Get the latest transactions for each of the given accounts.
+
+        Everything is fetched with a single windowed query, so the number of
+        statements does not grow with the number of accounts.
+
+        :param account_numbers: Account numbers to fetch transactions for
+        :param per_account: Maximum number of transactions per account
+        :return: Dict mapping each account number to its transaction details
+        """
+        result = {account_number: [] for account_number in account_numbers}
+        if not account_numbers or per_account <= 0:
+            return result
+
+        ranked = (
+            select(
+                Transaction,
+                Account.account_number.label("owner_account"),
+                func.row_number()
+                .over(
+                    partition_by=Account.account_number,
+                    order_by=(
+                        desc(Transaction.timestamp),
+                        desc(Transaction.transaction_id),
+                    ),
+                )
+                .label("position"),
+            )
+            .join(
+                Account,
+                (
+                    (Transaction.account_from == Account.account_number)
+                    | (Transaction.account_to == Account.account_number)
+                ),
+            )
+            .filter(Account.account_number.in_(account_numbers))
+            .subquery()
+        )
+        ranked_transaction = aliased(Transaction, ranked)
+
+        rows = db.session.execute(
+            select(ranked_transaction, ranked.c.owner_account)
+            .filter(ranked.c.position <= per_account)
+            .order_by(ranked.c.owner_account, ranked.c.position)
+        ).all()
+
+        for transaction, owner_account in rows:
+            result[owner_account].append(transaction.get_transaction_details())
+
+        return result
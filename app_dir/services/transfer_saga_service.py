@@ -0,0 +1,334 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, select, update
+
+from app_dir.extensions import db
+from app_dir.models.account_model import Account
+from app_dir.models.transaction_model import Transaction
+from app_dir.models.transfer_saga_model import TransferSaga
+from app_dir.services.auth_service import AuthService
+from app_dir.services.balance_bucket_service import BalanceBucketService
+from app_dir.services.limit_service import LimitService
+from app_dir.services.outbox_service import OutboxService
+from app_dir.services.recent_transaction_service import RecentTransactionService
+from app_dir.services.rollup_service import RollupService
+from app_dir.services.screening_service import ScreeningService
+from app_dir.services.transaction_count_service import TransactionCountService
+from app_dir.utils.shard_routing import selected_shard, use_shard
+
+logger = logging.getLogger("core")
+
+
+class TransferSagaService:
+    """
+    Transfers between accounts on different shards, as a saga.
+
+    The sender's shard records the debit leg and the receiver's shard the
+    credit leg, each in a local DB transaction; both legs carry the same
+    reference code. The saga's progress is kept in the directory database:
+
+    * STARTED: the checks passed and the debit is being committed
+    * DEBITED: the debit leg is committed, the credit is pending
+    * COMPLETED: both legs are committed
+    * COMPENSATED: the credit was refused (e.g. the receiving account is
+      locked), so the debit leg was REVERSED, the sender refunded and the
+      daily limit it used given back
+    * FAILED: the debit was never committed
+
+    A transfer interrupted after the debit, e.g. because the receiving
+    shard was unavailable, stays DEBITED until ``resume`` completes it.
+    Credits are idempotent: a shard never holds two legs with the same
+    reference code.
+    """
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def transfer(from_account, to_account_number, to_shard, amount, description, user):
+        """
+        Transfer from an account of the selected shard to an account of
+        ``to_shard``.
+
+        :return: The debit leg, REVERSED if the credit was refused
+        """
+        transaction = Transaction(
+            account_from=from_account.account_number,
+            account_to=to_account_number,
+            amount=amount,
+            timestamp=datetime.now(timezone.utc),
+            transaction_type="TRANSFER",
+            description=description or f"Transfer of ${amount:.2f}",
+            reference_code=Transaction.generate_reference_code(),
+        )
+        screened = None
+
+        try:
+            if not AuthService.verify_account_ownership(
+                user, from_account.account_number
+            ):
+                raise ValueError("sender account does not belong to the user")
+            if from_account.is_locked:
+                raise ValueError("One or both accounts are locked")
+            if amount < 0:
+                raise ValueError("Transfer amount cannot be negative")
+            # Debits must see the full balance of bucketed accounts
+            BalanceBucketService.fold(from_account)
+            if amount > from_account.balance:
+                raise ValueError("Not enough funds in account")
+            screened = ScreeningService.screen(
+                from_account.account_number, "TRANSFER", amount
+            )
+            # Checked last: it records the debit in today's usage
+            LimitService.consume_daily_limit(
+                from_account, "TRANSFER", amount, transaction.timestamp.date()
+            )
+
+            saga_id = TransferSagaService._start(
+                transaction, selected_shard(), to_shard
+            )
+            from_account.latest_balance_change = -amount
+            from_account.balance -= amount
+            transaction.balance_after = from_account.balance
+            transaction.status = "COMPLETED"
+
+            db.session.add(transaction)
+            db.session.flush()
+            details = transaction.get_transaction_details()
+            local = {from_account.account_number}
+            RollupService.record_transactions([details], account_numbers=local)
+            TransactionCountService.record_transactions(
+                [details],
+                owners={from_account.account_number: from_account.user_id},
+                account_numbers=local,
+            )
+            db.session.commit()
+        except Exception as e:
+            # Failed debits do not count towards the velocity limits
+            ScreeningService.release(screened)
+            transaction.status = "FAILED"
+            transaction.balance_after = from_account.balance
+            transaction.reason = str(e)
+            db.session.rollback()
+            return transaction
+
+        RecentTransactionService.record(transaction)
+        details = transaction.get_transaction_details()
+        # The credit leg may get the same transaction ID on its shard
+        db.session.expunge(transaction)
+        TransferSagaService._set_state(saga_id, "DEBITED")
+        try:
+            state = TransferSagaService._complete(saga_id, details, to_shard)
+        except Exception:
+            logger.warning(
+                "Transfer %s is debited, its credit will be retried",
+                details["reference_code"],
+                exc_info=True,
+            )
+            return transaction
+        if state == "COMPENSATED":
+            transaction.status = "REVERSED"
+        return transaction
+
+    @staticmethod
+    def resume(min_age_seconds=60):
+        """
+        Finish the sagas left STARTED or DEBITED for at least
+        ``min_age_seconds``, e.g. by a crash or an unavailable shard.
+
+        :return: Dict with the number of sagas per resulting state
+        """
+        sagas = TransferSaga.__table__
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=min_age_seconds)
+        with db.engine.connect() as connection:
+            rows = connection.execute(
+                select(sagas)
+                .where(
+                    sagas.c.state.in_(("STARTED", "DEBITED")),
+                    sagas.c.updated_at <= cutoff,
+                )
+                .order_by(sagas.c.saga_id)
+            ).all()
+
+        results = {}
+        for saga in rows:
+            try:
+                with use_shard(saga.from_shard):
+                    # Read as plain rows, kept out of the identity map
+                    details = (
+                        db.session.execute(
+                            select(
+                                *(
+                                    getattr(Transaction, field)
+                                    for field in Transaction.detail_fields
+                                )
+                            ).filter(Transaction.reference_code == saga.reference_code)
+                        )
+                        .mappings()
+                        .first()
+                    )
+                    db.session.rollback()
+                if details is not None:
+                    details = dict(details)
+                if details is None:
+                    state = "FAILED"
+                    TransferSagaService._set_state(
+                        saga.saga_id, state, "The debit was not recorded"
+                    )
+                elif details["status"] == "REVERSED":
+                    # Compensated before the saga's state was saved
+                    state = "COMPENSATED"
+                    TransferSagaService._set_state(saga.saga_id, state)
+                else:
+                    if saga.state == "STARTED":
+                        TransferSagaService._set_state(saga.saga_id, "DEBITED")
+                    state = TransferSagaService._complete(
+                        saga.saga_id, details, saga.to_shard, saga.from_shard
+                    )
+            except Exception:
+                logger.warning(
+                    "Could not resume transfer %s", saga.reference_code, exc_info=True
+                )
+                state = saga.state
+            results[state] = results.get(state, 0) + 1
+        return results
+
+    @staticmethod
+    def _start(transaction, from_shard, to_shard):
+        """Record a new saga in the directory. Returns its ID."""
+        now = datetime.now(timezone.utc)
+        with db.engine.begin() as connection:
+            result = connection.execute(
+                insert(TransferSaga.__table__).values(
+                    reference_code=transaction.reference_code,
+                    account_from=transaction.account_from,
+                    account_to=transaction.account_to,
+                    from_shard=from_shard,
+                    to_shard=to_shard,
+                    amount=transaction.amount,
+                    description=transaction.description,
+                    state="STARTED",
+                    created_at=now,
+                    updated_at=now,
+                )
+            )
+        return result.inserted_primary_key[0]
+
+    @staticmethod
+    def _set_state(saga_id, state, error=None):
+        sagas = TransferSaga.__table__
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(sagas)
+                .where(sagas.c.saga_id == saga_id)
+                .values(
+                    state=state,
+                    error=error[:255] if error else None,
+                    updated_at=datetime.now(timezone.utc),
+                )
+            )
+
+    @staticmethod
+    def _complete(saga_id, details, to_shard, from_shard=None):
+        """
+        Credit a debited transfer, or compensate it if the credit is
+        refused.
+
+        :return: The saga's new state
+        """
+        try:
+            TransferSagaService._credit(details, to_shard)
+        except ValueError as e:
+            TransferSagaService._compensate(details, from_shard)
+            TransferSagaService._set_state(saga_id, "COMPENSATED", str(e))
+            return "COMPENSATED"
+        TransferSagaService._set_state(saga_id, "COMPLETED")
+        return "COMPLETED"
+
+    @staticmethod
+    def _credit(details, to_shard):
+        """Record the credit leg on ``to_shard``, unless it already is."""
+        with use_shard(to_shard):
+            try:
+                # Locked first, so concurrent retries of the same saga wait
+                to_account = db.session.get(
+                    Account, details["account_to"], with_for_update=True
+                )
+                if to_account is None:
+                    raise ValueError(f"Account {details['account_to']} not found")
+                credited = db.session.scalar(
+                    select(Transaction.transaction_id).filter(
+                        Transaction.reference_code == details["reference_code"]
+                    )
+                )
+                if credited is not None:
+                    db.session.rollback()
+                    return
+                if to_account.is_locked:
+                    raise ValueError("One or both accounts are locked")
+
+                bucket = BalanceBucketService.credit(to_account, details["amount"])
+                leg = Transaction(
+                    **{
+                        field: value
+                        for field, value in details.items()
+                        if field != "transaction_id"
+                    }
+                )
+                db.session.add(leg)
+                db.session.flush()
+                leg_details = leg.get_transaction_details()
+                local = {to_account.account_number}
+                RollupService.record_transactions(
+                    [leg_details], bucket=bucket, account_numbers=local
+                )
+                TransactionCountService.record_transactions(
+                    [leg_details],
+                    owners={to_account.account_number: to_account.user_id},
+                    bucket=bucket,
+                    account_numbers=local,
+                )
+                OutboxService.enqueue_transactions([leg_details])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            RecentTransactionService.record(leg)
+            db.session.expunge(leg)
+
+    @staticmethod
+    def _compensate(details, from_shard=None):
+        """
+        Reverse the debit leg, refund the sender and give back the daily
+        limit the debit used.
+        """
+        with use_shard(selected_shard() if from_shard is None else from_shard):
+            try:
+                from_account = db.session.get(
+                    Account, details["account_from"], with_for_update=True
+                )
+                debit = db.session.scalars(
+                    select(Transaction)
+                    .filter(Transaction.reference_code == details["reference_code"])
+                    .with_for_update()
+                ).first()
+                if debit is None or debit.status != "COMPLETED":
+                    db.session.rollback()
+                    return
+                BalanceBucketService.credit(from_account, details["amount"])
+                LimitService.release_daily_limit(
+                    from_account, "TRANSFER", debit.amount, debit.timestamp.date()
+                )
+                debit.status = "REVERSED"
+                RollupService.record_transactions(
+                    [details],
+                    account_numbers={from_account.account_number},
+                    reverse=True,
+                )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            db.session.expunge(debit)
+            RecentTransactionService.invalidate([details["account_from"]])
@@ -1,5 +1,9 @@
 from app_dir.extensions import db
+from app_dir.models.account_model import Account
 from app_dir.models.user_model import User
+from app_dir.services.balance_bucket_service import BalanceBucketService
+from app_dir.services.shard_service import ShardService
+from app_dir.services.transaction_service import TransactionService
 
 
 class UserService:
@@ -9,6 +13,8 @@ class UserService:
     @staticmethod
     def create_user(username, password, email):
         """Create a new user"""
+        if ShardService.is_enabled():
+            return UserService._create_sharded_user(username, password, email)
         try:
             if UserService.get_user_by_username(username):
                 raise SystemError("Username already exists")
@@ -26,6 +32,24 @@ class UserService:
 
         return user
 
+    @staticmethod
+    def _create_sharded_user(username, password, email):
+        """
+        Create a user on the shard the directory places them on. The
+        directory checks that the username is unique across shards.
+        """
+        user_id = ShardService.register_user(username)
+        user = User(user_id=user_id, username=username, email=email)
+        user.set_password(password)
+        try:
+            db.session.add(user)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            ShardService.unregister_user(user_id)
+            raise
+        return user
+
     @staticmethod
     def get_user_by_id(user_id):
         """Get user by ID"""
@@ -65,3 +89,27 @@ class UserService:
                 raise ValueError("Incorrect password.")
         user.set_password(new_password)
         db.session.commit()
+
+    @staticmethod
+    def get_dashboard(user, transactions_per_account=5):
+        """
+        Build the dashboard for a user: profile, accounts and the latest
+        transactions of every account.
+
+        Uses one query for the accounts, one for the bucket sums of
+        bucketed accounts and one for the transactions, regardless of how
+        many accounts the user has.
+        """
+        accounts = Account.query.filter_by(user_id=user.user_id).all()
+        BalanceBucketService.load_bucket_balances(accounts)
+        latest_transactions = TransactionService.get_latest_transactions_per_account(
+            [account.account_number for account in accounts], transactions_per_account
+        )
+
+        account_list = []
+        for account in accounts:
+            details = account.get_account_details()
+            details["transactions"] = latest_transactions[account.account_number]
+            account_list.append(details)
+
+        return {"user": user.get_user_profile(), "accounts": account_list}
@@ -0,0 +1,62 @@
+import hashlib
+import hmac
+import math
+
+# Account numbers are 9 digits: an 8-digit body followed by a Luhn check digit.
+# Consecutive sequence values are spread over the bodies by a permutation
+# keyed with ACCOUNT_NUMBER_KEY, so account numbers do not reveal how many
+# accounts exist. Changing the key or these constants after accounts were
+# allocated would produce duplicates.
+BODY_MIN = 10_000_000
+BODY_COUNT = 90_000_000
+PERMUTATION_ROUNDS = 8
+
+
+def luhn_check_digit(body: int) -> int:
+    """Compute the Luhn check digit to append to ``body``."""
+    total = 0
+    for position, digit in enumerate(reversed(str(body))):
+        digit = int(digit)
+        if position % 2 == 0:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return (10 - total % 10) % 10
+
+
+def is_valid_account_number(account_number: int) -> bool:
+    """Check the Luhn check digit of an account number."""
+    body, check_digit = divmod(account_number, 10)
+    return luhn_check_digit(body) == check_digit
+
+
+def keyed_permutation(value: int, key: bytes, domain: int) -> int:
+    """
+    Map ``value`` in [0, ``domain``) to another value of the same range.
+
+    A balanced Feistel network with HMAC-SHA256 round functions permutes
+    the smallest square range holding ``domain`` values; results outside
+    ``domain`` are encrypted again (cycle-walking) until they fall inside,
+    which keeps the mapping a bijection of [0, ``domain``). Without the
+    key, the position of a value cannot be recovered from its image.
+    """
+    half = math.isqrt(domain - 1) + 1
+    while True:
+        left, right = divmod(value, half)
+        for round_number in range(PERMUTATION_ROUNDS):
+            digest = hmac.digest(
+                key, f"{round_number}:{right}".encode(), hashlib.sha256
+            )
+            left, right = right, (left + int.from_bytes(digest[:8], "big")) % half
+        value = left * half + right
+        if value < domain:
+            return value
+
+
+def account_number_for(sequence_value: int, key: bytes) -> int:
+    """Map a sequence value in [0, BODY_COUNT) to its account number."""
+    if not 0 <= sequence_value < BODY_COUNT:
+        raise ValueError("Account number space exhausted")
+    body = BODY_MIN + keyed_permutation(sequence_value, key, BODY_COUNT)
+    return body * 10 + luhn_check_digit(body)
@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from app_dir.utils.metrics import register_collector
+
+# Name of the connect timeout argument of each DB driver, in seconds
+CONNECT_TIMEOUT_ARGUMENTS = {
+    "mysqlconnector": "connection_timeout",
+    "pymysql": "connect_timeout",
+    "mysqldb": "connect_timeout",
+    "psycopg2": "connect_timeout",
+    "psycopg": "connect_timeout",
+}
+# Checkout times kept to compute the percentiles
+CHECKOUT_SAMPLES = 1024
+
+
+def engine_options(config, uri):
+    """
+    Return the SQLAlchemy engine options for the database at ``uri``, from
+    the DB_POOL_* and DB_CONNECT_TIMEOUT settings.
+    """
+    url = make_url(uri)
+    options = {
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+    }
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # In-memory databases use a single static connection
+        return options
+
+    options.update(
+        poolclass=MeteredQueuePool,
+        pool_size=config["DB_POOL_SIZE"],
+        max_overflow=config["DB_MAX_OVERFLOW"],
+        pool_timeout=config["DB_POOL_TIMEOUT"],
+    )
+    timeout_argument = CONNECT_TIMEOUT_ARGUMENTS.get(url.get_driver_name())
+    if timeout_argument and config["DB_CONNECT_TIMEOUT"] is not None:
+        options["connect_args"] = {timeout_argument: config["DB_CONNECT_TIMEOUT"]}
+    return options
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that times how long each checkout takes (see PoolMetrics)."""
+
+    metrics = None
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.record_timeout()
+            raise
+        if self.metrics is not None:
+            self.metrics.record_checkout(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # Engines recreate their pool when disposed
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class PoolMetrics:
+    """
+    Connection pool metrics of one engine.
+
+    The checkout time covers waiting for a free connection, opening a new
+    one and the pre-ping. Overflow connections are those opened beyond
+    DB_POOL_SIZE; invalidations count the connections discarded after an
+    error, e.g. a stale connection failing its pre-ping.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._checkout_times = deque(maxlen=CHECKOUT_SAMPLES)
+        self._counters = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "connects": 0,
+            "overflow_connects": 0,
+            "invalidations": 0,
+            "soft_invalidations": 0,
+        }
+        self._checkout_seconds = 0.0
+        self._max_checkout_seconds = 0.0
+
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "invalidate", self._on_invalidate)
+        event.listen(engine, "soft_invalidate", self._on_soft_invalidate)
+        engine.pool.metrics = self
+
+    def record_checkout(self, seconds):
+        with self._lock:
+            self._counters["checkouts"] += 1
+            self._checkout_seconds += seconds
+            self._max_checkout_seconds = max(self._max_checkout_seconds, seconds)
+            self._checkout_times.append(seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self._counters["timeouts"] += 1
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        # The pool counts an overflow connection before opening it
+        overflow = self.engine.pool.overflow() > 0
+        with self._lock:
+            self._counters["connects"] += 1
+            if overflow:
+                self._counters["overflow_connects"] += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self._counters["invalidations"] += 1
+
+    def _on_soft_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self._counters["soft_invalidations"] += 1
+
+    def stats(self):
+        """Return the pool's occupancy, checkout times and event counters."""
+        pool = self.engine.pool
+        with self._lock:
+            stats = dict(self._counters)
+            times = sorted(self._checkout_times)
+            checkout_seconds = self._checkout_seconds
+            stats["checkout_ms_max"] = round(self._max_checkout_seconds * 1000, 3)
+        stats["checkout_ms_avg"] = round(
+            checkout_seconds * 1000 / stats["checkouts"] if stats["checkouts"] else 0.0,
+            3,
+        )
+        for percentile in (50, 99):
+            stats[f"checkout_ms_p{percentile}"] = (
+                round(times[(len(times) - 1) * percentile // 100] * 1000, 3)
+                if times
+                else 0.0
+            )
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                in_use=pool.checkedout(),
+                idle=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+            )
+        return stats
+
+
+_pools = {}
+
+
+def instrument_pools(engines):
+    """
+    Collect the pool metrics of ``engines`` (bind key to engine), exposed
+    as "db_pool" with one entry per bind ("default" for the default one).
+    """
+    for bind_key, engine in engines.items():
+        _pools[bind_key or "default"] = PoolMetrics(engine)
+    register_collector(
+        "db_pool", lambda: {name: pool.stats() for name, pool in _pools.items()}
+    )
@@ -0,0 +1,30 @@
+from decimal import Decimal
+
+# Money is stored as DECIMAL(13, 2), i.e. whole cents
+CENTS_PER_UNIT = 100
+# Interest rates are stored as DECIMAL(6, 3) percentages
+RATE_SCALE = 1000
+
+
+def to_cents(amount) -> int:
+    """Convert a monetary amount (Decimal, int or str) to integer cents."""
+    return int(Decimal(amount).scaleb(2).to_integral_exact())
+
+
+def from_cents(cents: int) -> Decimal:
+    """Convert integer cents back to a two-decimal Decimal amount."""
+    return Decimal(cents).scaleb(-2)
+
+
+def to_scaled_rate(rate) -> int:
+    """Convert a percentage rate such as Decimal("1.250") to thousandths."""
+    return int(Decimal(rate).scaleb(3).to_integral_exact())
+
+
+def divide_half_even(numerator: int, denominator: int) -> int:
+    """Integer division rounded half to even (banker's rounding)."""
+    quotient, remainder = divmod(numerator, denominator)
+    doubled = 2 * remainder
+    if doubled > denominator or (doubled == denominator and quotient % 2):
+        quotient += 1
+    return quotient
@@ -0,0 +1,22 @@
+import threading
+
+_collectors = {}
+_collectors_lock = threading.Lock()
+
+
+def register_collector(name, collector):
+    """
+    Register a callable that returns a dict of metrics under ``name``.
+
+    Collectors are called every time metrics are read, so they should be
+    cheap and must not touch the database.
+    """
+    with _collectors_lock:
+        _collectors[name] = collector
+
+
+def collect_metrics():
+    """Return the current values of all registered collectors."""
+    with _collectors_lock:
+        collectors = dict(_collectors)
+    return {name: collector() for name, collector in collectors.items()}
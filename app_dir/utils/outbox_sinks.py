@@ -0,0 +1,86 @@
+import json
+import os
+import socket
+from abc import ABC, abstractmethod
+from urllib.parse import urlparse
+
+
+class OutboxSink(ABC):
+    """
+    Destination of outbox events. ``send`` must raise if the batch was not
+    delivered; the events are then retried, so sinks must tolerate
+    receiving the same event more than once.
+    """
+
+    @abstractmethod
+    def send(self, events):
+        """Deliver a batch of events (see ``OutboxEvent.get_event_details``)."""
+
+    def close(self):
+        pass
+
+
+class FileSink(OutboxSink):
+    """Append events as NDJSON lines to a local file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, events):
+        with open(self.path, "a") as sink_file:
+            sink_file.writelines(json.dumps(event) + "\n" for event in events)
+            sink_file.flush()
+            os.fsync(sink_file.fileno())
+
+
+class SocketSink(OutboxSink):
+    """
+    Send events as NDJSON lines over TCP. Each batch is acknowledged by the
+    receiver with a single line, ``ok``.
+    """
+
+    def __init__(self, host, port, timeout=5.0):
+        self.address = (host, port)
+        self.timeout = timeout
+        self._connection = None
+
+    def send(self, events):
+        try:
+            if self._connection is None:
+                self._connection = socket.create_connection(
+                    self.address, timeout=self.timeout
+                )
+            self._connection.sendall(
+                "".join(json.dumps(event) + "\n" for event in events).encode("utf-8")
+            )
+            reply = self._connection.makefile("r").readline().strip()
+        except OSError:
+            self.close()
+            raise
+        if reply != "ok":
+            self.close()
+            raise ConnectionError(f"Outbox receiver replied {reply!r}")
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+SINK_TYPES = {
+    "file": lambda url: FileSink(url.netloc + url.path),
+    "tcp": lambda url: SocketSink(url.hostname, url.port),
+}
+
+
+def register_sink_type(scheme, factory):
+    """Make ``factory(parsed_url)`` build the sink for ``scheme://`` URLs."""
+    SINK_TYPES[scheme] = factory
+
+
+def create_sink(sink_url) -> OutboxSink:
+    """Create the sink configured by a URL such as ``file://events.ndjson``."""
+    url = urlparse(sink_url)
+    if url.scheme not in SINK_TYPES:
+        raise ValueError(f"Unknown outbox sink type: {url.scheme}")
+    return SINK_TYPES[url.scheme](url)
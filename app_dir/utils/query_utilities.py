@@ -0,0 +1,20 @@
+def parse_fields(fields, allowed_fields):
+    """
+    Parse a comma-separated ``fields`` query parameter.
+
+    :param fields: Raw value of the query parameter (e.g. "amount,status")
+    :param allowed_fields: Field names that may be requested
+    :return: Tuple of the requested field names, or None if none were given
+    :raises ValueError: If an unknown field is requested
+    """
+    if not fields:
+        return None
+
+    requested = tuple(
+        dict.fromkeys(field.strip() for field in fields.split(",") if field.strip())
+    )
+    unknown = [field for field in requested if field not in allowed_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    return requested or None
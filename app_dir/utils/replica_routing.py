@@ -0,0 +1,334 @@
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import Select, event, text
+
+from app_dir.utils.metrics import register_collector
+from app_dir.utils.shard_routing import selected_shard, shard_bind_key
+
+logger = logging.getLogger("core")
+
+# Cookie carrying a user's read-your-writes pin to every process
+PIN_COOKIE = "primary_until"
+
+
+def replica_bind_key(index):
+    """Bind key of the ``index``-th replica in SQLALCHEMY_BINDS."""
+    return f"replica_{index}"
+
+
+class _Replica:
+    """A replica engine and the result of its last lag check."""
+
+    def __init__(self, bind_key):
+        self.bind_key = bind_key
+        self.lag = None
+        self.checked_at = None
+        self.checking = False
+        self.reads = 0
+        self.failed_checks = 0
+
+
+class ReplicaRouter:
+    """
+    Chooses the database a statement of a read-only request goes to.
+
+    Replicas are used in turn, one per request: every read of a request
+    goes to the database chosen for its first read, so a response never
+    mixes data from replicas with different lag. Each replica's lag is
+    checked at most every REPLICA_LAG_CHECK_INTERVAL seconds, on a
+    background thread started by the request that finds the check due, so
+    no request waits for a slow replica; requests use the last result
+    meanwhile. Replicas lagging more than REPLICA_MAX_LAG_SECONDS, not
+    checked yet, or that could not be checked are skipped until the next
+    check. When no replica can be used the primary serves the request.
+
+    Users whose request committed a write are pinned to the primary for
+    REPLICA_READ_YOUR_WRITES_SECONDS, so they read their own writes. The
+    pin is kept by the process and sent to the client in a signed cookie
+    (see ``save_pin``), so the user's next requests are pinned whichever
+    process serves them.
+    """
+
+    _replicas = None
+    _next = 0
+    _pinned = OrderedDict()
+    _lock = threading.Lock()
+    _stats = {"primary_reads": 0, "pinned_requests": 0, "pins": 0}
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def get_replicas():
+        """Return the configured replicas, in the order of their bind keys."""
+        if ReplicaRouter._replicas is None:
+            with ReplicaRouter._lock:
+                if ReplicaRouter._replicas is None:
+                    ReplicaRouter._replicas = [
+                        _Replica(replica_bind_key(index))
+                        for index in range(
+                            len(current_app.config["DATABASE_REPLICA_URIS"])
+                        )
+                    ]
+                    register_collector("replicas", ReplicaRouter.stats)
+        return ReplicaRouter._replicas
+
+    @staticmethod
+    def choose_replica(engines):
+        """
+        Return the engine of the next usable replica, or None to read from
+        the primary.
+        """
+        replicas = ReplicaRouter.get_replicas()
+        config = current_app.config
+        now = time.monotonic()
+        with ReplicaRouter._lock:
+            start = ReplicaRouter._next
+            ReplicaRouter._next = (start + 1) % max(len(replicas), 1)
+
+        for offset in range(len(replicas)):
+            replica = replicas[(start + offset) % len(replicas)]
+            with ReplicaRouter._lock:
+                check = not replica.checking and (
+                    replica.checked_at is None
+                    or now - replica.checked_at >= config["REPLICA_LAG_CHECK_INTERVAL"]
+                )
+                if check:
+                    replica.checking = True
+            if check:
+                threading.Thread(
+                    target=ReplicaRouter._check_lag,
+                    args=(replica, engines[replica.bind_key]),
+                    name=f"lag-check-{replica.bind_key}",
+                    daemon=True,
+                ).start()
+            with ReplicaRouter._lock:
+                if (
+                    replica.lag is not None
+                    and replica.lag <= config["REPLICA_MAX_LAG_SECONDS"]
+                ):
+                    replica.reads += 1
+                    return engines[replica.bind_key]
+
+        with ReplicaRouter._lock:
+            ReplicaRouter._stats["primary_reads"] += 1
+        return None
+
+    @staticmethod
+    def _check_lag(replica, engine):
+        """
+        Measure how many seconds a replica is behind the primary. MySQL
+        replicas report it in SHOW REPLICA STATUS; other databases are
+        only checked to be reachable and count as up to date.
+        """
+        lag = None
+        try:
+            with engine.connect() as connection:
+                if engine.dialect.name == "mysql":
+                    status = (
+                        connection.execute(text("SHOW REPLICA STATUS"))
+                        .mappings()
+                        .first()
+                    )
+                    if status is None:
+                        # Not replicating, e.g. a stand-in for tests
+                        lag = 0
+                    else:
+                        # None when replication is stopped
+                        lag = status.get("Seconds_Behind_Source")
+                else:
+                    connection.execute(text("SELECT 1"))
+                    lag = 0
+        except Exception:
+            logger.warning("Lag check of %s failed", replica.bind_key, exc_info=True)
+        with ReplicaRouter._lock:
+            replica.lag = lag
+            replica.checked_at = time.monotonic()
+            replica.checking = False
+            if lag is None:
+                replica.failed_checks += 1
+
+    @staticmethod
+    def pin(identity):
+        """Pin a user to the primary for the read-your-writes window."""
+        window = current_app.config["REPLICA_READ_YOUR_WRITES_SECONDS"]
+        if has_request_context():
+            # Sent to the client by save_pin, for the other processes
+            g.replica_pin = (identity, time.time() + window)
+        now = time.monotonic()
+        pinned = ReplicaRouter._pinned
+        with ReplicaRouter._lock:
+            pinned.pop(identity, None)
+            pinned[identity] = now + window
+            ReplicaRouter._stats["pins"] += 1
+            # Pins are added in expiry order, the oldest first
+            while pinned:
+                oldest, until = next(iter(pinned.items()))
+                if until > now:
+                    break
+                del pinned[oldest]
+
+    @staticmethod
+    def is_pinned(identity):
+        """
+        Return True if the user wrote within the read-your-writes window,
+        through this process or, per the request's pin cookie, another one.
+        """
+        with ReplicaRouter._lock:
+            until = ReplicaRouter._pinned.get(identity)
+        if until is not None and until > time.monotonic():
+            return True
+        cookie = request.cookies.get(PIN_COOKIE) if has_request_context() else None
+        if not cookie:
+            return False
+        try:
+            pinned_identity, until = _pin_serializer().loads(cookie)
+        except (BadSignature, TypeError, ValueError):
+            return False
+        return pinned_identity == identity and until > time.time()
+
+    @staticmethod
+    def stats():
+        """Return each replica's lag and reads, and the primary fallbacks."""
+        with ReplicaRouter._lock:
+            return {
+                **ReplicaRouter._stats,
+                "pinned_users": len(ReplicaRouter._pinned),
+                "replicas": {
+                    replica.bind_key: {
+                        "lag_seconds": replica.lag,
+                        "usable": replica.lag is not None
+                        and replica.lag
+                        <= current_app.config["REPLICA_MAX_LAG_SECONDS"],
+                        "reads": replica.reads,
+                        "failed_checks": replica.failed_checks,
+                    }
+                    for replica in ReplicaRouter._replicas or ()
+                },
+            }
+
+
+def read_from_replica(fn):
+    """
+    Let the SELECTs of a read-only endpoint go to a replica, unless the
+    user is pinned to the primary. Apply below ``jwt_required`` so the
+    token checks still read from the primary.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        use_replica = bool(current_app.config["DATABASE_REPLICA_URIS"])
+        if use_replica and ReplicaRouter.is_pinned(get_jwt_identity()):
+            with ReplicaRouter._lock:
+                ReplicaRouter._stats["pinned_requests"] += 1
+            use_replica = False
+        g.read_from_replica = use_replica
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            g.read_from_replica = False
+            g.pop("replica_engine", None)
+
+    return wrapper
+
+
+def _pin_serializer():
+    return URLSafeSerializer(
+        current_app.config["JWT_SECRET_KEY"], salt="read-your-writes"
+    )
+
+
+def save_pin(response):
+    """
+    ``after_request`` hook sending the pin of a user who just wrote in a
+    signed cookie, so every process keeps them on the primary.
+    """
+    pin = g.get("replica_pin")
+    if pin is not None:
+        response.set_cookie(
+            PIN_COOKIE,
+            _pin_serializer().dumps(list(pin)),
+            max_age=current_app.config["REPLICA_READ_YOUR_WRITES_SECONDS"],
+            httponly=True,
+            secure=request.is_secure,
+            samesite="Lax",
+        )
+    return response
+
+
+@contextmanager
+def read_from_primary():
+    """Send the reads made inside the block to the primary."""
+    previous = g.get("read_from_replica", False)
+    g.read_from_replica = False
+    try:
+        yield
+    finally:
+        g.read_from_replica = previous
+
+
+class RoutingSession(Session):
+    """
+    Session that sends the SELECTs of read-only requests to a replica (see
+    ReplicaRouter) and everything else to the primary. Once a request has
+    written, its remaining reads go to the primary.
+
+    When the request has selected a shard (see ShardService), every
+    statement goes to that shard instead.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and selected_shard() is not None:
+            return self._db.engines[shard_bind_key(selected_shard())]
+        if bind is None and self._reads_from_replica(clause):
+            # Chosen once per request, None meaning the primary
+            if "replica_engine" not in g:
+                g.replica_engine = ReplicaRouter.choose_replica(self._db.engines)
+            if g.replica_engine is not None:
+                return g.replica_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self, clause):
+        return (
+            isinstance(clause, Select)
+            and clause._for_update_arg is None
+            and not self._flushing
+            and not self.info.get("wrote")
+            and has_request_context()
+            and g.get("read_from_replica", False)
+        )
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _after_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _do_orm_execute(orm_execute_state):
+    # Statements executed directly, e.g. bulk inserts and updates
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _after_commit(session):
+    if not session.info.pop("wrote", False) or not has_request_context():
+        return
+    if not current_app.config["DATABASE_REPLICA_URIS"]:
+        return
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        return
+    if identity is not None:
+        ReplicaRouter.pin(identity)
@@ -0,0 +1,88 @@
+import gzip
+import zlib
+
+
+def to_columnar(rows, fields, dictionary_fields=()):
+    """
+    Convert a list of row dicts into one list of values per field.
+
+    Fields listed in ``dictionary_fields`` are dictionary-encoded: their
+    column holds indexes into a list of the distinct values.
+
+    :param rows: List of dicts, one per row
+    :param fields: Field names to include, in order
+    :param dictionary_fields: Fields with few distinct values to encode
+    :return: Dict with ``count``, ``columns`` and ``dictionaries``
+    """
+    columns = {field: [row[field] for row in rows] for field in fields}
+
+    dictionaries = {}
+    for field in dictionary_fields:
+        if field not in columns:
+            continue
+        codes = {}
+        columns[field] = [
+            codes.setdefault(value, len(codes)) for value in columns[field]
+        ]
+        dictionaries[field] = list(codes)
+
+    return {"count": len(rows), "columns": columns, "dictionaries": dictionaries}
+
+
+def parse_accept_encoding(accept_encoding):
+    """
+    Parse an Accept-Encoding header into the quality (q-value) of each
+    content coding, e.g. ``{"gzip": 1.0, "*": 0.0}``. Invalid q-values
+    count as 0 (not acceptable).
+    """
+    qualities = {}
+    for item in (accept_encoding or "").split(","):
+        coding, *parameters = (part.strip() for part in item.split(";"))
+        if not coding:
+            continue
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    return qualities
+
+
+def compress_response(response, accept_encoding, min_size=0):
+    """
+    Compress a response body with gzip or deflate if the client accepts it,
+    preferring the coding with the higher q-value (gzip on a tie).
+
+    The response always varies on Accept-Encoding, compressed or not, so
+    caches never serve one client the body negotiated for another.
+
+    :param response: Flask response to compress in place
+    :param accept_encoding: Value of the request's Accept-Encoding header
+    :param min_size: Bodies smaller than this are left uncompressed
+    :return: The same response object
+    """
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < min_size or response.direct_passthrough:
+        return response
+
+    qualities = parse_accept_encoding(accept_encoding)
+    encoding = None
+    best_quality = 0.0
+    for candidate in ("gzip", "deflate"):
+        quality = qualities.get(candidate, qualities.get("*", 0.0))
+        if quality > best_quality:
+            encoding, best_quality = candidate, quality
+
+    if encoding == "gzip":
+        response.set_data(gzip.compress(body))
+    elif encoding == "deflate":
+        response.set_data(zlib.compress(body))
+    else:
+        return response
+    response.headers["Content-Encoding"] = encoding
+    return response
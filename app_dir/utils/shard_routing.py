@@ -0,0 +1,35 @@
+from contextlib import contextmanager
+
+from flask import g, has_app_context
+
+
+class ShardUnavailableError(Exception):
+    """The user's data is being moved between shards; retry shortly."""
+
+
+def shard_bind_key(shard):
+    """Bind key of shard number ``shard`` in SQLALCHEMY_BINDS."""
+    return f"shard_{shard}"
+
+
+def selected_shard():
+    """Return the shard db.session uses, or None for the default database."""
+    if not has_app_context():
+        return None
+    return g.get("shard")
+
+
+def select_shard(shard):
+    """Send the following db.session statements to ``shard``."""
+    g.shard = shard
+
+
+@contextmanager
+def use_shard(shard):
+    """Send the db.session statements inside the block to ``shard``."""
+    previous = selected_shard()
+    g.shard = shard
+    try:
+        yield
+    finally:
+        g.shard = previous
@@ -0,0 +1,99 @@
+import threading
+
+from flask import current_app, g
+
+from app_dir.utils.metrics import register_collector
+
+
+class _Call:
+    """An in-flight call whose result is shared with concurrent callers."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls into a single execution.
+
+    While a call for a key is running, other callers with the same key wait
+    for it and receive the same result (or exception) instead of running
+    the call again. Nothing is cached once the call has finished.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.requests = 0
+        self.executions = 0
+        register_collector(f"single_flight.{name}", self.stats)
+
+    def do(self, key, fn):
+        """Run ``fn`` for ``key``, or wait for the call already in flight."""
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        """Return request and execution counters and the coalescing ratio."""
+        with self._lock:
+            requests, executions = self.requests, self.executions
+        return {
+            "requests": requests,
+            "executions": executions,
+            "coalesced": requests - executions,
+            "coalescing_ratio": (
+                (requests - executions) / requests if requests else 0.0
+            ),
+        }
+
+
+def coalesced_json_response(single_flight, key, fn):
+    """
+    Build a JSON response through ``single_flight``.
+
+    ``fn`` returns a ``(payload, status)`` tuple. The payload is serialized
+    once by the leading request and the same body is shared by every
+    coalesced request. Requests only join calls reading from the same kind
+    of database, so a user pinned to the primary after a write (see
+    ``read_from_replica``) never gets a body read from a replica.
+    Coalescing can be turned off with SINGLE_FLIGHT_ENABLED.
+    """
+
+    def serialize():
+        payload, status = fn()
+        return current_app.json.dumps(payload), status
+
+    if current_app.config.get("SINGLE_FLIGHT_ENABLED", True):
+        key = (key, g.get("read_from_replica", False))
+        body, status = single_flight.do(key, serialize)
+    else:
+        body, status = serialize()
+
+    return current_app.response_class(
+        f"{body}\n", status=status, mimetype=current_app.json.mimetype
+    )
@@ -0,0 +1,31 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Token bucket limiting how many units (e.g. rows read) are consumed per
+    second. ``acquire`` sleeps until the requested units fit in the budget.
+    """
+
+    def __init__(self, rate_per_second, burst=None):
+        self.rate = rate_per_second
+        self.capacity = burst if burst is not None else rate_per_second
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, units=1):
+        """Consume ``units``, sleeping as long as needed to stay in budget."""
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= units
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
@@ -0,0 +1,123 @@
+import gzip
+import json
+import os
+from datetime import datetime
+from decimal import Decimal
+
+from app_dir.utils.response_utilities import to_columnar
+
+ARCHIVE_FIELDS = (
+    "transaction_id",
+    "transaction_type",
+    "account_from",
+    "account_to",
+    "amount",
+    "description",
+    "reference_code",
+    "status",
+    "timestamp",
+    "balance_after",
+)
+# Columns with few distinct values, dictionary-encoded in columnar archives
+DICTIONARY_FIELDS = ("transaction_type", "status")
+EXTENSIONS = {"NDJSON": "ndjson.gz", "COLUMNAR": "columns.json.gz"}
+
+
+def encode_transaction(row):
+    """Convert a transaction row mapping into JSON-compatible values."""
+    encoded = {field: row[field] for field in ARCHIVE_FIELDS}
+    for field in ("amount", "balance_after"):
+        if encoded[field] is not None:
+            encoded[field] = str(encoded[field])
+    if encoded["timestamp"] is not None:
+        encoded["timestamp"] = encoded["timestamp"].isoformat()
+    return encoded
+
+
+def decode_transaction(encoded):
+    """Inverse of ``encode_transaction``, giving the types the ORM returns."""
+    for field in ("amount", "balance_after"):
+        if encoded[field] is not None:
+            encoded[field] = Decimal(encoded[field])
+    if encoded["timestamp"] is not None:
+        encoded["timestamp"] = datetime.fromisoformat(encoded["timestamp"])
+    return encoded
+
+
+def write_archive(path, rows, archive_format):
+    """
+    Write encoded transactions to a gzip-compressed archive file.
+
+    NDJSON archives are streamed one transaction per line. Columnar archives
+    hold one list per field (see ``to_columnar``), which compresses better
+    and lets readers filter on a few columns before decoding whole rows.
+    The file is written under a temporary name and renamed when complete.
+
+    :return: Number of transactions written
+    """
+    temporary_path = f"{path}.tmp"
+    count = 0
+    with gzip.open(temporary_path, "wt", encoding="utf-8") as archive_file:
+        if archive_format == "NDJSON":
+            for row in rows:
+                archive_file.write(json.dumps(row, separators=(",", ":")))
+                archive_file.write("\n")
+                count += 1
+        else:
+            rows = list(rows)
+            count = len(rows)
+            json.dump(
+                to_columnar(rows, ARCHIVE_FIELDS, DICTIONARY_FIELDS),
+                archive_file,
+                separators=(",", ":"),
+            )
+    os.replace(temporary_path, path)
+    return count
+
+
+def read_archive(path, archive_format, account_numbers, transaction_type=None):
+    """
+    Read the transactions of an archive that involve one of
+    ``account_numbers``, optionally of a single type, in file order.
+
+    :return: List of decoded transaction dicts
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as archive_file:
+        if archive_format == "NDJSON":
+            return [
+                decode_transaction(row)
+                for row in map(json.loads, archive_file)
+                if (
+                    row["account_from"] in account_numbers
+                    or row["account_to"] in account_numbers
+                )
+                and (
+                    transaction_type is None
+                    or row["transaction_type"] == transaction_type
+                )
+            ]
+        archive = json.load(archive_file)
+
+    columns = archive["columns"]
+    dictionaries = archive["dictionaries"]
+    matches = [
+        index
+        for index, (account_from, account_to) in enumerate(
+            zip(columns["account_from"], columns["account_to"])
+        )
+        if account_from in account_numbers or account_to in account_numbers
+    ]
+    if transaction_type is not None:
+        types = dictionaries["transaction_type"]
+        matches = [
+            index
+            for index in matches
+            if types[columns["transaction_type"][index]] == transaction_type
+        ]
+    rows = []
+    for index in matches:
+        row = {field: columns[field][index] for field in ARCHIVE_FIELDS}
+        for field, values in dictionaries.items():
+            row[field] = values[row[field]]
+        rows.append(decode_transaction(row))
+    return rows
@@ -0,0 +1,60 @@
+from sqlalchemy import and_, insert, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+
+def increment_counters(session, model, rows, key_columns, increment_columns):
+    """
+    Add to counter columns of rows identified by their key, inserting the
+    rows that do not exist yet, with a single upsert statement.
+
+    Runs in the session's current transaction, so the counters are
+    committed or rolled back together with the rest of the unit of work.
+
+    :param session: SQLAlchemy session to execute with
+    :param model: Model class of the counter table
+    :param rows: List of dicts with the key columns and the increments
+    :param key_columns: Names of the columns forming the unique key
+    :param increment_columns: Names of the columns to add the values to
+    """
+    if not rows:
+        return
+
+    table = model.__table__
+    dialect = session.get_bind().dialect.name
+
+    if dialect == "mysql":
+        statement = mysql.insert(table)
+        statement = statement.on_duplicate_key_update(
+            {
+                column: table.c[column] + statement.inserted[column]
+                for column in increment_columns
+            }
+        )
+    elif dialect in ("sqlite", "postgresql"):
+        dialect_module = sqlite if dialect == "sqlite" else postgresql
+        statement = dialect_module.insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={
+                column: table.c[column] + statement.excluded[column]
+                for column in increment_columns
+            },
+        )
+    else:
+        # Generic fallback: update each row, then insert the missing ones
+        for row in rows:
+            result = session.execute(
+                update(table)
+                .where(and_(*(table.c[key] == row[key] for key in key_columns)))
+                .values(
+                    {
+                        column: table.c[column] + row[column]
+                        for column in increment_columns
+                    }
+                )
+            )
+            if result.rowcount == 0:
+                session.execute(insert(table).values(row))
+        return
+
+    session.execute(statement, rows)
@@ -0,0 +1,83 @@
+"""
+Throughput and latency of transfers with asynchronous settlement: each
+client thread submits transfers and waits for them to be settled.
+
+    python benchmarks/async_settlement.py --workers 4 --clients 8
+"""
+
+import threading
+import time
+from collections import Counter
+
+from common import ApiClient, parse_args, percentile, serialize_writes, setup_app
+
+
+def main():
+    args = parse_args(__doc__, transfers=400, clients=8, workers=4, poll_interval=0.05)
+    app = setup_app(args.database_uri)
+    app.config["ASYNC_SETTLEMENT_ENABLED"] = True
+    app.config["SETTLEMENT_WORKERS"] = args.workers
+    app.config["SETTLEMENT_POLL_INTERVAL"] = args.poll_interval
+    # Screening would flag the quick succession of transfers
+    app.config["SCREENING_ENABLED"] = False
+
+    from app_dir.services.settlement_service import SettlementService
+
+    api = ApiClient(app)
+    headers = api.login()
+    accounts = api.create_accounts(headers, args.clients)
+    serialize_writes(app)
+    SettlementService.start(app)
+    for account_number in accounts:
+        response = api.post_transaction(
+            headers, type="deposit", account_number=account_number, amount=100000
+        )
+        api.client.get(f"{response.headers['Location']}?wait=10", headers=headers)
+
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def run_client(index):
+        client = app.test_client()
+        for _ in range(args.transfers // args.clients):
+            started = time.perf_counter()
+            response = api.post_transaction(
+                headers,
+                client=client,
+                type="transfer",
+                from_account=accounts[index],
+                to_account=accounts[(index + 1) % len(accounts)],
+                amount=1,
+            )
+            status = client.get(
+                f"{response.headers['Location']}?wait=10", headers=headers
+            ).json["status"]
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                statuses[status] += 1
+
+    threads = [
+        threading.Thread(target=run_client, args=(index,))
+        for index in range(args.clients)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    SettlementService.stop()
+
+    latencies.sort()
+    print(
+        f"{len(latencies)} transfers, {args.workers} workers: "
+        f"{len(latencies) / elapsed:.0f} transfers/s, "
+        f"p50 {percentile(latencies, 50) * 1000:.1f} ms, "
+        f"p99 {percentile(latencies, 99) * 1000:.1f} ms"
+    )
+    print(dict(statuses))
+
+
+if __name__ == "__main__":
+    main()
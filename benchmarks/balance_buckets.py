@@ -0,0 +1,73 @@
+"""
+Deposit throughput into one hot account, with its balance split over
+different numbers of buckets.
+
+SQLite locks the whole database on write, so only a database with row
+locks, e.g. MySQL, shows what the buckets gain:
+
+    python benchmarks/balance_buckets.py --database-uri mysql+pymysql://...
+"""
+
+import threading
+import time
+from decimal import Decimal
+
+from common import ApiClient, parse_args, serialize_writes, setup_app
+
+
+def main():
+    args = parse_args(__doc__, deposits=2000, clients=8, bucket_counts="0,8")
+    bucket_counts = [int(count) for count in args.bucket_counts.split(",")]
+    app = setup_app(args.database_uri)
+    # Screening would flag the quick succession of deposits
+    app.config["SCREENING_ENABLED"] = False
+
+    from app_dir.extensions import db
+    from app_dir.models.account_model import Account
+    from app_dir.services.balance_bucket_service import BalanceBucketService
+
+    api = ApiClient(app)
+    headers = api.login()
+    accounts = api.create_accounts(headers, len(bucket_counts))
+    with app.app_context():
+        for account_number, bucket_count in zip(accounts, bucket_counts):
+            if bucket_count:
+                BalanceBucketService.set_bucket_count(account_number, bucket_count)
+    serialize_writes(app)
+
+    def run_client(account_number):
+        client = app.test_client()
+        for _ in range(args.deposits // args.clients):
+            response = api.post_transaction(
+                headers,
+                client=client,
+                type="deposit",
+                account_number=account_number,
+                amount=1,
+            )
+            assert response.json["status"] == "COMPLETED", response.json
+
+    for account_number, bucket_count in zip(accounts, bucket_counts):
+        threads = [
+            threading.Thread(target=run_client, args=(account_number,))
+            for _ in range(args.clients)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with app.app_context():
+            total = db.session.get(Account, account_number).total_balance
+        deposits = args.deposits // args.clients * args.clients
+        assert total == Decimal(deposits), total
+        print(
+            f"{bucket_count} buckets, {args.clients} clients: "
+            f"{deposits / elapsed:.0f} deposits/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Shared setup of the benchmarks: the app on a scratch database, and a test
+client that creates users, accounts and transactions through the API.
+
+Every benchmark takes ``--database-uri``; without it a fresh SQLite file
+is created in a temporary directory. Run them from the repository root,
+e.g. ``python benchmarks/transaction_encoding.py --help``.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args(description, **options):
+    """
+    Parse the command line of a benchmark.
+
+    :param options: Options and their defaults, e.g. ``rows=10000``
+        for ``--rows``
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--database-uri",
+        help="Database to run against (default: a new SQLite file)",
+    )
+    for name, default in options.items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}",
+            type=type(default),
+            default=default,
+            help=f"(default: {default})",
+        )
+    return parser.parse_args()
+
+
+def setup_app(database_uri=None):
+    """
+    Import the app configured for ``database_uri`` and create its tables.
+
+    :return: The Flask app
+    """
+    if database_uri is None:
+        directory = tempfile.mkdtemp(prefix="bankops-bench-")
+        database_uri = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    # The app reads its configuration when it is imported
+    os.environ["DATABASE_URI"] = database_uri
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret-key-of-sufficient-length")
+    sys.path.insert(0, ROOT)
+
+    from app import app
+    from app_dir.extensions import db
+
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.create_all(bind_key=None)
+    return app
+
+
+def serialize_writes(app):
+    """
+    On SQLite, make transactions take the write lock when they begin, like
+    row locks would on MySQL, so concurrent requests queue instead of
+    failing. Requests that open a second connection while their session is
+    in a transaction (e.g. to reserve account numbers) would wait for
+    themselves, so call it once the benchmark's data is created.
+    """
+    from sqlalchemy import event
+
+    from app_dir.extensions import db
+
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        dbapi_connection.execute("PRAGMA busy_timeout = 30000")
+
+    @event.listens_for(engine, "begin")
+    def on_begin(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    engine.dispose()
+
+
+class ApiClient:
+    """Test client creating the data of a benchmark through the API."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def login(self, username=None):
+        """Create a user and return its auth headers."""
+        username = username or f"bench-{uuid.uuid4().hex[:12]}"
+        self.client.post(
+            "/api/v1/users",
+            json={"username": username, "password": "pw", "email": f"{username}@x"},
+        )
+        response = self.client.post(
+            "/api/v1/auth/sessions/users",
+            json={"username": username, "password": "pw"},
+        )
+        return {"Authorization": f"Bearer {response.json['access_token']}"}
+
+    def create_accounts(self, headers, count=1, account_type="checking"):
+        """Create accounts for the user of ``headers``; returns their numbers."""
+        return [
+            self.client.post(
+                "/api/v1/accounts",
+                json={
+                    "account_name": f"bench {index}",
+                    "account_type": account_type,
+                    "account_pin": "1234",
+                },
+                headers=headers,
+            ).json["account"]["account_number"]
+            for index in range(count)
+        ]
+
+    def post_transaction(self, headers, client=None, **data):
+        """POST a transaction, through ``client`` if given (e.g. per thread)."""
+        data["amount"] = str(data["amount"])
+        return (client or self.client).post(
+            "/api/v1/transactions", json=data, headers=headers
+        )
+
+
+def percentile(sorted_values, percent):
+    """Return the ``percent``-th percentile of already sorted values."""
+    return sorted_values[(len(sorted_values) - 1) * percent // 100]
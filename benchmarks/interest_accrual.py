@@ -0,0 +1,77 @@
+"""
+Throughput of the daily interest accrual over many savings accounts.
+
+    python benchmarks/interest_accrual.py --accounts 200000
+"""
+
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from common import ApiClient, parse_args, setup_app
+
+
+def insert_accounts(app, username, count):
+    """Insert ``count`` savings accounts; one in ten earns no interest."""
+    from app_dir.extensions import db
+    from app_dir.models.account_model import Account
+    from app_dir.models.user_model import User
+
+    now = datetime.now()
+    with app.app_context():
+        user_id = db.session.scalar(
+            db.select(User.user_id).where(User.username == username)
+        )
+        rows = [
+            {
+                "user_id": user_id,
+                "account_holder": username,
+                "account_type": "SAVINGS",
+                "account_name": "savings",
+                "balance": Decimal("1000.00") + index % 500,
+                "interest_rate": Decimal("3.650") if index % 10 else Decimal("0"),
+                "latest_balance_change": 0,
+                "last_transaction_date": now,
+                "creation_date": now,
+                "pin_hash": b"x",
+                "pin_salt": b"x",
+                "is_locked": False,
+            }
+            for index in range(count)
+        ]
+        db.session.execute(db.insert(Account), rows)
+        db.session.commit()
+
+
+def main():
+    args = parse_args(
+        __doc__,
+        accounts=200000,
+        chunk_size=5000,
+        accrual_date=date.today().isoformat(),
+    )
+    app = setup_app(args.database_uri)
+    api = ApiClient(app)
+    username = "interest-bench"
+    api.login(username)
+    insert_accounts(app, username, args.accounts)
+
+    from app_dir.services.interest_service import InterestService
+
+    with app.app_context():
+        started = time.perf_counter()
+        run = InterestService.accrue_interest(
+            date.fromisoformat(args.accrual_date), chunk_size=args.chunk_size
+        )
+        elapsed = time.perf_counter() - started
+        details = run.get_run_details()
+
+    print(details)
+    print(
+        f"{args.accounts} accounts in {elapsed:.1f}s, "
+        f"{args.accounts / elapsed:.0f} accounts/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Latency of first transaction pages served from the recent transactions
+cache, its memory per cached transaction, and its hit rate for Zipf
+distributed reads with 5% writes.
+
+    python benchmarks/recent_transactions.py --accounts 10000
+"""
+
+import bisect
+import itertools
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from common import ApiClient, parse_args, setup_app
+
+
+def insert_data(app, username, account_count, per_account):
+    """
+    Insert accounts with ``per_account`` deposits each.
+
+    :return: The account numbers and the ID of their owner
+    """
+    from app_dir.extensions import db
+    from app_dir.models.account_model import Account
+    from app_dir.models.transaction_model import Transaction
+    from app_dir.models.user_model import User
+    from app_dir.services.transaction_count_service import TransactionCountService
+
+    now = datetime.now()
+    with app.app_context():
+        user_id = db.session.scalar(
+            db.select(User.user_id).where(User.username == username)
+        )
+        accounts = [
+            {
+                "user_id": user_id,
+                "account_holder": username,
+                "account_type": "CHECKING",
+                "account_name": f"checking {index}",
+                "balance": Decimal(per_account),
+                "latest_balance_change": 1,
+                "last_transaction_date": now,
+                "creation_date": now,
+                "pin_hash": b"x",
+                "pin_salt": b"x",
+                "is_locked": False,
+            }
+            for index in range(account_count)
+        ]
+        db.session.execute(db.insert(Account), accounts)
+        account_numbers = db.session.scalars(
+            db.select(Account.account_number).where(Account.user_id == user_id)
+        ).all()
+        for account_number in account_numbers:
+            db.session.execute(
+                db.insert(Transaction),
+                [
+                    {
+                        "transaction_type": "DEPOSIT",
+                        "amount": Decimal(1),
+                        "description": "Deposit of $1.00",
+                        "reference_code": f"{account_number:010d}{index:010d}",
+                        "account_from": account_number,
+                        "account_to": account_number,
+                        "status": "COMPLETED",
+                        "timestamp": now - timedelta(minutes=per_account - index),
+                        "balance_after": Decimal(index + 1),
+                    }
+                    for index in range(per_account)
+                ],
+            )
+        db.session.commit()
+        TransactionCountService.rebuild()
+        return account_numbers, user_id
+
+
+def measure_latency(app, account_numbers, user_id, samples):
+    """Time first pages queried, loaded into the cache and served from it."""
+    from app_dir.extensions import db
+    from app_dir.models.user_model import User
+    from app_dir.services.transaction_service import TransactionService
+
+    timings = {"query": [], "miss and load": [], "hit": []}
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        for account_number in random.sample(account_numbers, samples):
+            pages = []
+            for name, enabled in (
+                ("query", False),
+                ("miss and load", True),
+                ("hit", True),
+            ):
+                app.config["RECENT_TRANSACTIONS_ENABLED"] = enabled
+                started = time.perf_counter()
+                pages.append(TransactionService.get_transactions(user, account_number))
+                timings[name].append(time.perf_counter() - started)
+            assert pages[0] == pages[1] == pages[2]
+            db.session.rollback()
+    for name, values in timings.items():
+        print(f"first page, {name}: p50 {statistics.median(values) * 1000:.3f} ms")
+
+
+def measure_memory(app, account_numbers, user_id, samples):
+    """Measure the memory of rings loaded from the database."""
+    from app_dir.extensions import db
+    from app_dir.models.user_model import User
+    from app_dir.services.recent_transaction_service import RecentTransactionCache
+    from app_dir.services.transaction_service import TransactionService
+
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        cache = RecentTransactionCache(30, 10**9, None)
+        tracemalloc.start()
+        for account_number in random.sample(account_numbers, samples):
+            token = cache.begin_load(account_number)
+            loaded = TransactionService._query_transactions(
+                user, account_number, None, cache.per_account, 0, None, None
+            )
+            cache.end_load(account_number, token, user_id, loaded)
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    transactions = cache.stats()["transactions"]
+    print(
+        f"memory: {memory / transactions:.0f} B per cached transaction "
+        f"({transactions} transactions)"
+    )
+
+
+def simulate_hit_rate(account_count, lookups):
+    """Hit rate of different cache sizes for Zipf distributed accounts."""
+    from app_dir.services.recent_transaction_service import RecentTransactionCache
+
+    ring = [{"timestamp": -index, "transaction_type": "DEPOSIT"} for index in range(30)]
+    for exponent in (0.8, 1.0, 1.2):
+        weights = itertools.accumulate(
+            1 / rank**exponent for rank in range(1, account_count + 1)
+        )
+        cumulative = list(weights)
+        operations = [
+            (
+                bisect.bisect_left(cumulative, random.random() * cumulative[-1]),
+                random.random() < 0.05,
+            )
+            for _ in range(lookups)
+        ]
+        for cached_accounts in (account_count // 100, account_count // 10):
+            cache = RecentTransactionCache(30, cached_accounts * 30, None)
+            for clock, (account_number, write) in enumerate(operations):
+                if write:
+                    cache.add(
+                        account_number,
+                        {"timestamp": clock, "transaction_type": "DEPOSIT"},
+                    )
+                elif cache.get(account_number, 1, 30) is None:
+                    token = cache.begin_load(account_number)
+                    cache.end_load(account_number, token, 1, list(ring))
+            stats = cache.stats()
+            print(
+                f"zipf s={exponent:.1f}, {cached_accounts} accounts cached: "
+                f"hit rate {stats['hit_rate']:.3f}, "
+                f"{stats['evictions']} evictions"
+            )
+
+
+def main():
+    args = parse_args(
+        __doc__, accounts=10000, transactions=50, samples=100, lookups=300000
+    )
+    random.seed(7)
+    app = setup_app(args.database_uri)
+    username = "recent-bench"
+    ApiClient(app).login(username)
+    account_numbers, user_id = insert_data(
+        app, username, args.accounts, args.transactions
+    )
+
+    measure_latency(app, account_numbers, user_id, args.samples)
+    measure_memory(app, account_numbers, user_id, args.samples)
+    simulate_hit_rate(args.accounts, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
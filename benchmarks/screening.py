@@ -0,0 +1,66 @@
+"""
+Cost of a velocity screening check, and memory of the sliding windows,
+with many accounts being screened.
+
+    python benchmarks/screening.py --accounts 1000000 --checks 200000
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+
+from common import ROOT, parse_args
+
+
+def main():
+    args = parse_args(__doc__, accounts=1000000, checks=200000)
+    sys.path.insert(0, ROOT)
+
+    from app_dir.services.screening_service import (
+        MaxAmountRule,
+        MaxCountRule,
+        TransactionScreener,
+    )
+
+    screener = TransactionScreener(
+        [
+            MaxCountRule("WITHDRAWAL", 60, 20),
+            MaxAmountRule("WITHDRAWAL", 60, Decimal("10000")),
+        ],
+        max_windows=args.accounts * 2,
+    )
+    # Screening times are simulated, so the windows never expire
+    now = 1000000.0
+    tracemalloc.start()
+    for account_number in range(args.accounts):
+        screener.screen(account_number, "WITHDRAWAL", Decimal("1.00"), now=now)
+        now += 0.00001
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{args.accounts} accounts: {memory / 2**20:.0f} MiB, "
+        f"{memory / args.accounts:.0f} B per account"
+    )
+
+    amount = Decimal("12.34")
+    accounts = [random.randrange(args.accounts) for _ in range(args.checks)]
+    flagged = 0
+    started = time.perf_counter()
+    for account_number in accounts:
+        now += 0.0001
+        try:
+            screener.screen(account_number, "WITHDRAWAL", amount, now=now)
+        except ValueError:
+            flagged += 1
+    elapsed = time.perf_counter() - started
+    print(
+        f"{args.checks} checks: {elapsed / args.checks * 1e6:.2f} us/check, "
+        f"{flagged} flagged"
+    )
+    print(screener.stats())
+
+
+if __name__ == "__main__":
+    main()
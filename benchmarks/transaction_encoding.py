@@ -0,0 +1,81 @@
+"""
+Size and time of transaction list responses, row-wise vs columnar, with
+and without gzip.
+
+    python benchmarks/transaction_encoding.py --rows 10000
+"""
+
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from common import ApiClient, parse_args, setup_app
+
+TYPES = ("DEPOSIT", "WITHDRAWAL", "TRANSFER")
+
+
+def insert_transactions(app, account_from, account_to, count):
+    from app_dir.extensions import db
+    from app_dir.models.transaction_model import Transaction
+
+    start = datetime(2026, 1, 1)
+    rows = [
+        {
+            "transaction_type": random.choice(TYPES),
+            "amount": Decimal(random.randint(1, 99999)) / 100,
+            "description": "Payment",
+            "reference_code": uuid.uuid4().hex[:20],
+            "account_from": account_from,
+            "account_to": account_to,
+            "status": "COMPLETED",
+            "timestamp": start + timedelta(minutes=index),
+            "balance_after": Decimal("100.00"),
+        }
+        for index in range(count)
+    ]
+    with app.app_context():
+        db.session.execute(db.insert(Transaction), rows)
+        db.session.commit()
+
+
+def measure(client, url, headers, repeat):
+    """Return the body size and the best time in ms of ``repeat`` GETs."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 200, response.json
+        best = elapsed if best is None else min(best, elapsed)
+    return len(response.data), best * 1000
+
+
+def main():
+    args = parse_args(__doc__, rows=10000, repeat=5)
+    app = setup_app(args.database_uri)
+    app.config["RECENT_TRANSACTIONS_ENABLED"] = False
+    api = ApiClient(app)
+    headers = api.login()
+    account_from, account_to = api.create_accounts(headers, 2)
+    insert_transactions(app, account_from, account_to, args.rows)
+
+    print(f"{'limit':>6} {'format':>9} {'encoding':>9} {'bytes':>10} {'ms':>8}")
+    for limit in sorted({min(1000, args.rows), args.rows}):
+        for response_format in ("rows", "columnar"):
+            for encoding in ("identity", "gzip"):
+                size, ms = measure(
+                    api.client,
+                    f"/api/v1/transactions?limit={limit}&format={response_format}",
+                    {**headers, "Accept-Encoding": encoding},
+                    args.repeat,
+                )
+                print(
+                    f"{limit:>6} {response_format:>9} {encoding:>9} "
+                    f"{size:>10} {ms:>8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,146 @@ class Config:
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
     DATABASE_URI = os.getenv("DATABASE_URI")
 
+    # Connection pool of each database engine (primary, replicas and
+    # shards): DB_POOL_SIZE kept open plus up to DB_MAX_OVERFLOW more under
+    # load; a checkout waits at most DB_POOL_TIMEOUT whole seconds.
+    # Connections are pinged on checkout and replaced after DB_POOL_RECYCLE
+    # seconds, before MySQL's wait_timeout closes them.
+    DB_POOL_SIZE = 10
+    DB_MAX_OVERFLOW = 10
+    DB_POOL_TIMEOUT = 10
+    DB_POOL_RECYCLE = 1800
+    DB_POOL_PRE_PING = True
+    DB_CONNECT_TIMEOUT = 10
+
+    # Read replicas (comma-separated URIs) serving the read-only endpoints.
+    # A user who wrote reads from the primary for the read-your-writes
+    # window, carried in a signed cookie; replicas lagging more than
+    # REPLICA_MAX_LAG_SECONDS, checked in the background, are skipped.
+    DATABASE_REPLICA_URIS = [
+        uri for uri in os.getenv("DATABASE_REPLICA_URIS", "").split(",") if uri
+    ]
+    REPLICA_READ_YOUR_WRITES_SECONDS = 5
+    REPLICA_MAX_LAG_SECONDS = 2
+    REPLICA_LAG_CHECK_INTERVAL = 5
+
+    # Shards (comma-separated URIs) holding the users, their accounts and
+    # transactions; DATABASE_URI is then the shard directory. Directory
+    # entries are cached for SHARD_DIRECTORY_TTL_SECONDS, and a user being
+    # moved is refused for SHARD_MOVE_GRACE_SECONDS before the copy starts.
+    # Asynchronous settlement, the outbox and the scheduler cannot be
+    # enabled with shards.
+    DATABASE_SHARD_URIS = [
+        uri for uri in os.getenv("DATABASE_SHARD_URIS", "").split(",") if uri
+    ]
+    SHARD_DIRECTORY_TTL_SECONDS = 5
+    SHARD_MOVE_GRACE_SECONDS = 10
+
+    # Dashboard settings
+    DASHBOARD_TRANSACTIONS_PER_ACCOUNT = 5
+    DASHBOARD_MAX_TRANSACTIONS_PER_ACCOUNT = 50
+
+    # Maximum number of accounts that can be requested in one multi-get call
+    ACCOUNTS_MAX_BATCH_SIZE = 50
+
+    # Responses smaller than this many bytes are never compressed
+    COMPRESSION_MIN_SIZE = 1024
+
+    # Share one query between identical concurrent read requests
+    SINGLE_FLIGHT_ENABLED = True
+
+    # Latest transactions kept in memory per account to serve first pages
+    # without querying the transaction table; only the account's counts,
+    # also used for the total, are read. RECENT_TRANSACTIONS_MAX_ITEMS caps
+    # the total (about 0.8 KB each); rings are reloaded when the counts
+    # changed in another process, and after RECENT_TRANSACTIONS_TTL_SECONDS
+    # (None: never).
+    RECENT_TRANSACTIONS_ENABLED = True
+    RECENT_TRANSACTIONS_PER_ACCOUNT = 30
+    RECENT_TRANSACTIONS_MAX_ITEMS = 100000
+    RECENT_TRANSACTIONS_TTL_SECONDS = 30
+
+    # Ledger reconciliation: worker processes and the total number of DB rows
+    # they may read per second (None for no limit)
+    RECONCILIATION_WORKERS = 4
+    RECONCILIATION_MAX_ROWS_PER_SECOND = 50000
+
+    # Bulk import (import-ledger): validation worker processes and the number
+    # of rows validated and inserted per batch
+    IMPORT_WORKERS = 4
+    IMPORT_BATCH_SIZE = 5000
+
+    # Account numbers each process reserves from the DB at a time
+    ACCOUNT_NUMBER_BLOCK_SIZE = 100
+    # Secret key of the permutation spreading account numbers over the
+    # number space (JWT_SECRET_KEY when unset). It must never change once
+    # accounts exist, so set it to rotate JWT_SECRET_KEY independently.
+    ACCOUNT_NUMBER_KEY = os.getenv("ACCOUNT_NUMBER_KEY")
+
+    # Bulk account provisioning (POST /accounts/bulk): PIN hashing worker
+    # processes, accounts per INSERT statement and accounts per request
+    PROVISIONING_WORKERS = 4
+    PROVISIONING_CHUNK_SIZE = 1000
+    PROVISIONING_MAX_ACCOUNTS = 50000
+
+    # In-memory velocity screening of transactions. Each rule is one of
+    # "max_count" (transactions) or "max_amount" (total) per sliding window.
+    # Transactions rejected by a later check, e.g. the daily limit, or
+    # rolled back are not counted.
+    SCREENING_ENABLED = True
+    SCREENING_RULES = [
+        {
+            "rule": "max_count",
+            "transaction_type": "WITHDRAWAL",
+            "window_seconds": 60,
+            "limit": 20,
+        },
+        {
+            "rule": "max_count",
+            "transaction_type": "TRANSFER",
+            "window_seconds": 60,
+            "limit": 20,
+        },
+    ]
+    SCREENING_WINDOW_BUCKETS = 12
+    SCREENING_TTL_SECONDS = 3600
+    SCREENING_MAX_WINDOWS = 2000000
+
+    # Asynchronous settlement: POST /transactions only records a PENDING
+    # transaction and a local worker pool settles it
+    ASYNC_SETTLEMENT_ENABLED = False
+    SETTLEMENT_WORKERS = 4
+    SETTLEMENT_BATCH_SIZE = 100
+    SETTLEMENT_POLL_INTERVAL = 0.5
+    # Longest a client may long-poll for a transaction's status, in seconds
+    TRANSACTION_STATUS_MAX_WAIT = 30
+    # Transactional outbox: completed transactions are recorded as events and
+    # delivered to OUTBOX_SINK_URL (file://path or tcp://host:port)
+    OUTBOX_ENABLED = False
+    OUTBOX_SINK_URL = "file://outbox_events.ndjson"
+    OUTBOX_BATCH_SIZE = 500
+    OUTBOX_POLL_INTERVAL = 0.5
+    # Retry backoff after a failed delivery, doubled per attempt, in seconds
+    OUTBOX_BASE_BACKOFF = 1.0
+    OUTBOX_MAX_BACKOFF = 300.0
+    # Delivered events are deleted after OUTBOX_RETENTION_DAYS, checked by
+    # the dispatcher every OUTBOX_PRUNE_INTERVAL seconds
+    OUTBOX_RETENTION_DAYS = 7
+    OUTBOX_PRUNE_INTERVAL = 3600
+    OUTBOX_PRUNE_BATCH_SIZE = 5000
+    # Scheduled transfers: the scheduler queues the schedules due within
+    # SCHEDULER_LOOKAHEAD seconds, re-reading them every refill interval
+    SCHEDULER_ENABLED = False
+    SCHEDULER_LOOKAHEAD = 120
+    SCHEDULER_REFILL_INTERVAL = 60
+    SCHEDULER_BATCH_SIZE = 500
+    SCHEDULER_MAX_QUEUED = 100000
+    # Transaction archive: months older than TRANSACTION_ARCHIVE_AFTER_MONTHS
+    # are moved to files ("columnar" or "ndjson") by archive-transactions
+    TRANSACTION_ARCHIVE_DIR = "transaction_archive"
+    TRANSACTION_ARCHIVE_FORMAT = "columnar"
+    TRANSACTION_ARCHIVE_AFTER_MONTHS = 24
+
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -21,9 +161,13 @@ class DevelopmentConfig(Config):
     JWT_REFRESH_TOKEN_EXPIRES = datetime.timedelta(days=1)
     JWT_ACCESS_TOKEN_EXPIRES = datetime.timedelta(minutes=15)
     DEBUG = True
+    DB_POOL_SIZE = 5
+    DB_MAX_OVERFLOW = 5
 
 
 class ProductionConfig(Config):
     """Production configuration."""
 
-    pass
+    DB_POOL_SIZE = 20
+    DB_MAX_OVERFLOW = 20
+    DB_POOL_TIMEOUT = 5
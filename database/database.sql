@@ -50,6 +50,7 @@ CREATE TABLE IF NOT EXISTS `bankops_banking`.`account` (
   `is_locked` TINYINT(4) NULL DEFAULT NULL,
   `latest_balance_change` DECIMAL(13,2) NOT NULL,
   `last_transaction_date` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP(),
+  `bucket_count` INT(11) NOT NULL DEFAULT 0,
   PRIMARY KEY (`account_number`, `user_id`, `account_holder`),
   UNIQUE INDEX `account_number_UNIQUE` (`account_number` ASC) VISIBLE,
   INDEX `user_id_idx` (`user_id` ASC) VISIBLE,
@@ -91,18 +92,313 @@ CREATE TABLE IF NOT EXISTS `bankops_banking`.`transaction` (
   `description` VARCHAR(100) NULL DEFAULT NULL,
   `status` ENUM('PENDING', 'COMPLETED', 'FAILED', 'REVERSED') NULL DEFAULT 'PENDING',
   `reference_code` VARCHAR(20) NULL DEFAULT NULL,
-  PRIMARY KEY (`transaction_id`),
+  PRIMARY KEY (`transaction_id`, `timestamp`),
   INDEX `idx_account_from` (`account_from` ASC) VISIBLE,
   INDEX `idx_account_to` (`account_to` ASC) VISIBLE,
   INDEX `idx_timestamp` (`timestamp` ASC) VISIBLE,
-  CONSTRAINT `account_from`
+  INDEX `idx_reference_code` (`reference_code` ASC) VISIBLE)
+ENGINE = InnoDB
+AUTO_INCREMENT = 3
+-- Monthly partitions, so old months can be archived with DROP PARTITION.
+-- Partitioned tables cannot have foreign keys, and every unique key must
+-- include the partitioning column. Run `flask add-transaction-partitions`
+-- monthly to split p_future ahead of time.
+PARTITION BY RANGE COLUMNS(`timestamp`) (
+  PARTITION p_history VALUES LESS THAN ('2026-01-01'),
+  PARTITION p202601 VALUES LESS THAN ('2026-02-01'),
+  PARTITION p202602 VALUES LESS THAN ('2026-03-01'),
+  PARTITION p202603 VALUES LESS THAN ('2026-04-01'),
+  PARTITION p202604 VALUES LESS THAN ('2026-05-01'),
+  PARTITION p202605 VALUES LESS THAN ('2026-06-01'),
+  PARTITION p202606 VALUES LESS THAN ('2026-07-01'),
+  PARTITION p202607 VALUES LESS THAN ('2026-08-01'),
+  PARTITION p202608 VALUES LESS THAN ('2026-09-01'),
+  PARTITION p202609 VALUES LESS THAN ('2026-10-01'),
+  PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+  PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+  PARTITION p202612 VALUES LESS THAN ('2027-01-01'),
+  PARTITION p_future VALUES LESS THAN (MAXVALUE));
+
+
+-- -----------------------------------------------------
+-- Table `bankops_banking`.`interest_accrual_run`
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `bankops_banking`.`interest_accrual_run` (
+  `accrual_date` DATE NOT NULL,
+  `last_account_number` INT(11) NOT NULL DEFAULT 0,
+  `accounts_processed` INT(11) NOT NULL DEFAULT 0,
+  `total_interest` DECIMAL(17,2) NOT NULL DEFAULT 0,
+  `started_at` DATETIME NOT NULL,
+  `completed_at` DATETIME NULL DEFAULT NULL,
+  PRIMARY KEY (`accrual_date`))
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `bankops_banking`.`balance_snapshot`
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `bankops_banking`.`balance_snapshot` (
+  `account_number` INT(11) NOT NULL,
+  `snapshot_date` DATE NOT NULL,
+  `balance` DECIMAL(13,2) NOT NULL,
+  PRIMARY KEY (`account_number`, `snapshot_date`),
+  CONSTRAINT `fk_balance_snapshot_account`
+    FOREIGN KEY (`account_number`)
+    REFERENCES `bankops_banking`.`account` (`account_number`))
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `bankops_banking`.`daily_transaction_rollup`
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `bankops_banking`.`daily_transaction_rollup` (
+  `account_number` INT(11) NOT NULL,
+  `day` DATE NOT NULL,
+  `transaction_type` ENUM('DEPOSIT', 'WITHDRAWAL', 'TRANSFER') NOT NULL,
+  `direction` ENUM('CREDIT', 'DEBIT') NOT NULL,
+  `bucket` INT(11) NOT NULL DEFAULT 0,
+  `transaction_count` INT(11) NOT NULL DEFAULT 0,
+  `total_amount` DECIMAL(17,2) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`account_number`, `day`, `transaction_type`, `direction`, `bucket`),
+  CONSTRAINT `fk_daily_transaction_rollup_account`
+    FOREIGN KEY (`account_number`)
+    REFERENCES `bankops_banking`.`account` (`account_number`))
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `bankops_banking`.`account_daily_usage`
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `bankops_banking`.`account_daily_usage` (
+  `account_number` INT(11) NOT NULL,
+  `day` DATE NOT NULL,
+  `withdrawal_total` DECIMAL(13,2) NOT NULL DEFAULT 0,
+  `transfer_total` DECIMAL(13,2) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`account_number`, `day`),
+  CONSTRAINT `fk_account_daily_usage_account`
+    FOREIGN KEY (`account_number`)
+    REFERENCES `bankops_banking`.`account` (`account_number`))
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `bankops_banking`.`outbox_event`
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `bankops_banking`.`outbox_event` (
+  `event_id` INT(11) NOT NULL AUTO_INCREMENT,
+  `event_type` VARCHAR(50) NOT NULL,
+  `payload` TEXT NOT NULL,
+  `created_at` DATETIME NOT NULL,
+  `attempts` INT(11) NOT NULL DEFAULT 0,
+  `next_attempt_at` DATETIME NOT NULL,
+  `dispatched_at` DATETIME NULL DEFAULT NULL,
+  `last_error` VARCHAR(255) NULL DEFAULT NULL,
+  PRIMARY KEY (`event_id`),
+  INDEX `idx_outbox_pending` (`dispatched_at` ASC, `event_id` ASC))
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `bankops_banking`.`account_balance_bucket`
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `bankops_banking`.`account_balance_bucket` (
+  `account_number` INT(11) NOT NULL,
+  `bucket` INT(11) NOT NULL,
+  `balance` DECIMAL(13,2) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`account_number`, `bucket`),
+  CONSTRAINT `fk_account_balance_bucket_account`
+    FOREIGN KEY (`account_number`)
+    REFERENCES `bankops_banking`.`account` (`account_number`))
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `bankops_banking`.`scheduled_transfer`
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `bankops_banking`.`scheduled_transfer` (
+  `schedule_id` INT(11) NOT NULL AUTO_INCREMENT,
+  `user_id` INT(11) NOT NULL,
+  `account_from` INT(11) NOT NULL,
+  `account_to` INT(11) NOT NULL,
+  `amount` DECIMAL(13,2) NOT NULL,
+  `description` VARCHAR(255) NULL DEFAULT NULL,
+  `frequency` ENUM('ONCE', 'DAILY', 'WEEKLY', 'MONTHLY') NOT NULL,
+  `starts_at` DATETIME NOT NULL,
+  `run_count` INT(11) NOT NULL DEFAULT 0,
+  `next_run_at` DATETIME NOT NULL,
+  `last_run_at` DATETIME NULL DEFAULT NULL,
+  `is_active` TINYINT(1) NOT NULL DEFAULT 1,
+  PRIMARY KEY (`schedule_id`),
+  INDEX `idx_scheduled_transfer_due` (`is_active` ASC, `next_run_at` ASC),
+  INDEX `idx_scheduled_transfer_user` (`user_id` ASC),
+  CONSTRAINT `fk_scheduled_transfer_user`
+    FOREIGN KEY (`user_id`)
+    REFERENCES `bankops_banking`.`user` (`user_id`),
+  CONSTRAINT `fk_scheduled_transfer_account_from`
     FOREIGN KEY (`account_from`)
     REFERENCES `bankops_banking`.`account` (`account_number`),
-  CONSTRAINT `account_to`
+  CONSTRAINT `fk_scheduled_transfer_account_to`
     FOREIGN KEY (`account_to`)
     REFERENCES `bankops_banking`.`account` (`account_number`))
-ENGINE = InnoDB
-AUTO_INCREMENT = 3;
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `bankops_banking`.`transaction_archive`
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `bankops_banking`.`transaction_archive` (
+  `month` DATE NOT NULL,
+  `path` VARCHAR(255) NOT NULL,
+  `archive_format` ENUM('NDJSON', 'COLUMNAR') NOT NULL,
+  `row_count` INT(11) NOT NULL,
+  `archived_at` DATETIME NOT NULL,
+  PRIMARY KEY (`month`))
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `bankops_banking`.`archived_account_balance`
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `bankops_banking`.`archived_account_balance` (
+  `account_number` INT(11) NOT NULL,
+  `net_change` DECIMAL(17,2) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`account_number`),
+  CONSTRAINT `fk_archived_account_balance_account`
+    FOREIGN KEY (`account_number`)
+    REFERENCES `bankops_banking`.`account` (`account_number`))
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `bankops_banking`.`import_checkpoint`
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `bankops_banking`.`import_checkpoint` (
+  `source` VARCHAR(255) NOT NULL,
+  `kind` ENUM('ACCOUNTS', 'TRANSACTIONS') NOT NULL,
+  `rows_processed` INT(11) NOT NULL DEFAULT 0,
+  `rows_imported` INT(11) NOT NULL DEFAULT 0,
+  `rows_rejected` INT(11) NOT NULL DEFAULT 0,
+  `updated_at` DATETIME NOT NULL,
+  `completed_at` DATETIME NULL DEFAULT NULL,
+  PRIMARY KEY (`source`))
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `bankops_banking`.`account_number_sequence`
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `bankops_banking`.`account_number_sequence` (
+  `name` VARCHAR(45) NOT NULL,
+  `next_value` BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (`name`))
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `bankops_banking`.`transaction_search`
+-- -----------------------------------------------------
+-- Full-text index of the transaction descriptions. Partitioned InnoDB tables
+-- cannot have FULLTEXT indexes, so it is a separate table kept up to date by
+-- triggers; entries of dropped partitions are purged by archive-transactions.
+-- `accounts` holds the transaction's account numbers as tokens ("a<number>"),
+-- so searches are limited to the owner's accounts inside the index.
+CREATE TABLE IF NOT EXISTS `bankops_banking`.`transaction_search` (
+  `transaction_id` INT(11) NOT NULL,
+  `timestamp` DATETIME NOT NULL,
+  `description` VARCHAR(255) NULL DEFAULT NULL,
+  `accounts` VARCHAR(50) NOT NULL,
+  PRIMARY KEY (`transaction_id`),
+  INDEX `idx_transaction_search_timestamp` (`timestamp` ASC) VISIBLE,
+  FULLTEXT INDEX `ft_transaction_search` (`description`, `accounts`))
+ENGINE = InnoDB;
+
+CREATE TRIGGER `bankops_banking`.`transaction_search_insert`
+AFTER INSERT ON `bankops_banking`.`transaction` FOR EACH ROW
+  INSERT INTO `bankops_banking`.`transaction_search`
+    (`transaction_id`, `timestamp`, `description`, `accounts`)
+  VALUES (
+    NEW.`transaction_id`,
+    NEW.`timestamp`,
+    NEW.`description`,
+    CONCAT('a', NEW.`account_from`, ' a', NEW.`account_to`));
+
+CREATE TRIGGER `bankops_banking`.`transaction_search_delete`
+AFTER DELETE ON `bankops_banking`.`transaction` FOR EACH ROW
+  DELETE FROM `bankops_banking`.`transaction_search`
+  WHERE `transaction_id` = OLD.`transaction_id`;
+
+CREATE TRIGGER `bankops_banking`.`transaction_search_update`
+AFTER UPDATE ON `bankops_banking`.`transaction` FOR EACH ROW
+  UPDATE `bankops_banking`.`transaction_search`
+  SET `description` = NEW.`description`
+  WHERE `transaction_id` = NEW.`transaction_id`
+    AND NOT (`description` <=> NEW.`description`);
+
+
+-- -----------------------------------------------------
+-- Table `bankops_banking`.`account_transaction_count`
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `bankops_banking`.`account_transaction_count` (
+  `account_number` INT(11) NOT NULL,
+  `transaction_type` ENUM('DEPOSIT', 'WITHDRAWAL', 'TRANSFER') NOT NULL,
+  `bucket` INT(11) NOT NULL DEFAULT 0,
+  `transaction_count` INT(11) NOT NULL DEFAULT 0,
+  `shared_count` INT(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`account_number`, `transaction_type`, `bucket`),
+  CONSTRAINT `fk_account_transaction_count_account`
+    FOREIGN KEY (`account_number`)
+    REFERENCES `bankops_banking`.`account` (`account_number`))
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `bankops_banking`.`shard_user`
+-- Shard directory: only used in the directory database when
+-- DATABASE_SHARD_URIS is set. Every shard has the other tables.
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `bankops_banking`.`shard_user` (
+  `user_id` INT(11) NOT NULL,
+  `username` VARCHAR(45) NOT NULL,
+  `shard` INT(11) NOT NULL,
+  `moving_to` INT(11) NULL DEFAULT NULL,
+  PRIMARY KEY (`user_id`),
+  UNIQUE INDEX `username_UNIQUE` (`username` ASC) VISIBLE,
+  INDEX `idx_shard` (`shard` ASC) VISIBLE)
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `bankops_banking`.`shard_account`
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `bankops_banking`.`shard_account` (
+  `account_number` INT(11) NOT NULL,
+  `user_id` INT(11) NOT NULL,
+  PRIMARY KEY (`account_number`),
+  INDEX `idx_user_id` (`user_id` ASC) VISIBLE)
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `bankops_banking`.`transfer_saga`
+-- Cross-shard transfers, in the directory database
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `bankops_banking`.`transfer_saga` (
+  `saga_id` INT(11) NOT NULL AUTO_INCREMENT,
+  `reference_code` VARCHAR(20) NOT NULL,
+  `account_from` INT(11) NOT NULL,
+  `account_to` INT(11) NOT NULL,
+  `from_shard` INT(11) NOT NULL,
+  `to_shard` INT(11) NOT NULL,
+  `amount` DECIMAL(13,2) NOT NULL,
+  `description` VARCHAR(255) NULL DEFAULT NULL,
+  `state` ENUM('STARTED', 'DEBITED', 'COMPLETED', 'COMPENSATED', 'FAILED') NOT NULL,
+  `error` VARCHAR(255) NULL DEFAULT NULL,
+  `created_at` DATETIME NOT NULL,
+  `updated_at` DATETIME NOT NULL,
+  PRIMARY KEY (`saga_id`),
+  UNIQUE INDEX `reference_code_UNIQUE` (`reference_code` ASC) VISIBLE,
+  INDEX `idx_state` (`state` ASC) VISIBLE)
+ENGINE = InnoDB;
 
 
 SET SQL_MODE=@OLD_SQL_MODE;
@@ -0,0 +1,139 @@
+import os
+import sys
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The app reads its configuration when it is imported
+DATA_DIR = tempfile.mkdtemp(prefix="bankops-tests-")
+os.environ["DATABASE_URI"] = f"sqlite:///{os.path.join(DATA_DIR, 'bankops.db')}"
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret-key-of-sufficient-length")
+
+from app import app as flask_app  # noqa: E402
+from app_dir.extensions import db  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    flask_app.config["TESTING"] = True
+    with flask_app.app_context():
+        db.create_all(bind_key=None)
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    """Create a user with a unique name and return its auth headers."""
+
+    def login(username=None):
+        username = username or f"user-{uuid.uuid4().hex[:12]}"
+        response = client.post(
+            "/api/v1/users",
+            json={"username": username, "password": "pw", "email": f"{username}@x"},
+        )
+        assert response.status_code == 201, response.json
+        response = client.post(
+            "/api/v1/auth/sessions/users",
+            json={"username": username, "password": "pw"},
+        )
+        assert response.status_code == 201, response.json
+        return {"Authorization": f"Bearer {response.json['access_token']}"}
+
+    return login
+
+
+@pytest.fixture
+def create_account(client):
+    """Create an account for the user of ``headers``; returns its number."""
+
+    def create_account(headers, account_type="checking"):
+        response = client.post(
+            "/api/v1/accounts",
+            json={
+                "account_name": "test",
+                "account_type": account_type,
+                "account_pin": "1234",
+            },
+            headers=headers,
+        )
+        assert response.status_code == 201, response.json
+        return response.json["account"]["account_number"]
+
+    return create_account
+
+
+@pytest.fixture
+def post_transaction(client):
+    def post_transaction(headers, **data):
+        data["amount"] = str(data["amount"])
+        return client.post("/api/v1/transactions", json=data, headers=headers)
+
+    return post_transaction
+
+
+@pytest.fixture
+def count_statements(app):
+    """Context manager counting the SQL statements run on the default DB."""
+
+    @contextmanager
+    def count_statements():
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+    return count_statements
+
+
+@pytest.fixture
+def serialized_writes(app):
+    """
+    Context manager making SQLite transactions take the write lock when
+    they begin, like row locks would on MySQL, so concurrent requests queue
+    instead of failing. Requests that open a second connection while their
+    session is in a transaction (e.g. to reserve account numbers) would
+    wait for themselves, so create test data before entering it.
+    """
+
+    @contextmanager
+    def serialized_writes():
+        with app.app_context():
+            engine = db.engine
+
+        def on_connect(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+            dbapi_connection.execute("PRAGMA busy_timeout = 30000")
+
+        def on_begin(connection):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+        engine.dispose()
+        event.listen(engine, "connect", on_connect)
+        event.listen(engine, "begin", on_begin)
+        try:
+            yield engine
+        finally:
+            event.remove(engine, "begin", on_begin)
+            event.remove(engine, "connect", on_connect)
+            engine.dispose()
+
+    return serialized_writes
@@ -0,0 +1,48 @@
+import random
+import uuid
+
+from app_dir.services.account_number_service import AccountNumberService
+from app_dir.utils.account_numbers import (
+    BODY_COUNT,
+    account_number_for,
+    is_valid_account_number,
+    keyed_permutation,
+)
+
+
+def test_permutation_is_a_bijection():
+    for domain in (1000, 1024, 9973):
+        images = [keyed_permutation(value, b"key", domain) for value in range(domain)]
+        assert sorted(images) == list(range(domain))
+
+
+def test_account_numbers_are_distinct_and_valid():
+    values = list(range(5000)) + random.Random(5).sample(range(BODY_COUNT), 5000)
+    numbers = {account_number_for(value, b"key") for value in values}
+
+    assert len(numbers) == len(set(values))
+    assert all(100_000_000 <= number < 1_000_000_000 for number in numbers)
+    assert all(is_valid_account_number(number) for number in numbers)
+
+
+def test_key_changes_the_mapping():
+    values = range(1000)
+    first = [account_number_for(value, b"one key") for value in values]
+    second = [account_number_for(value, b"another key") for value in values]
+
+    assert sum(a == b for a, b in zip(first, second)) <= 1
+    # Consecutive values are not consecutive or evenly spaced numbers
+    steps = {b - a for a, b in zip(first, first[1:])}
+    assert len(steps) > 900
+
+
+def test_blocks_are_reserved_in_one_statement(app, count_statements):
+    sequence = f"test-{uuid.uuid4().hex[:8]}"
+    with app.app_context():
+        assert AccountNumberService._reserve_block(10, sequence) == 0
+        with count_statements() as statements:
+            first = AccountNumberService._reserve_block(10, sequence)
+            second = AccountNumberService._reserve_block(5, sequence)
+
+    assert (first, second) == (10, 20)
+    assert len(statements) == 2
@@ -0,0 +1,37 @@
+from app_dir.services.balance_bucket_service import BalanceBucketService
+
+
+def test_account_list_fields_do_not_lazy_load(
+    app, client, login, create_account, count_statements
+):
+    headers = login()
+    accounts = [create_account(headers) for _ in range(6)]
+    with app.app_context():
+        for account_number in accounts[:3]:
+            BalanceBucketService.set_bucket_count(account_number, 2)
+    user_id = client.get("/api/v1/users/current", headers=headers).json["user"]["id"]
+
+    counts = {}
+    for fields in ("", "account_number,balance"):
+        with count_statements() as statements:
+            response = client.get(
+                f"/api/v1/users/{user_id}/accounts?fields={fields}", headers=headers
+            )
+        assert response.status_code == 200, response.json
+        assert len(response.json["accounts"]) == 6
+        counts[fields] = len(statements)
+
+    assert counts["account_number,balance"] <= counts[""]
+
+
+def test_multi_get_matches_single_get_status_codes(client, login, create_account):
+    headers = login()
+    other = create_account(login())
+    own = create_account(headers)
+
+    response = client.get(f"/api/v1/accounts?ids={own},{other},1", headers=headers)
+    assert response.status_code == 200, response.json
+    statuses = [result["status"] for result in response.json["accounts"]]
+    single = client.get(f"/api/v1/accounts/{other}", headers=headers)
+    assert statuses == [200, single.status_code, 404]
+    assert single.status_code == 401
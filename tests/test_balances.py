@@ -0,0 +1,61 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import delete
+
+from app_dir.extensions import db
+from app_dir.models.archived_balance_model import ArchivedAccountBalance
+from app_dir.models.balance_snapshot_model import BalanceSnapshot
+from app_dir.models.transaction_archive_model import TransactionArchive
+
+
+def test_balance_as_of_starts_from_archived_months(
+    app, client, login, create_account, post_transaction
+):
+    headers = login()
+    account_number = create_account(headers)
+    post_transaction(headers, type="deposit", account_number=account_number, amount=10)
+
+    with app.app_context():
+        db.session.add_all(
+            [
+                TransactionArchive(
+                    month=date(2000, 1, 1),
+                    path="transactions-2000-01.missing",
+                    archive_format="COLUMNAR",
+                    row_count=1,
+                    archived_at=datetime.now(timezone.utc),
+                ),
+                ArchivedAccountBalance(
+                    account_number=account_number, net_change=Decimal(500)
+                ),
+                # Older than the archive, so not a usable starting point
+                BalanceSnapshot(
+                    account_number=account_number,
+                    snapshot_date=date(1999, 12, 31),
+                    balance=Decimal(123),
+                ),
+            ]
+        )
+        db.session.commit()
+    try:
+        url = f"/api/v1/accounts/{account_number}/balance"
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.json
+        assert Decimal(response.json["balance"]["balance"]) == Decimal(510)
+        assert response.json["balance"]["snapshot_date"] is None
+
+        response = client.get(f"{url}?as_of=2000-01-15", headers=headers)
+        assert response.status_code == 400
+    finally:
+        with app.app_context():
+            db.session.execute(
+                delete(TransactionArchive).where(
+                    TransactionArchive.month == date(2000, 1, 1)
+                )
+            )
+            for model in (ArchivedAccountBalance, BalanceSnapshot):
+                db.session.execute(
+                    delete(model).where(model.account_number == account_number)
+                )
+            db.session.commit()
@@ -0,0 +1,78 @@
+import threading
+from decimal import Decimal
+
+from sqlalchemy import select
+
+from app_dir.extensions import db
+from app_dir.models.account_daily_usage_model import AccountDailyUsage
+from app_dir.models.account_model import Account
+from app_dir.models.transaction_model import Transaction
+
+THREADS = 8
+TRANSFERS_PER_THREAD = 10
+AMOUNT = Decimal("333.00")
+
+
+def test_concurrent_transfers_never_exceed_daily_limit(
+    app, login, create_account, post_transaction, serialized_writes, monkeypatch
+):
+    # Screening would flag the burst before the limit is reached
+    monkeypatch.setitem(app.config, "SCREENING_ENABLED", False)
+    headers = login()
+    source = create_account(headers)
+    target = create_account(headers)
+    response = post_transaction(
+        headers, type="deposit", account_number=source, amount=100000
+    )
+    assert response.json["status"] == "COMPLETED"
+    limit = Account.valid_account_types["CHECKING"]["daily_transfer_limit"]
+
+    statuses = []
+    errors = []
+
+    def transfer():
+        client = app.test_client()
+        for _ in range(TRANSFERS_PER_THREAD):
+            response = client.post(
+                "/api/v1/transactions",
+                json={
+                    "type": "transfer",
+                    "from_account": source,
+                    "to_account": target,
+                    "amount": str(AMOUNT),
+                },
+                headers=headers,
+            )
+            if response.status_code == 201:
+                statuses.append(response.json["status"])
+            else:
+                errors.append(response.json)
+
+    with serialized_writes():
+        threads = [threading.Thread(target=transfer) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert errors == []
+    assert len(statuses) == THREADS * TRANSFERS_PER_THREAD
+    fitting = int(limit // AMOUNT)
+    assert statuses.count("COMPLETED") == fitting
+    assert statuses.count("FAILED") == len(statuses) - fitting
+
+    with app.app_context():
+        usage = db.session.scalars(
+            select(AccountDailyUsage).filter(AccountDailyUsage.account_number == source)
+        ).one()
+        assert usage.transfer_total == fitting * AMOUNT
+        assert usage.transfer_total <= limit
+        completed = db.session.scalars(
+            select(Transaction.amount).filter(
+                Transaction.account_from == source,
+                Transaction.transaction_type == "TRANSFER",
+                Transaction.status == "COMPLETED",
+            )
+        ).all()
+        assert sum(completed) == usage.transfer_total
+        assert db.session.get(Account, target).balance == usage.transfer_total
@@ -0,0 +1,46 @@
+from app_dir.services.balance_bucket_service import BalanceBucketService
+
+# JWT blocklist check, user lookup, accounts, bucket sums, transactions
+DASHBOARD_STATEMENT_BUDGET = 5
+
+
+def get_dashboard(client, headers, count_statements):
+    with count_statements() as statements:
+        response = client.get(
+            "/api/v1/users/current/dashboard?transactions_limit=3", headers=headers
+        )
+    assert response.status_code == 200, response.json
+    return response.json, len(statements)
+
+
+def test_dashboard_statement_budget_does_not_grow_with_accounts(
+    app, client, login, create_account, post_transaction, count_statements
+):
+    headers = login()
+    first = create_account(headers)
+    for _ in range(4):
+        post_transaction(headers, type="deposit", account_number=first, amount=5)
+    _, one_account = get_dashboard(client, headers, count_statements)
+
+    accounts = [first] + [create_account(headers) for _ in range(5)]
+    with app.app_context():
+        for account_number in accounts[3:]:
+            BalanceBucketService.set_bucket_count(account_number, 4)
+    for account_number in accounts:
+        for _ in range(4):
+            post_transaction(
+                headers, type="deposit", account_number=account_number, amount=5
+            )
+    dashboard, six_accounts = get_dashboard(client, headers, count_statements)
+
+    assert one_account <= DASHBOARD_STATEMENT_BUDGET
+    assert six_accounts <= DASHBOARD_STATEMENT_BUDGET
+    assert len(dashboard["accounts"]) == 6
+    for account in dashboard["accounts"]:
+        assert len(account["transactions"]) == 3
+    balances = {
+        account["account_number"]: float(account["balance"])
+        for account in dashboard["accounts"]
+    }
+    assert balances[first] == 40.0
+    assert all(balances[number] == 20.0 for number in accounts[1:])
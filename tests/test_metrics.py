@@ -0,0 +1,20 @@
+from sqlalchemy import update
+
+from app_dir.extensions import db
+from app_dir.models.user_model import User
+
+
+def test_metrics_require_an_admin(app, client, login):
+    assert client.get("/api/v1/metrics").status_code == 401
+
+    headers = login("metrics-user")
+    assert client.get("/api/v1/metrics", headers=headers).status_code == 403
+
+    with app.app_context():
+        db.session.execute(
+            update(User).where(User.username == "metrics-user").values(roles="ADMIN")
+        )
+        db.session.commit()
+    response = client.get("/api/v1/metrics", headers=headers)
+    assert response.status_code == 200, response.json
+    assert "db_pool" in response.json["metrics"]
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app_dir.extensions import db
+from app_dir.models.outbox_model import OutboxEvent
+from app_dir.services.outbox_service import OutboxService
+
+
+def test_prune_deletes_only_old_dispatched_events(app):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    ages = {"old": timedelta(days=30), "recent": timedelta(days=1), "pending": None}
+    with app.app_context():
+        events = {
+            f"{name}-{index}": OutboxEvent(
+                event_type="transaction.completed",
+                payload="{}",
+                created_at=now - timedelta(days=31),
+                next_attempt_at=now,
+                dispatched_at=None if age is None else now - age,
+            )
+            for name, age in ages.items()
+            for index in range(3)
+        }
+        db.session.add_all(events.values())
+        db.session.commit()
+        event_ids = {name: event.event_id for name, event in events.items()}
+
+        assert OutboxService.prune_dispatched(timedelta(days=7), batch_size=2) >= 3
+        remaining = set(
+            db.session.scalars(
+                select(OutboxEvent.event_id).filter(
+                    OutboxEvent.event_id.in_(event_ids.values())
+                )
+            )
+        )
+
+    assert remaining == {
+        event_id for name, event_id in event_ids.items() if not name.startswith("old")
+    }
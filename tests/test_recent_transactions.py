@@ -0,0 +1,99 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from app_dir.extensions import db
+from app_dir.models.account_model import Account
+from app_dir.models.transaction_model import Transaction
+from app_dir.services.recent_transaction_service import RecentTransactionService
+from app_dir.services.transaction_count_service import TransactionCountService
+
+
+@pytest.fixture
+def recent_transactions(app, monkeypatch):
+    monkeypatch.setitem(app.config, "RECENT_TRANSACTIONS_ENABLED", True)
+    monkeypatch.setattr(RecentTransactionService, "_cache", None)
+    with app.app_context():
+        yield RecentTransactionService.get_cache()
+
+
+def deposit_from_another_process(account_number, amount):
+    """Record a deposit the way another process would: the ring never sees it."""
+    account = db.session.get(Account, account_number)
+    account.balance += amount
+    transaction = Transaction(
+        account_from=account_number,
+        account_to=account_number,
+        amount=amount,
+        timestamp=datetime.now(timezone.utc),
+        transaction_type="DEPOSIT",
+        description="Deposit from another process",
+        status="COMPLETED",
+        balance_after=account.balance,
+    )
+    db.session.add(transaction)
+    db.session.flush()
+    TransactionCountService.record_transactions(
+        [transaction.get_transaction_details()],
+        owners={account_number: account.user_id},
+    )
+    db.session.commit()
+
+
+def test_ring_is_reloaded_after_writes_of_other_processes(
+    app, client, login, create_account, post_transaction, recent_transactions
+):
+    headers = login()
+    account_number = create_account(headers)
+    post_transaction(headers, type="deposit", account_number=account_number, amount=5)
+    url = f"/api/v1/transactions?account_number={account_number}"
+
+    response = client.get(url, headers=headers)
+    assert response.json["total"] == len(response.json["transactions"]) == 1
+    assert client.get(url, headers=headers).json["total"] == 1
+    assert recent_transactions.stats()["hits"] == 1
+
+    with app.app_context():
+        deposit_from_another_process(account_number, Decimal(7))
+    response = client.get(url, headers=headers)
+    assert response.json["total"] == len(response.json["transactions"]) == 2
+    assert response.json["transactions"][0]["description"] == (
+        "Deposit from another process"
+    )
+    assert recent_transactions.stats()["stale_rings"] == 1
+
+    # Local writes keep the ring and its count current
+    post_transaction(headers, type="deposit", account_number=account_number, amount=1)
+    response = client.get(url, headers=headers)
+    assert response.json["total"] == len(response.json["transactions"]) == 3
+    assert recent_transactions.stats()["stale_rings"] == 1
+    assert recent_transactions.stats()["hits"] == 2
+
+
+def test_cached_page_reads_only_the_counts(
+    client,
+    login,
+    create_account,
+    post_transaction,
+    recent_transactions,
+    count_statements,
+):
+    headers = login()
+    account_number = create_account(headers)
+    for transaction_type in ("deposit", "deposit", "withdrawal"):
+        post_transaction(
+            headers, type=transaction_type, account_number=account_number, amount=5
+        )
+    url = f"/api/v1/transactions?account_number={account_number}"
+    client.get(url, headers=headers)
+
+    with count_statements() as statements:
+        response = client.get(url, headers=headers)
+        typed = client.get(f"{url}&type=deposit", headers=headers)
+
+    assert response.json["total"] == 3
+    assert typed.json["total"] == len(typed.json["transactions"]) == 2
+    assert recent_transactions.stats()["hits"] == 2
+    assert not [s for s in statements if 'FROM "transaction"' in s]
+    assert len([s for s in statements if "account_transaction_count" in s]) == 2
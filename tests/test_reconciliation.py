@@ -0,0 +1,56 @@
+import json
+import math
+
+from sqlalchemy import func, select
+
+from app_dir.extensions import db
+from app_dir.models.account_model import Account
+from app_dir.services.reconciliation_service import ReconciliationService
+
+
+def test_account_ranges_follow_existing_accounts(app, login, create_account):
+    headers = login()
+    for _ in range(5):
+        create_account(headers)
+
+    with app.app_context():
+        numbers = db.session.scalars(
+            select(Account.account_number).order_by(Account.account_number)
+        ).all()
+        ranges = ReconciliationService.split_account_ranges(db.session, 2)
+        after = ReconciliationService.split_account_ranges(
+            db.session, 2, after=numbers[-3]
+        )
+
+    assert len(ranges) == math.ceil(len(numbers) / 2)
+    assert ranges[0][0] == numbers[0] and ranges[-1][1] == numbers[-1]
+    for (_, last), (first, _) in zip(ranges, ranges[1:]):
+        assert first == last + 1
+    for first, last in ranges:
+        assert 1 <= len([n for n in numbers if first <= n <= last]) <= 2
+    assert after == [(numbers[-2], numbers[-1])]
+
+
+def test_reconcile_resumes_after_checkpoint(
+    app, login, create_account, post_transaction, tmp_path
+):
+    headers = login()
+    account_number = create_account(headers)
+    post_transaction(headers, type="deposit", account_number=account_number, amount=7)
+    report_path = str(tmp_path / "report.csv")
+
+    with app.app_context():
+        database_uri = app.config["SQLALCHEMY_DATABASE_URI"]
+        accounts = db.session.scalar(select(func.count(Account.account_number)))
+        highest = db.session.scalar(select(func.max(Account.account_number)))
+        first = ReconciliationService.reconcile(
+            db.session, database_uri, report_path, workers=1, range_size=3
+        )
+        again = ReconciliationService.reconcile(
+            db.session, database_uri, report_path, workers=1, range_size=3
+        )
+
+    assert first["accounts_checked"] == accounts
+    with open(f"{report_path}.checkpoint") as checkpoint_file:
+        assert json.load(checkpoint_file) == {"reconciled_through": highest}
+    assert again["accounts_checked"] == 0
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+
+import pytest
+from sqlalchemy import create_engine, event, select
+
+from app_dir.extensions import db
+from app_dir.utils.replica_routing import (
+    PIN_COOKIE,
+    ReplicaRouter,
+    read_from_replica,
+    replica_bind_key,
+)
+
+
+@pytest.fixture
+def replica(app, monkeypatch):
+    """The test database standing in as the only read replica."""
+    uri = app.config["SQLALCHEMY_DATABASE_URI"]
+    with app.app_context():
+        engines = db.engines
+    engine = engines[replica_bind_key(0)] = create_engine(uri)
+    monkeypatch.setitem(app.config, "DATABASE_REPLICA_URIS", [uri])
+    monkeypatch.setattr(ReplicaRouter, "_replicas", None)
+    monkeypatch.setattr(ReplicaRouter, "_pinned", OrderedDict())
+    try:
+        yield engine
+    finally:
+        if ReplicaRouter._replicas:
+            wait_for_lag_check()
+        del engines[replica_bind_key(0)]
+        engine.dispose()
+
+
+def wait_for_lag_check():
+    replica = ReplicaRouter._replicas[0]
+    deadline = time.monotonic() + 5
+    while replica.checking and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not replica.checking
+
+
+def test_lag_checks_do_not_block_reads(app, replica, monkeypatch):
+    release = threading.Event()
+    check_lag = ReplicaRouter._check_lag
+
+    def slow_check_lag(replica, engine):
+        release.wait(5)
+        check_lag(replica, engine)
+
+    monkeypatch.setattr(ReplicaRouter, "_check_lag", staticmethod(slow_check_lag))
+    with app.app_context():
+        # Not checked yet: the primary serves the read without waiting
+        assert ReplicaRouter.choose_replica(db.engines) is None
+        release.set()
+        wait_for_lag_check()
+        assert ReplicaRouter.choose_replica(db.engines) is replica
+
+
+def test_read_your_writes_pin_is_carried_by_a_cookie(
+    app, client, login, create_account, post_transaction, replica
+):
+    headers = login()
+    account_number = create_account(headers)
+    post_transaction(headers, type="deposit", account_number=account_number, amount=5)
+    assert client.get_cookie(PIN_COOKIE) is not None
+    url = f"/api/v1/transactions?account_number={account_number}"
+
+    def pinned_requests():
+        with app.app_context():
+            return ReplicaRouter.stats()["pinned_requests"]
+
+    # Served by a process that did not see the write
+    ReplicaRouter._pinned.clear()
+    before = pinned_requests()
+    assert client.get(url, headers=headers).status_code == 200
+    assert pinned_requests() == before + 1
+
+    client.set_cookie(PIN_COOKIE, "forged")
+    assert client.get(url, headers=headers).status_code == 200
+    client.delete_cookie(PIN_COOKIE)
+    assert client.get(url, headers=headers).status_code == 200
+    assert pinned_requests() == before + 1
+
+
+def test_reads_of_a_request_use_one_replica(app, monkeypatch):
+    uri = app.config["SQLALCHEMY_DATABASE_URI"]
+    with app.app_context():
+        engines = db.engines
+    replicas = [create_engine(uri) for _ in range(2)]
+    for index, engine in enumerate(replicas):
+        engines[replica_bind_key(index)] = engine
+    monkeypatch.setitem(app.config, "DATABASE_REPLICA_URIS", [uri, uri])
+    monkeypatch.setattr(ReplicaRouter, "_replicas", None)
+    monkeypatch.setattr("app_dir.utils.replica_routing.get_jwt_identity", lambda: 1)
+    used = []
+    for engine in replicas:
+        event.listen(
+            engine,
+            "before_cursor_execute",
+            lambda conn, *args: used.append(conn.engine),
+        )
+    try:
+        with app.app_context():
+            for replica in ReplicaRouter.get_replicas():
+                replica.lag, replica.checked_at = 0, time.monotonic()
+        for _ in range(2):
+            with app.test_request_context():
+                read_from_replica(
+                    lambda: [db.session.scalar(select(1)) for _ in range(3)]
+                )()
+                db.session.remove()
+        assert used[:3] == [used[0]] * 3 and used[3:] == [used[3]] * 3
+        assert used[0] is not used[3]
+    finally:
+        for index, engine in enumerate(replicas):
+            del engines[replica_bind_key(index)]
+            engine.dispose()
@@ -0,0 +1,29 @@
+import gzip
+import zlib
+
+from flask import Response
+
+from app_dir.utils.response_utilities import compress_response
+
+BODY = b'{"transactions": []}' * 10
+
+
+def negotiate(accept_encoding, min_size=0):
+    return compress_response(Response(BODY), accept_encoding, min_size)
+
+
+def test_compression_follows_q_values():
+    assert gzip.decompress(negotiate("gzip, deflate").get_data()) == BODY
+    assert zlib.decompress(negotiate("gzip;q=0, deflate").get_data()) == BODY
+    assert zlib.decompress(negotiate("gzip;q=0.5, deflate;q=0.8").get_data()) == BODY
+    assert gzip.decompress(negotiate("*").get_data()) == BODY
+    for accept_encoding in ("gzip;q=0", "*;q=0", "deflate;q=0, gzip;q=x", "br", None):
+        response = negotiate(accept_encoding)
+        assert "Content-Encoding" not in response.headers, accept_encoding
+        assert response.get_data() == BODY
+
+
+def test_compressible_responses_always_vary_on_accept_encoding():
+    for accept_encoding, min_size in (("gzip", 0), ("identity", 0), ("gzip", 10**6)):
+        response = negotiate(accept_encoding, min_size)
+        assert response.headers["Vary"] == "Accept-Encoding"
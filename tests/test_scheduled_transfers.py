@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+
+
+def schedule(client, headers, **data):
+    return client.post("/api/v1/scheduled-transfers", json=data, headers=headers)
+
+
+def test_create_scheduled_transfer_validates_input(client, login, create_account):
+    headers = login()
+    source = create_account(headers)
+    target = create_account(headers)
+    transfer = {"from_account": source, "to_account": target, "frequency": "daily"}
+
+    for amount in ("NaN", "sNaN", "Infinity", "ten"):
+        response = schedule(client, headers, amount=amount, **transfer)
+        assert response.status_code == 400, amount
+
+    past = datetime.now(timezone.utc) - timedelta(days=41)
+    response = schedule(
+        client, headers, amount="10", starts_at=past.isoformat(), **transfer
+    )
+    assert response.status_code == 400
+    assert "past" in response.json["error"]
+
+    future = datetime.now(timezone.utc) + timedelta(days=1)
+    response = schedule(
+        client, headers, amount="10", starts_at=future.isoformat(), **transfer
+    )
+    assert response.status_code == 201, response.json
+    response = schedule(client, headers, amount="10", **transfer)
+    assert response.status_code == 201, response.json
@@ -0,0 +1,46 @@
+from app_dir.models.account_model import Account
+from app_dir.services.screening_service import (
+    MaxCountRule,
+    ScreeningService,
+    TransactionScreener,
+)
+
+
+def test_released_transactions_do_not_count():
+    screener = TransactionScreener([MaxCountRule("WITHDRAWAL", 60, 2)])
+    for _ in range(5):
+        receipt = screener.screen(1, "WITHDRAWAL", 10, now=100)
+        screener.release(receipt)
+
+    screener.screen(1, "WITHDRAWAL", 10, now=101)
+    screener.screen(1, "WITHDRAWAL", 10, now=102)
+    assert screener.stats()["flagged"] == 0
+
+
+def test_transfers_over_the_daily_limit_do_not_count(
+    app, login, create_account, post_transaction, monkeypatch
+):
+    monkeypatch.setattr(
+        ScreeningService,
+        "_screener",
+        TransactionScreener([MaxCountRule("TRANSFER", 60, 3)]),
+    )
+    headers = login()
+    source = create_account(headers)
+    target = create_account(headers)
+    limit = Account.valid_account_types["CHECKING"]["daily_transfer_limit"]
+    post_transaction(headers, type="deposit", account_number=source, amount=limit * 2)
+
+    def transfer(amount):
+        return post_transaction(
+            headers,
+            type="transfer",
+            from_account=source,
+            to_account=target,
+            amount=amount,
+        ).json
+
+    for _ in range(5):
+        rejected = transfer(limit + 1)
+        assert rejected["status"] == "FAILED"
+    assert transfer(1)["status"] == "COMPLETED"
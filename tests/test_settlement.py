@@ -0,0 +1,92 @@
+from decimal import Decimal
+
+from app_dir.extensions import db
+from app_dir.models.account_model import Account
+from app_dir.models.transaction_model import Transaction
+from app_dir.services.account_service import AccountService
+from app_dir.services.settlement_service import SettlementService
+
+
+def test_pending_transaction_is_settled_once(
+    app, login, create_account, post_transaction, monkeypatch
+):
+    monkeypatch.setitem(app.config, "ASYNC_SETTLEMENT_ENABLED", True)
+    headers = login()
+    account_number = create_account(headers)
+    response = post_transaction(
+        headers, type="deposit", account_number=account_number, amount=25
+    )
+    assert response.status_code == 202, response.json
+    transaction_id = response.json["transaction_id"]
+
+    with app.app_context():
+        # Read as PENDING by a worker that is then overtaken by another one
+        stale = db.session.get(Transaction, transaction_id)
+        assert stale.status == "PENDING"
+        with app.app_context():
+            assert SettlementService.settle_batch(batch_size=1000) >= 1
+        assert AccountService.settle_pending_transaction(stale) is False
+        db.session.commit()
+
+    with app.app_context():
+        assert db.session.get(Transaction, transaction_id).status == "COMPLETED"
+        assert db.session.get(Account, account_number).total_balance == Decimal(25)
+
+
+def test_get_transaction_rejects_invalid_wait(
+    client, login, create_account, post_transaction
+):
+    headers = login()
+    account_number = create_account(headers)
+    response = post_transaction(
+        headers, type="deposit", account_number=account_number, amount=5
+    )
+    transaction_id = response.json["transaction_id"]
+
+    for wait in ("nan", "inf", "-1", "soon"):
+        response = client.get(
+            f"/api/v1/transactions/{transaction_id}?wait={wait}", headers=headers
+        )
+        assert response.status_code == 400, wait
+    response = client.get(
+        f"/api/v1/transactions/{transaction_id}?wait=0.5", headers=headers
+    )
+    assert response.status_code == 200
+
+
+def test_unexpected_error_fails_only_its_transaction(
+    app, login, create_account, post_transaction, monkeypatch
+):
+    monkeypatch.setitem(app.config, "ASYNC_SETTLEMENT_ENABLED", True)
+    headers = login()
+    account_number = create_account(headers)
+    transaction_ids = [
+        post_transaction(
+            headers, type="deposit", account_number=account_number, amount=amount
+        ).json["transaction_id"]
+        for amount in (1, 2, 3)
+    ]
+    settle = AccountService.settle_pending_transaction
+
+    def settle_or_break(transaction):
+        settled = settle(transaction)
+        if transaction.transaction_id == transaction_ids[1]:
+            # Fails after changing the balance, which must be rolled back
+            db.session.flush()
+            raise RuntimeError("bad row")
+        return settled
+
+    monkeypatch.setattr(
+        AccountService, "settle_pending_transaction", staticmethod(settle_or_break)
+    )
+    with app.app_context():
+        assert SettlementService.settle_batch(batch_size=1000) >= 3
+        assert SettlementService.settle_batch(batch_size=1000) == 0
+        statuses = [
+            db.session.get(Transaction, transaction_id).status
+            for transaction_id in transaction_ids
+        ]
+        balance = db.session.get(Account, account_number).total_balance
+
+    assert statuses == ["COMPLETED", "FAILED", "COMPLETED"]
+    assert balance == Decimal(4)
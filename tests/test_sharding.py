@@ -0,0 +1,243 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, func, select, update
+
+from app_dir.extensions import db
+from app_dir.models.account_daily_usage_model import AccountDailyUsage
+from app_dir.models.account_model import Account
+from app_dir.models.account_number_sequence_model import AccountNumberSequence
+from app_dir.models.shard_account_model import ShardAccount
+from app_dir.models.shard_user_model import ShardUser
+from app_dir.models.transaction_model import Transaction
+from app_dir.models.transfer_saga_model import TransferSaga
+from app_dir.models.user_model import User
+from app_dir.services.shard_service import ShardService
+from app_dir.services.transfer_saga_service import TransferSagaService
+from app_dir.utils.shard_routing import shard_bind_key
+
+SHARDS = 3
+DIRECTORY_TABLES = [
+    ShardUser.__table__,
+    ShardAccount.__table__,
+    TransferSaga.__table__,
+    AccountNumberSequence.__table__,
+]
+
+
+@pytest.fixture
+def shards(app, tmp_path, monkeypatch):
+    """
+    Split the data over SQLite file shards, with a fresh directory as the
+    default database. Users with user_id n are placed on shard n % 3.
+    """
+    uris = [f"sqlite:///{tmp_path / f'shard{index}.db'}" for index in range(SHARDS)]
+    with app.app_context():
+        engines = db.engines
+    saved = dict(engines)
+    engines[None] = create_engine(f"sqlite:///{tmp_path / 'directory.db'}")
+    for index, uri in enumerate(uris):
+        engines[shard_bind_key(index)] = create_engine(uri)
+    monkeypatch.setitem(app.config, "DATABASE_SHARD_URIS", uris)
+    # Screening would flag the quick succession of transfers
+    monkeypatch.setitem(app.config, "SCREENING_ENABLED", False)
+
+    db.metadata.create_all(engines[None], tables=DIRECTORY_TABLES)
+    shard_tables = [
+        table for table in db.metadata.sorted_tables if table not in DIRECTORY_TABLES
+    ]
+    for index in range(SHARDS):
+        db.metadata.create_all(engines[shard_bind_key(index)], tables=shard_tables)
+    ShardService._users.clear()
+    ShardService._accounts.clear()
+    try:
+        yield engines
+    finally:
+        for key, engine in engines.items():
+            if saved.get(key) is not engine:
+                engine.dispose()
+        engines.clear()
+        engines.update(saved)
+        ShardService._users.clear()
+        ShardService._accounts.clear()
+
+
+def on_shard(shards, shard, statement):
+    with shards[shard_bind_key(shard)].begin() as connection:
+        result = connection.execute(statement)
+        return result.all() if result.returns_rows else None
+
+
+def balance(shards, shard, account_number):
+    return on_shard(
+        shards,
+        shard,
+        select(Account.balance).where(Account.account_number == account_number),
+    )[0][0]
+
+
+def saga_states(shards):
+    with shards[None].connect() as connection:
+        return dict(
+            connection.execute(
+                select(TransferSaga.state, func.count()).group_by(TransferSaga.state)
+            ).all()
+        )
+
+
+@pytest.fixture
+def people(shards, login, create_account, post_transaction):
+    """alice and dave on shard 1, bob on shard 2, each with 100 deposited."""
+    users = {name: login(name) for name in ("alice", "bob", "carol", "dave")}
+    accounts = {}
+    for name in ("alice", "bob", "dave"):
+        accounts[name] = create_account(users[name])
+        response = post_transaction(
+            users[name], type="deposit", account_number=accounts[name], amount=100
+        )
+        assert response.json["status"] == "COMPLETED"
+    return users, accounts
+
+
+def transfer(post_transaction, headers, from_account, to_account, amount):
+    response = post_transaction(
+        headers,
+        type="transfer",
+        from_account=from_account,
+        to_account=to_account,
+        amount=amount,
+    )
+    assert response.status_code == 201, response.json
+    return response.json
+
+
+def test_users_are_placed_by_user_id(shards, people):
+    for shard, names in ((0, ["carol"]), (1, ["alice", "dave"]), (2, ["bob"])):
+        assert sorted(
+            name for (name,) in on_shard(shards, shard, select(User.username))
+        ) == sorted(names)
+
+
+def test_intra_shard_transfer(shards, people, post_transaction):
+    users, accounts = people
+    result = transfer(
+        post_transaction, users["alice"], accounts["alice"], accounts["dave"], 10
+    )
+
+    assert result["status"] == "COMPLETED"
+    assert balance(shards, 1, accounts["alice"]) == Decimal(90)
+    assert balance(shards, 1, accounts["dave"]) == Decimal(110)
+    assert saga_states(shards) == {}
+
+
+def test_cross_shard_transfer(shards, people, post_transaction):
+    users, accounts = people
+    result = transfer(
+        post_transaction, users["alice"], accounts["alice"], accounts["bob"], 25
+    )
+
+    assert result["status"] == "COMPLETED"
+    assert balance(shards, 1, accounts["alice"]) == Decimal(75)
+    assert balance(shards, 2, accounts["bob"]) == Decimal(125)
+    assert saga_states(shards) == {"COMPLETED": 1}
+    legs = select(Transaction.status).where(
+        Transaction.reference_code == result["reference_code"]
+    )
+    assert on_shard(shards, 1, legs) == [("COMPLETED",)]
+    assert on_shard(shards, 2, legs) == [("COMPLETED",)]
+
+
+def test_refused_credit_is_compensated(shards, people, post_transaction):
+    users, accounts = people
+    on_shard(
+        shards,
+        2,
+        update(Account)
+        .where(Account.account_number == accounts["bob"])
+        .values(is_locked=True),
+    )
+    result = transfer(
+        post_transaction, users["alice"], accounts["alice"], accounts["bob"], 30
+    )
+
+    assert result["status"] == "REVERSED"
+    assert balance(shards, 1, accounts["alice"]) == Decimal(100)
+    assert balance(shards, 2, accounts["bob"]) == Decimal(100)
+    assert saga_states(shards) == {"COMPENSATED": 1}
+    # The refunded debit no longer counts towards the daily limit
+    assert on_shard(
+        shards,
+        1,
+        select(AccountDailyUsage.transfer_total).where(
+            AccountDailyUsage.account_number == accounts["alice"]
+        ),
+    ) == [(Decimal(0),)]
+
+
+def test_resumed_credit_is_applied_once(
+    app, shards, people, post_transaction, monkeypatch
+):
+    users, accounts = people
+
+    def unreachable(details, to_shard):
+        raise RuntimeError("shard 2 unreachable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(TransferSagaService, "_credit", staticmethod(unreachable))
+        result = transfer(
+            post_transaction, users["alice"], accounts["alice"], accounts["bob"], 7
+        )
+    assert result["status"] == "COMPLETED"
+    assert saga_states(shards) == {"DEBITED": 1}
+    assert balance(shards, 2, accounts["bob"]) == Decimal(100)
+
+    with app.app_context():
+        assert TransferSagaService.resume(min_age_seconds=0) == {"COMPLETED": 1}
+        # The saga's state was lost after the credit: resuming must not
+        # credit bob again
+        with db.engine.begin() as connection:
+            connection.execute(update(TransferSaga).values(state="DEBITED"))
+        assert TransferSagaService.resume(min_age_seconds=0) == {"COMPLETED": 1}
+
+    assert balance(shards, 1, accounts["alice"]) == Decimal(93)
+    assert balance(shards, 2, accounts["bob"]) == Decimal(107)
+    legs = select(func.count()).where(
+        Transaction.reference_code == result["reference_code"]
+    )
+    assert on_shard(shards, 2, legs) == [(1,)]
+
+
+def test_interrupted_move_is_finished_by_running_it_again(
+    app, client, shards, people, post_transaction, monkeypatch
+):
+    users, accounts = people
+    transfer(post_transaction, users["alice"], accounts["alice"], accounts["dave"], 10)
+    transfer(post_transaction, users["alice"], accounts["alice"], accounts["bob"], 20)
+    delete_from = ShardService._delete_from
+
+    def interrupted(user_id, shard):
+        raise RuntimeError("connection lost")
+
+    with app.app_context():
+        with monkeypatch.context() as patch:
+            patch.setattr(ShardService, "_delete_from", staticmethod(interrupted))
+            with pytest.raises(RuntimeError):
+                ShardService.move_user(1, 0, grace_seconds=0)
+        monkeypatch.setattr(ShardService, "_delete_from", staticmethod(delete_from))
+        ShardService.move_user(1, 0, grace_seconds=0)
+        ShardService.move_user(1, 0, grace_seconds=0)
+
+    alice_rows = select(func.count()).where(User.user_id == 1)
+    assert on_shard(shards, 0, alice_rows) == [(1,)]
+    assert on_shard(shards, 1, alice_rows) == [(0,)]
+    accounts_of_alice = select(func.count()).where(Account.user_id == 1)
+    assert on_shard(shards, 0, accounts_of_alice) == [(1,)]
+    assert on_shard(shards, 1, accounts_of_alice) == [(0,)]
+    assert balance(shards, 0, accounts["alice"]) == Decimal(70)
+
+    response = client.get(
+        f"/api/v1/transactions?account_number={accounts['alice']}",
+        headers=users["alice"],
+    )
+    assert response.status_code == 200, response.json
+    assert response.json["total"] == 3
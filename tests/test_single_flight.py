@@ -0,0 +1,38 @@
+import threading
+
+from flask import g
+
+from app_dir.utils.single_flight import SingleFlight, coalesced_json_response
+
+
+def test_reads_from_the_primary_do_not_join_replica_reads(app):
+    single_flight = SingleFlight("test.reads")
+    started = threading.Event()
+    release = threading.Event()
+
+    def replica_read():
+        started.set()
+        release.wait(5)
+        return {"read_from": "replica"}, 200
+
+    def leader():
+        with app.test_request_context():
+            g.read_from_replica = True
+            coalesced_json_response(single_flight, "key", replica_read)
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    try:
+        assert started.wait(5)
+        with app.test_request_context():
+            # Pinned to the primary, e.g. right after a write
+            g.read_from_replica = False
+            response = coalesced_json_response(
+                single_flight, "key", lambda: ({"read_from": "primary"}, 200)
+            )
+    finally:
+        release.set()
+        thread.join()
+
+    assert response.json == {"read_from": "primary"}
+    assert single_flight.stats()["executions"] == 2
@@ -0,0 +1,21 @@
+def test_list_of_another_users_account_is_unauthorized(
+    client, login, create_account, post_transaction
+):
+    owner = login()
+    account_number = create_account(owner)
+    for _ in range(3):
+        post_transaction(owner, type="deposit", account_number=account_number, amount=5)
+    other = login()
+
+    response = client.get(
+        f"/api/v1/transactions?account_number={account_number}", headers=other
+    )
+
+    assert response.status_code == 401
+    assert "total" not in response.json
+
+    response = client.get(
+        f"/api/v1/transactions?account_number={account_number}", headers=owner
+    )
+    assert response.status_code == 200
+    assert response.json["total"] == 3